@@ -0,0 +1,158 @@
+'''
+Compares the serial crawl of the browse pages with the concurrent one, against
+a local fixture server that serves the pages in benchmarks/fixtures/browse.
+
+The fixture pages are laid out as boardgamegeek.com serves its browse pages,
+with 245 games over three pages, some without a short description or a
+number of voters. Any page past the last is served as a page with no games,
+as the site does past the end of its rankings. Each page is served after
+--latency seconds, standing in for the time the site takes to answer.
+
+bgg_crawler.go runs with max_workers=1 and with every --workers size, and
+each index it writes must hold the same rows, in the rank order of the
+fixture pages, as the serial crawl.
+
+Run from the project root:
+    python benchmarks/bench_crawler.py
+    python benchmarks/bench_crawler.py --workers 2 4 8 --latency 0.5
+'''
+import argparse
+import csv
+import filecmp
+import http.server
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bgg_crawler
+
+BROWSE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "browse")
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    Serves the fixture browse pages after the latency set on the server.
+    '''
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        browse = re.match(r"/browse/boardgame/page/(\d+)", self.path)
+        if not browse:
+            self.send_body(404, b"")
+            return
+        filename = os.path.join(BROWSE_DIR, f"page_{browse.group(1)}.html")
+        if not os.path.exists(filename):
+            filename = os.path.join(BROWSE_DIR, "page_empty.html")
+        with open(filename, "rb") as f:
+            body = f.read()
+        time.sleep(self.server.latency)
+        self.send_body(200, body)
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(latency=0.2):
+    '''
+    Starts the fixture server in a background thread.
+
+    Outputs:
+        http.server.ThreadingHTTPServer, with its URL as server.base_url
+    '''
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fixture_rows():
+    '''
+    Outputs:
+        List of the (game_id, game_text, num_voters) rows of every fixture
+            page, in rank order
+    '''
+    rows = []
+    page = 1
+    while os.path.exists(os.path.join(BROWSE_DIR, f"page_{page}.html")):
+        with open(os.path.join(BROWSE_DIR, f"page_{page}.html"),
+            encoding="utf-8") as f:
+            rows.extend(bgg_crawler.parse_page(f.read()))
+        page += 1
+    return rows
+
+
+def run(directory, num_games, max_workers, base_url):
+    '''
+    Crawls into an index file in directory.
+
+    Outputs:
+        (name of the index file, seconds)
+    '''
+    index_filename = os.path.join(directory, f"index_{max_workers}.csv")
+    start = time.perf_counter()
+    bgg_crawler.go(num_games, index_filename, max_workers=max_workers,
+        base_url=base_url)
+    return index_filename, time.perf_counter() - start
+
+
+def go(workers=(2, 4), latency=0.2):
+    '''
+    Crawls the fixture pages serially and with every number of workers,
+    checks that every index matches the serial one and the fixture pages,
+    and prints the time of each crawl.
+
+    Inputs:
+        workers (list of int): Numbers of pages to fetch at the same time
+        latency (float): Seconds the server takes to answer each page
+    '''
+    server = start_server(latency)
+    directory = tempfile.mkdtemp(prefix="bench_crawler_")
+    expected = fixture_rows()
+    try:
+        # Asks for more games than the pages hold, so the crawl also has to
+        # stop at the first page with no games
+        for num_games in (150, len(expected) + 100):
+            serial, serial_seconds = run(directory, num_games, 1,
+                server.base_url)
+            with open(serial, newline="", encoding="utf-8") as f:
+                rows = [tuple(row) for row in csv.reader(f)]
+            in_order = rows == expected[:num_games]
+            print(f"\n{num_games} games asked for, {len(rows)} crawled from the "
+                f"fixture pages, with {latency}s per page")
+            print(f"    {'serial':<12} {serial_seconds:6.2f}s  "
+                f"rank order matches the pages: {in_order}")
+            assert in_order, "the serial crawl is out of rank order"
+            for max_workers in workers:
+                index_filename, seconds = run(directory, num_games,
+                    max_workers, server.base_url)
+                same = filecmp.cmp(serial, index_filename, shallow=False)
+                print(f"    {str(max_workers) + ' workers':<12} {seconds:6.2f}s  "
+                    f"same index as serial: {same}")
+                assert same, f"the crawl with {max_workers} workers differs"
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    arg_parser.add_argument("--latency", type=float, default=0.2)
+    args = arg_parser.parse_args()
+    go(args.workers, args.latency)
@@ -0,0 +1,182 @@
+'''
+Compares bgg_api.go, which fetches and parses one batch after another, with
+the pipelined bgg_ingest.go against the local mock API from
+bench_rate_limit.py.
+
+Both pulls use the same client rate limit, so the politeness limit caps them
+both at --client-rate * --size games per second. The report shows how close
+each gets to that cap, and checks that both wrote the same files.
+
+It then checks the backpressure of the pipeline: with fast fetches and a
+single slow parser, the number of responses fetched but not yet taken up by
+a parser must never pass fetch_concurrency + queue_size.
+
+Run from the project root:
+    python benchmarks/bench_ingest.py
+    python benchmarks/bench_ingest.py --games 10000 --client-rate 10 --workers 4
+'''
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import filecmp
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bgg_api
+import bgg_ingest
+import bgg_rate
+from bench_rate_limit import start_server
+
+OUTPUT_FILES = ["all_games.json", "all_games.csv", "types_counts.csv",
+    "categories_counts.csv", "mechanics_counts.csv"]
+
+
+def run(pull, workdir, num_games, size, client_rate, parser, **kwargs):
+    '''
+    Runs one pull against the mock API in workdir.
+
+    Outputs:
+        seconds (float)
+    '''
+    ids_path = os.path.join(workdir, "ids.csv")
+    with open(ids_path, "w") as f:
+        for bgg_id in range(1, num_games + 1):
+            f.write(f"{bgg_id},Game {bgg_id}\n")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        pull(ids_path, limit=num_games, size=size, parser=parser,
+            limiter=bgg_rate.TokenBucket(rate=client_rate), **kwargs)
+        return time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+
+class ResponseCounter:
+    '''
+    Counts the responses fetched but not yet handed to a parser, and the
+    most there have been at once.
+    '''
+    def __init__(self):
+        self.outstanding = 0
+        self.most = 0
+        self.lock = threading.Lock()
+
+    def add(self, change):
+        with self.lock:
+            self.outstanding += change
+            self.most = max(self.most, self.outstanding)
+
+
+class FetchPool(ThreadPoolExecutor):
+    '''
+    Thread pool that counts each response as outstanding once it is fetched.
+    '''
+    def __init__(self, counter, max_workers):
+        super().__init__(max_workers=max_workers)
+        self.counter = counter
+
+    def submit(self, function, *args, **kwargs):
+        def counted():
+            response = function(*args, **kwargs)
+            self.counter.add(1)
+            return response
+        return super().submit(counted)
+
+
+class ParsePool(ThreadPoolExecutor):
+    '''
+    Thread pool that counts each response as no longer outstanding once a
+    parser takes it up.
+    '''
+    def __init__(self, counter, max_workers):
+        super().__init__(max_workers=max_workers)
+        self.counter = counter
+
+    def submit(self, function, *args, **kwargs):
+        self.counter.add(-1)
+        return super().submit(function, *args, **kwargs)
+
+
+def check_backpressure(num_games=3000, size=20, fetch_concurrency=4,
+    queue_size=4, parser="html5lib"):
+    '''
+    Runs bgg_ingest.run_pipeline with one parser against the mock API, with
+    no client rate limit, and checks how many responses waited at most.
+
+    Outputs:
+        (most responses outstanding at once, the bound they must stay within)
+    '''
+    server = start_server(rate=100000, error_rate=0, latency=0,
+        latency_per_game=0)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    ids = [str(bgg_id) for bgg_id in range(1, num_games + 1)]
+    counter = ResponseCounter()
+    try:
+        with FetchPool(counter, fetch_concurrency) as fetch_pool, \
+            ParsePool(counter, 1) as parse_pool, \
+            contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(bgg_ingest.run_pipeline(ids,
+                {bgg_id: "" for bgg_id in ids}, bgg_rate.FixedBatchSizer(size),
+                fetch_pool, parse_pool, fetch_concurrency, 1, queue_size, {}, {},
+                {}, {}, limiter=bgg_rate.TokenBucket(rate=100000),
+                parser=parser, base_url=base_url))
+    finally:
+        server.shutdown()
+    return counter.most, fetch_concurrency + queue_size
+
+
+def go(num_games=3000, size=100, client_rate=5.0, parser="html5lib",
+    workers=None):
+    '''
+    Benchmarks the serial and the pipelined pull and prints games per second.
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    server = start_server(rate=1000, error_rate=0)
+    bgg_api.API_URL = f"http://127.0.0.1:{server.server_port}/xmlapi/boardgame/"
+    serial_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    pipelined_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        serial = run(bgg_api.go, serial_dir, num_games, size, client_rate,
+            parser)
+        pipelined = run(bgg_ingest.go, pipelined_dir, num_games, size,
+            client_rate, parser, max_workers=workers)
+        same = all(filecmp.cmp(os.path.join(serial_dir, filename),
+            os.path.join(pipelined_dir, filename), shallow=False)
+            for filename in OUTPUT_FILES)
+    finally:
+        server.shutdown()
+        shutil.rmtree(serial_dir)
+        shutil.rmtree(pipelined_dir)
+
+    print(f"\n{num_games} games with {parser}, rate limit "
+        f"{client_rate * size:.0f} games/sec ({client_rate} requests/sec)")
+    for mode, seconds in (("serial", serial), ("pipelined", pipelined)):
+        print(f"    {mode:<10} {seconds:7.2f}s  {num_games / seconds:8.1f} games/sec")
+    print(f"    same output files: {same}")
+
+    most, bound = check_backpressure(parser=parser)
+    print(f"    most responses waiting to be parsed: {most} (bound {bound})")
+    assert most <= bound, "fetching ran ahead of parsing"
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--games", type=int, default=3000)
+    arg_parser.add_argument("--size", type=int, default=100)
+    arg_parser.add_argument("--client-rate", type=float, default=5.0)
+    arg_parser.add_argument("--parser", default="html5lib")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    args = arg_parser.parse_args()
+    go(args.games, args.size, args.client_rate, args.parser, args.workers)
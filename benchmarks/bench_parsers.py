@@ -0,0 +1,196 @@
+'''
+Compares the parser backends in bgg_parse on recorded xmlapi/boardgame
+responses.
+
+Each recorded response in benchmarks/fixtures, and a response of synthetic
+games from benchmarks/mock_bgg.py with names and descriptions that are not
+ASCII, is padded out to a full 100-game batch (the batch size bgg_api.go
+uses) by repeating its games under new IDs, then run through get_game_info()
+with every backend, and then with each backend split across process pools
+of --workers sizes. Every backend must give the same game records, short
+descriptions included, and the same counts as html5lib, or the benchmark
+stops.
+
+Run from the project root:
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --batches 20 --size 100
+    python benchmarks/bench_parsers.py --workers 1 2 4 8
+'''
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import os
+import re
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+import bgg_api
+import bgg_parse
+from mock_bgg import render_api_response
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_responses(fixtures_dir=FIXTURES_DIR):
+    '''
+    Loads every recorded API response in fixtures_dir.
+
+    Inputs:
+        fixtures_dir (str): Directory of recorded .xml responses
+
+    Outputs:
+        List of responses (bytes)
+    '''
+    responses = []
+    for filepath in sorted(glob.glob(os.path.join(fixtures_dir, "*.xml"))):
+        with open(filepath, "rb") as f:
+            responses.append(f.read())
+    return responses
+
+
+def pad_response(response, size, first_id=1):
+    '''
+    Builds a response of exactly size games with consecutive new IDs.
+
+    Inputs:
+        response (bytes): Recorded API response
+        size (int): Number of games in the new response
+        first_id (int): First objectid to give out
+
+    Outputs:
+        (response (bytes), ids (list of str))
+    '''
+    ids = [str(bgg_id) for bgg_id in range(first_id, first_id + size)]
+    return response_for_ids(response, ids), ids
+
+
+def response_for_ids(response, ids):
+    '''
+    Builds a response for the given IDs by repeating the (non-inbound) games
+    of a recorded response under those IDs.
+
+    Inputs:
+        response (bytes): Recorded API response
+        ids (list of str): objectids of the games in the new response
+
+    Outputs:
+        response (bytes)
+    '''
+    text = response.decode("utf-8")
+    games = [game for game in re.findall(
+        r"<boardgame objectid=.*?</boardgame>", text, flags=re.S)
+        if 'inbound="true"' not in game]
+    head = text[:text.index("<boardgame ")]
+    body = [re.sub(r'objectid="\d+"', f'objectid="{bgg_id}"',
+        games[i % len(games)], count=1) for i, bgg_id in enumerate(ids)]
+    return (head + "\n".join(body) + "\n</boardgames>\n").encode("utf-8")
+
+
+def time_parser(parser, batches, workers=None):
+    '''
+    Times get_game_info() over all batches with one parser backend.
+
+    Inputs:
+        parser (str): Name of a backend in bgg_parse.PARSERS
+        batches (list): (response, short_descriptions) tuples
+        workers (int): Size of the process pool to split each batch across.
+            Default = None, which parses in this process.
+
+    Outputs:
+        (seconds (float), (games_dict, types_dict, categories_dict,
+            mechanics_dict) as filled in by get_game_info())
+    '''
+    games_dict = {}
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    executor = None
+    if workers is not None:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Start the workers before timing
+        list(executor.map(abs, range(workers)))
+    start = time.perf_counter()
+    for response, short_descriptions in batches:
+        bgg_api.get_game_info(response, games_dict, types_dict,
+            categories_dict, mechanics_dict, short_descriptions, parser=parser,
+            executor=executor, num_shards=workers)
+    seconds = time.perf_counter() - start
+    if executor is not None:
+        executor.shutdown()
+    return seconds, (games_dict, types_dict, categories_dict, mechanics_dict)
+
+
+def check_output(parser, output, expected):
+    '''
+    Stops the benchmark if a backend's records or counts differ from those
+    of html5lib.
+    '''
+    for name, got, want in zip(["games", "types", "categories", "mechanics"],
+        output, expected):
+        if got != want:
+            differ = [key for key in set(got) | set(want)
+                if got.get(key) != want.get(key)]
+            raise AssertionError(f"{parser} differs from html5lib in {name}: "
+                f"{len(differ)} entries, such as {sorted(differ)[:5]}")
+
+
+def go(num_batches=10, size=100, fixtures_dir=FIXTURES_DIR, workers=(1, 2, 4)):
+    '''
+    Benchmarks every parser backend and prints games per second.
+
+    Inputs:
+        num_batches (int): Number of batches to parse per backend
+        size (int): Number of games per batch
+        fixtures_dir (str): Directory of recorded .xml responses
+        workers (list of int): Process pool sizes to benchmark
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    responses = load_responses(fixtures_dir)
+    responses.append(render_api_response(range(1, 101)))
+    batches = []
+    for i in range(num_batches):
+        response, ids = pad_response(
+            responses[i % len(responses)], size, first_id=1 + i * size)
+        short_descriptions = pd.DataFrame(
+            {"ID": ids, "short_description": "[No Description]"})
+        batches.append((response, short_descriptions))
+
+    print(f"{num_batches} batches of {size} games")
+    results = {}
+    expected = time_parser("html5lib", batches)[1]
+    num_games = len(expected[0])
+    for parser in bgg_parse.PARSERS:
+        seconds, output = time_parser(parser, batches)
+        check_output(parser, output, expected)
+        results[parser] = seconds
+        print(f"    {parser:<10} {seconds:8.3f}s  {num_games / seconds:10.1f} games/sec")
+    print(f"    every backend gave the same {num_games} records as html5lib")
+    baseline = results["html5lib"]
+    for parser, seconds in results.items():
+        if parser != "html5lib":
+            print(f"    {parser} is {baseline / seconds:.1f}x faster than html5lib")
+
+    print(f"\nProcess pools, on {os.cpu_count()} CPUs")
+    for parser in bgg_parse.PARSERS:
+        for num_workers in workers:
+            seconds, output = time_parser(parser, batches, num_workers)
+            check_output(f"{parser} with {num_workers} workers", output,
+                expected)
+            print(f"    {parser:<10} {num_workers:>2} workers {seconds:8.3f}s  "
+                f"{num_games / seconds:10.1f} games/sec  "
+                f"{results[parser] / seconds:5.2f}x in-process")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--batches", type=int, default=10)
+    arg_parser.add_argument("--size", type=int, default=100)
+    arg_parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = arg_parser.parse_args()
+    go(args.batches, args.size, args.fixtures, args.workers)
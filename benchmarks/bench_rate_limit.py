@@ -0,0 +1,160 @@
+'''
+Measures bgg_api.go throughput against a local mock of the xmlapi/boardgame
+endpoint that throttles like BGG does.
+
+The mock answers with games from the recorded responses in
+benchmarks/fixtures. It allows at most --server-rate requests per second and
+answers anything faster with 429 and a Retry-After header, and fails a
+further --error-rate of requests with 503. Each run pulls --games IDs with
+fixed and with adaptive batch sizes, and reports games per second and the
+number of throttled requests.
+
+Run from the project root:
+    python benchmarks/bench_rate_limit.py
+    python benchmarks/bench_rate_limit.py --games 5000 --client-rate 4
+'''
+import argparse
+import http.server
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bgg_api
+import bgg_rate
+from bench_parsers import load_responses, response_for_ids
+
+
+class ThrottlingHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    Serves /xmlapi/boardgame/<ids>?stats=1 from recorded responses, with
+    throttling and injected errors configured on the server object.
+    '''
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            throttled = now - server.last_request < 1 / server.rate
+            if not throttled:
+                server.last_request = now
+            server.requests += 1
+        if throttled:
+            server.throttled += 1
+            self.send_error_response(429, {"Retry-After": "1"})
+        elif random.random() < server.error_rate:
+            server.errors += 1
+            self.send_error_response(503, {})
+        else:
+            ids = self.path.split("/")[-1].split("?")[0].split(",")
+            body = response_for_ids(server.response, ids)
+            time.sleep(server.latency + len(ids) * server.latency_per_game)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def send_error_response(self, status, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(rate, error_rate, latency=0.2, latency_per_game=0.005):
+    '''
+    Starts the throttling mock API in a background thread.
+
+    Inputs:
+        rate (float): Requests per second the server accepts
+        error_rate (float): Share of accepted requests that fail with 503
+        latency (float): Seconds every response takes
+        latency_per_game (float): Extra seconds per game in the response
+
+    Outputs:
+        http.server.ThreadingHTTPServer
+    '''
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    server.response = load_responses()[0]
+    server.rate = rate
+    server.error_rate = error_rate
+    server.latency = latency
+    server.latency_per_game = latency_per_game
+    server.lock = threading.Lock()
+    server.last_request = 0.0
+    server.requests = server.throttled = server.errors = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(server, num_games, size, client_rate, adaptive):
+    '''
+    Runs bgg_api.go against the mock API in a scratch directory.
+
+    Outputs:
+        (seconds (float), requests (int), throttled (int), errors (int))
+    '''
+    server.requests = server.throttled = server.errors = 0
+    workdir = tempfile.mkdtemp(prefix="bench_rate_limit_")
+    ids_path = os.path.join(workdir, "ids.csv")
+    with open(ids_path, "w") as f:
+        for bgg_id in range(1, num_games + 1):
+            f.write(f"{bgg_id},Game {bgg_id}\n")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        bgg_api.go(ids_path, limit=num_games, size=size, parser="iterparse",
+            limiter=bgg_rate.TokenBucket(rate=client_rate), adaptive=adaptive)
+        seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+    return seconds, server.requests, server.throttled, server.errors
+
+
+def go(num_games=2000, size=100, client_rate=4.0, server_rate=2.0,
+    error_rate=0.02):
+    '''
+    Benchmarks fixed and adaptive batch sizing against the mock API.
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    random.seed(0)
+    bgg_rate.BACKOFF_BASE = 0.25
+    server = start_server(server_rate, error_rate)
+    bgg_api.API_URL = f"http://127.0.0.1:{server.server_port}/xmlapi/boardgame/"
+    results = []
+    for adaptive in (False, True):
+        results.append((adaptive,
+            run(server, num_games, size, client_rate, adaptive)))
+    server.shutdown()
+
+    print(f"\n{num_games} games, server allows {server_rate} requests/sec, "
+        f"client asks for {client_rate}/sec, {error_rate:.0%} injected errors")
+    for adaptive, (seconds, requests, throttled, errors) in results:
+        mode = "adaptive" if adaptive else "fixed"
+        print(f"    {mode:<9} {seconds:7.2f}s  {num_games / seconds:8.1f} games/sec"
+            f"  {requests:4} requests  {throttled:3} throttled  {errors:3} errors")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--games", type=int, default=2000)
+    arg_parser.add_argument("--size", type=int, default=100)
+    arg_parser.add_argument("--client-rate", type=float, default=4.0)
+    arg_parser.add_argument("--server-rate", type=float, default=2.0)
+    arg_parser.add_argument("--error-rate", type=float, default=0.02)
+    args = arg_parser.parse_args()
+    go(args.games, args.size, args.client_rate, args.server_rate,
+        args.error_rate)
@@ -0,0 +1,128 @@
+'''
+Compares the memory of holding a pull's games as a dict of dicts, as
+bgg_api.go does by default, with bgg_record.GameStore (go(compact=True)).
+
+Games are parsed once from the recorded responses in benchmarks/fixtures and
+then copied under new IDs through a JSON round trip, so every copy has its
+own strings, as a real parse would give it. Memory is what tracemalloc sees
+allocated for the games; the time to write the JSON and CSV files from each
+is reported too, since a GameRecord builds its values on access.
+
+Run from the project root:
+    python benchmarks/bench_records.py
+    python benchmarks/bench_records.py --sizes 10000 100000 300000
+'''
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bgg_api
+import bgg_record
+from bench_parsers import load_responses, pad_response
+
+
+def parse_templates(size=100):
+    '''
+    Parses one batch of games to copy from.
+
+    Outputs:
+        (list of game information dicts, types_dict, categories_dict,
+            mechanics_dict)
+    '''
+    response, ids = pad_response(load_responses()[0], size)
+    games_dict = {}
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    bgg_api.get_game_info(response, games_dict, types_dict, categories_dict,
+        mechanics_dict, {bgg_id: "[No Description]" for bgg_id in ids},
+        parser="iterparse")
+    return ([json.dumps(info) for info in games_dict.values()], types_dict,
+        categories_dict, mechanics_dict)
+
+
+def build(games, templates, num_games):
+    '''
+    Fills games with num_games copies of the templates.
+
+    Outputs:
+        (megabytes allocated (float), seconds (float))
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(num_games):
+        games[str(i + 1)] = json.loads(templates[i % len(templates)])
+    seconds = time.perf_counter() - start
+    megabytes = tracemalloc.get_traced_memory()[0] / 1024 ** 2
+    tracemalloc.stop()
+    return megabytes, seconds
+
+
+def time_writes(games, types_dict, categories_dict, mechanics_dict):
+    '''
+    Times writing the JSON and CSV files from games.
+
+    Outputs:
+        (JSON seconds (float), CSV seconds (float))
+    '''
+    workdir = tempfile.mkdtemp(prefix="bench_records_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        with open("all_games_bench.json", "w") as out_file:
+            if isinstance(games, bgg_record.GameStore):
+                games.write_json(out_file, indent=6)
+            else:
+                json.dump(games, out_file, indent=6)
+        json_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        bgg_api.construct_csv(games, types_dict, categories_dict,
+            mechanics_dict, "_bench")
+        return json_seconds, time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+def go(sizes=(10000, 100000)):
+    '''
+    Prints the memory of both representations at every size.
+
+    Inputs:
+        sizes (list of int): Numbers of games to hold
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    templates, types_dict, categories_dict, mechanics_dict = parse_templates()
+    print(f"{'games':>8} {'layout':<12} {'MB':>9} {'bytes/game':>11} "
+        f"{'build s':>8} {'json s':>8} {'csv s':>8}")
+    for num_games in sizes:
+        results = {}
+        for layout, games in (("dict", {}), ("GameStore", bgg_record.GameStore())):
+            megabytes, build_seconds = build(games, templates, num_games)
+            json_seconds, csv_seconds = time_writes(games, types_dict,
+                categories_dict, mechanics_dict)
+            results[layout] = megabytes
+            print(f"{num_games:>8} {layout:<12} {megabytes:9.1f} "
+                f"{megabytes * 1024 ** 2 / num_games:11,.0f} "
+                f"{build_seconds:8.2f} {json_seconds:8.2f} {csv_seconds:8.2f}")
+            del games
+        print(f"{'':>8} GameStore uses {results['GameStore'] / results['dict']:.0%} "
+            "of the memory of dicts")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+",
+        default=[10000, 100000])
+    args = arg_parser.parse_args()
+    go(args.sizes)
@@ -0,0 +1,269 @@
+'''
+Compares the two steps of a game search before and after they were
+rewritten:
+
+    filter: search.filter_game_df's old chain of DataFrame.query(inplace=True)
+        calls, one per filter, against the plan of range predicates over
+        column arrays from game_query
+    index: the filter plan scanning the column of its most selective
+        predicate, against looking its rows up in the column's sorted index
+    rank: search.build_top_tuple's old full sort_values() and iterrows()
+        loop, against game_query.top_k() and results built from arrays
+    repeat: a whole search the first time it is run on a snapshot, against
+        the same search again, answered from the snapshot's result cache
+
+The all-games table is built from the synthetic games of benchmarks/mock_bgg.py,
+parsed and written by bgg_api as a real pull writes it, then loaded as the
+search server loads it (game_data.Snapshot). Random searches over the choices
+of the search form are run both ways, which must give the same rows and
+results, and the time per search of each is reported.
+
+Run from the project root:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --sizes 5000 100000 --searches 500
+'''
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import bgg_api
+import game_data
+import game_query
+import search
+from mock_bgg import CATEGORIES, MECHANICS, bgg_id_for_rank, render_api_response
+
+BATCH_SIZE = 500
+DIFFICULTIES = [["Low"], ["Moderate"], ["High"], ["Low", "Moderate"],
+    ["Moderate", "High"], ["Low", "High"]]
+TYPE_CHOICES = ["Abstract", "Customizable", "Thematic", "Family", "Children's",
+    "Party", "Strategy", "War"]
+
+
+def make_table(num_games, directory):
+    '''
+    Writes the all-games files of num_games synthetic games to directory.
+
+    Outputs:
+        Name of the CSV file of the table (str)
+    '''
+    games_dict = {}
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    bgg_ids = [bgg_id_for_rank(rank) for rank in range(1, num_games + 1)]
+    short_descriptions = {str(bgg_id): "[No Description]" for bgg_id in bgg_ids}
+    for start in range(0, num_games, BATCH_SIZE):
+        response = render_api_response(bgg_ids[start:start + BATCH_SIZE],
+            description_bytes=0)
+        bgg_api.get_game_info(response, games_dict, types_dict,
+            categories_dict, mechanics_dict, short_descriptions,
+            parser="iterparse")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            bgg_api.write_outputs(games_dict, types_dict, categories_dict,
+                mechanics_dict, "")
+    finally:
+        os.chdir(cwd)
+    return os.path.join(directory, "all_games.csv")
+
+
+def make_searches(num_searches, seed=0):
+    '''
+    Draws random searches over the choices of the search form.
+
+    Outputs:
+        List of search dicts, as returned by search.build_search_dict()
+    '''
+    rng = random.Random(seed)
+    searches = []
+    for _ in range(num_searches):
+        form = {}
+        if rng.random() < 0.7:
+            form["difficulty"] = rng.choice(DIFFICULTIES)
+        if rng.random() < 0.5:
+            form["game_types"] = rng.sample(TYPE_CHOICES, rng.randint(1, 3))
+        if rng.random() < 0.4:
+            form["game_cats"] = rng.sample(CATEGORIES, rng.randint(1, 3))
+        if rng.random() < 0.4:
+            form["game_mecs"] = rng.sample(MECHANICS, rng.randint(1, 3))
+        if rng.random() < 0.6:
+            form["min_players"] = rng.randint(1, 3)
+            form["max_players"] = rng.randint(3, 8)
+        if rng.random() < 0.5:
+            form["max_playtime"] = rng.choice([30, 60, 90, 120, 180])
+        form["preference"] = rng.choice([["Popularity"], ["Ratings"], []])
+        search_dict = search.build_search_dict(form)
+        # Filters the form cannot set through build_search_dict()
+        if rng.random() < 0.3:
+            search_dict["age"] = rng.choice([8, 10, 12, 14])
+        if rng.random() < 0.3:
+            search_dict["min_playtime"] = rng.choice([15, 30, 45])
+        searches.append(search_dict)
+    return searches
+
+
+def query_filter(search_dict, games_df, index):
+    '''
+    The filters of search.filter_game_df before game_query, one
+    DataFrame.query() per filter.
+    '''
+    games_df = games_df[index.match([
+        [("flag", "is_boardgame")],
+        [("type", name) for name in search.GAME_TYPES if search_dict[name]],
+        [("category", name) for name in search_dict["categories"]],
+        [("mechanic", name) for name in search_dict["mechanics"]]])].copy()
+    expressions = {"low": "averageweight < 2.5",
+        "moderate": "2.5 <= averageweight <= 3.5",
+        "high": "averageweight >= 3.5",
+        "low_moderate": "averageweight < 3.5",
+        "moderate_high": "averageweight >= 2.5",
+        "low_high": "averageweight < 2.5 | averageweight >= 3.5"}
+    if search_dict["difficulty"]:
+        games_df.query(expressions[search_dict["difficulty"]], inplace=True)
+    for key, expression in (("age", "age <= @value"),
+        ("min_players", "minplayers >= @value"),
+        ("max_players", "maxplayers <= @value"),
+        ("min_playtime", "minplaytime >= @value"),
+        ("max_playtime", "maxplaytime <= @value")):
+        value = search_dict[key]
+        if value:
+            games_df.query(expression, inplace=True)
+    return games_df
+
+
+def plan_rows(search_dict, snapshot, use_index):
+    '''
+    Rows search.filter_game_df keeps, with or without the sorted indexes.
+    '''
+    mask = snapshot.index.match([
+        [("flag", "is_boardgame")],
+        [("type", name) for name in search.GAME_TYPES if search_dict[name]],
+        [("category", name) for name in search_dict["categories"]],
+        [("mechanic", name) for name in search_dict["mechanics"]]])
+    plan = game_query.compile_plan(search_dict, snapshot.columns)
+    return game_query.run_plan(plan, snapshot.columns, mask, use_index)
+
+
+def sort_rank(search_dict, filtered_df, col_name, k=5):
+    '''
+    search.build_top_tuple before game_query.top_k(), with a stable sort so
+    ties come out in a set order.
+    '''
+    labels = dict(zip(search.GAME_TYPES, search.TYPE_LABELS))
+    filtered_df = filtered_df.sort_values(by=[col_name], ascending=False,
+        kind="stable")
+    rows = []
+    for row in filtered_df.head(k).iterrows():
+        rows.append([row[1]["name"], [labels[name] for name in search.GAME_TYPES
+            if row[1][name]], row[1]["minplayers"], row[1]["maxplayers"],
+            row[1]["playingtime"], row[1]["age"]])
+    return rows
+
+
+def top_rank(search_dict, filtered_df, col_name, k=5):
+    return search.build_top_tuple(search_dict, filtered_df, col_name, k)[1]
+
+
+def time_filter(function, searches):
+    '''
+    Outputs:
+        (list of results, list of seconds per search)
+    '''
+    results = []
+    seconds = []
+    for args in searches:
+        start = time.perf_counter()
+        results.append(function(*args))
+        seconds.append(time.perf_counter() - start)
+    return results, seconds
+
+
+def go(sizes=(5000, 50000), num_searches=200):
+    '''
+    Prints the time per search of every step, before and after, at every
+    size.
+
+    Inputs:
+        sizes (list of int): Numbers of games in the table
+        num_searches (int): Number of random searches to run
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    searches = make_searches(num_searches)
+    print(f"{'games':>8} {'step':<15} {'median ms':>10} {'mean ms':>9} "
+        f"{'p95 ms':>8}")
+    for num_games in sizes:
+        directory = tempfile.mkdtemp(prefix="bench_search_")
+        try:
+            snapshot = game_data.Snapshot(make_table(num_games, directory), None)
+        finally:
+            shutil.rmtree(directory)
+        old_results, old_seconds = time_filter(query_filter,
+            [(search_dict, snapshot.games, snapshot.index)
+            for search_dict in searches])
+        new_results, new_seconds = time_filter(search.filter_game_df,
+            [(search_dict, snapshot.games, snapshot.index, snapshot.columns)
+            for search_dict in searches])
+        mismatches = sum(not old.equals(new) or not old.index.equals(new.index)
+            for old, new in zip(old_results, new_results))
+        print_times(num_games, "filter", old_seconds, new_seconds, mismatches,
+            num_searches)
+        filtered_dfs = new_results
+        old_results, old_seconds = time_filter(plan_rows,
+            [(search_dict, snapshot, False) for search_dict in searches])
+        new_results, new_seconds = time_filter(plan_rows,
+            [(search_dict, snapshot, True) for search_dict in searches])
+        mismatches = sum(not np.array_equal(old, new)
+            for old, new in zip(old_results, new_results))
+        print_times(num_games, "index", old_seconds, new_seconds, mismatches,
+            num_searches)
+        rank_args = [(search_dict, filtered_df, "num_ratings")
+            for search_dict, filtered_df in zip(searches, filtered_dfs)]
+        old_results, old_seconds = time_filter(sort_rank, rank_args)
+        new_results, new_seconds = time_filter(top_rank, rank_args)
+        mismatches = sum(old != new for old, new in zip(old_results, new_results))
+        print_times(num_games, "rank", old_seconds, new_seconds, mismatches,
+            num_searches)
+        repeat_args = [(search_dict, snapshot) for search_dict in searches]
+        old_results, old_seconds = time_filter(search.search_games, repeat_args)
+        new_results, new_seconds = time_filter(search.search_games, repeat_args)
+        mismatches = sum(old != new for old, new in zip(old_results, new_results))
+        print_times(num_games, "repeat", old_seconds, new_seconds, mismatches,
+            num_searches)
+
+
+def print_times(num_games, step, old_seconds, new_seconds, mismatches,
+    num_searches):
+    '''
+    Prints the times of one step before and after, and how often they differ.
+    '''
+    for layout, seconds in (("before", old_seconds), ("after", new_seconds)):
+        print(f"{num_games:>8} {step + ' ' + layout:<15} "
+            f"{statistics.median(seconds) * 1000:10.3f} "
+            f"{statistics.mean(seconds) * 1000:9.3f} "
+            f"{sorted(seconds)[int(len(seconds) * 0.95)] * 1000:8.3f}")
+    speedup = statistics.median(old_seconds) / statistics.median(new_seconds)
+    print(f"{'':>8} {step} is {speedup:.1f}x faster (median), "
+        f"{mismatches} of {num_searches} searches differ")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+",
+        default=[5000, 50000])
+    arg_parser.add_argument("--searches", type=int, default=200)
+    args = arg_parser.parse_args()
+    go(args.sizes, args.searches)
@@ -0,0 +1,84 @@
+'''
+Compares the two ways of joining short descriptions onto games in
+bgg_api.get_game_info: the old per-game DataFrame.query() and the hash index
+from bgg_api.index_short_descriptions().
+
+A query scans the whole ID column, so a full pull costs O(n^2). Timing every
+query at 200k IDs would take hours, so the query is timed on a sample of
+lookups and projected to a full pull.
+
+Run from the project root:
+    python benchmarks/bench_short_descriptions.py
+    python benchmarks/bench_short_descriptions.py --sizes 5000 50000 200000
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+import bgg_api
+
+
+def make_ids(num_ids):
+    '''
+    Builds an ID/short_description DataFrame like import_ids() returns.
+    '''
+    ids = pd.DataFrame({
+        "ID": [str(bgg_id) for bgg_id in random.sample(range(1, 400000), num_ids)],
+        "short_description": [f"Short description of game {i}"
+            for i in range(num_ids)]})
+    return ids
+
+
+def time_query(ids, sample):
+    '''
+    Seconds per lookup with the old DataFrame.query() join.
+    '''
+    start = time.perf_counter()
+    for bgg_id in sample:
+        ids.query(f'ID == "{bgg_id}"')["short_description"].values[0]
+    return (time.perf_counter() - start) / len(sample)
+
+
+def time_index(ids):
+    '''
+    Seconds to build the hash index, and seconds per lookup in it.
+    '''
+    start = time.perf_counter()
+    short_descriptions = bgg_api.index_short_descriptions(ids)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for bgg_id in ids["ID"]:
+        short_descriptions[bgg_id]
+    return build, (time.perf_counter() - start) / len(ids)
+
+
+def go(sizes=(5000, 50000, 200000), sample_size=200):
+    '''
+    Prints per-lookup and full-pull join times at each number of IDs.
+    '''
+    random.seed(0)
+    print(f"{'IDs':>8} {'query/lookup':>14} {'query, full pull':>18} "
+        f"{'index build':>12} {'index/lookup':>14} {'index, full pull':>18}")
+    for num_ids in sizes:
+        ids = make_ids(num_ids)
+        sample = random.sample(list(ids["ID"]), min(sample_size, num_ids))
+        query = time_query(ids, sample)
+        build, lookup = time_index(ids)
+        print(f"{num_ids:>8} {query * 1e6:>12.1f}us {query * num_ids:>17.1f}s "
+            f"{build:>11.3f}s {lookup * 1e6:>12.3f}us "
+            f"{build + lookup * num_ids:>17.3f}s")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+",
+        default=[5000, 50000, 200000])
+    arg_parser.add_argument("--sample", type=int, default=200)
+    args = arg_parser.parse_args()
+    go(args.sizes, args.sample)
@@ -0,0 +1,191 @@
+'''
+Benchmark suite for the offline half of a pull: parsing API responses in
+bgg_api.get_game_info, building the CSV header and rows, and writing the
+JSON, CSV and Feather files, at several dataset sizes.
+
+No network is needed. Batches of 100 games are synthesized from the recorded
+xmlapi/boardgame responses in benchmarks/fixtures, one at a time, so a 100k
+game run does not hold 100k games of XML in memory. Each size runs in a
+fresh process, which reports its peak resident memory.
+
+Stages (seconds and games/sec each):
+    parse: building the parse tree and finding each <boardgame>
+    extract: reading each game's values and building its record
+    construct_fields: building the CSV header from the counters
+    write_json, write_csv, write_feather: writing the output files
+
+Results are written to benchmarks/results/latest.json and compared, stage by
+stage, with benchmarks/results/baseline.json when it exists. Save a run as
+the new baseline with --save-baseline.
+
+Run from the project root:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --sizes 1000 10000 --parser html5lib
+    python benchmarks/bench_suite.py --save-baseline
+'''
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bgg_api
+import bgg_metrics
+from bench_parsers import FIXTURES_DIR, load_responses, pad_response
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+STAGES = ["parse", "extract", "construct_fields", "write_json", "write_csv",
+    "write_feather"]
+
+
+def run_size(num_games, parser="iterparse", size=100,
+    fixtures_dir=FIXTURES_DIR):
+    '''
+    Times every stage over num_games synthesized games. Meant to run in a
+    fresh process, so the peak memory is that of this size alone.
+
+    Inputs:
+        num_games (int): Number of games to parse and write
+        parser (str): Parser backend in bgg_parse.PARSERS
+        size (int): Number of games per synthesized response
+        fixtures_dir (str): Directory of recorded .xml responses
+
+    Outputs:
+        Dictionary of stage timings, with games, bytes parsed and peak_rss_mb
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    responses = load_responses(fixtures_dir)
+    report = bgg_metrics.PullReport(num_games)
+    games_dict = {}
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    num_bytes = 0
+    for i, first_id in enumerate(range(1, num_games + 1, size)):
+        response, ids = pad_response(responses[i % len(responses)],
+            min(size, num_games - first_id + 1), first_id=first_id)
+        num_bytes += len(response)
+        short_descriptions = {bgg_id: "[No Description]" for bgg_id in ids}
+        bgg_api.get_game_info(response, games_dict, types_dict,
+            categories_dict, mechanics_dict, short_descriptions,
+            parser=parser, metrics=report)
+
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with report.stage("construct_fields"):
+            bgg_api.construct_fields(types_dict, categories_dict,
+                mechanics_dict)
+        with report.stage("write_json"):
+            with open("all_games_bench.json", "w") as out_file:
+                json.dump(games_dict, out_file, indent=6)
+        with report.stage("write_csv"):
+            bgg_api.construct_csv(games_dict, types_dict, categories_dict,
+                mechanics_dict, "_bench")
+        with report.stage("write_feather"):
+            bgg_api.construct_feather(games_dict, types_dict, categories_dict,
+                mechanics_dict, "_bench")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+    results = {"games": len(games_dict), "bytes": num_bytes,
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)}
+    for stage in STAGES:
+        seconds = report.stages[stage]["wall"]
+        results[stage] = {"seconds": round(seconds, 4),
+            "games_per_sec": round(len(games_dict) / seconds, 1)
+                if seconds else None}
+    return results
+
+
+def compare(results, baseline):
+    '''
+    Prints the change in time of every stage against a baseline run.
+
+    Inputs:
+        results (dict): Results of this run, as written by go()
+        baseline (dict): Results of the baseline run
+    '''
+    print(f"\nAgainst baseline of {baseline['meta']['date']} "
+        f"({baseline['meta']['parser']}, {baseline['meta']['python']})")
+    for num_games, stages in results["sizes"].items():
+        before = baseline["sizes"].get(num_games)
+        if before is None:
+            continue
+        changes = []
+        for stage in STAGES:
+            old = before[stage]["seconds"]
+            new = stages[stage]["seconds"]
+            if old:
+                changes.append(f"{stage} {(new - old) / old:+.0%}")
+        memory = (stages["peak_rss_mb"] - before["peak_rss_mb"]) \
+            / before["peak_rss_mb"]
+        print(f"    {int(num_games):>7} games: " + ", ".join(changes) +
+            f", peak memory {memory:+.0%}")
+
+
+def go(sizes=(1000, 10000, 100000), parser="iterparse",
+    fixtures_dir=FIXTURES_DIR, save_baseline=False):
+    '''
+    Runs the suite at every size, prints games per second and peak memory,
+    and stores the results.
+
+    Inputs:
+        sizes (list of int): Numbers of games to run with
+        parser (str): Parser backend in bgg_parse.PARSERS
+        fixtures_dir (str): Directory of recorded .xml responses
+        save_baseline (bool): If True, also store the results as the baseline
+            for later runs. Default = False.
+    '''
+    results = {"meta": {"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parser": parser, "python": platform.python_version(),
+        "platform": platform.platform(), "cpus": os.cpu_count()}, "sizes": {}}
+    context = multiprocessing.get_context("spawn")
+    print(f"Parser {parser}, games/sec by stage")
+    print(f"    {'games':>7} " + " ".join(f"{stage:>16}" for stage in STAGES) +
+        f" {'peak MB':>8}")
+    for num_games in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            stages = pool.submit(run_size, num_games, parser,
+                fixtures_dir=fixtures_dir).result()
+        results["sizes"][str(num_games)] = stages
+        print(f"    {num_games:>7} " + " ".join(
+            f"{stages[stage]['games_per_sec']:>16,.0f}" for stage in STAGES) +
+            f" {stages['peak_rss_mb']:>8.1f}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "latest.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    baseline_path = os.path.join(RESULTS_DIR, "baseline.json")
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            compare(results, json.load(f))
+    if save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved as baseline: {baseline_path}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+",
+        default=[1000, 10000, 100000])
+    arg_parser.add_argument("--parser", default="iterparse")
+    arg_parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    arg_parser.add_argument("--save-baseline", action="store_true")
+    args = arg_parser.parse_args()
+    go(args.sizes, args.parser, args.fixtures, args.save_baseline)
@@ -0,0 +1,132 @@
+'''
+Load test of the whole data pull against the local mock site in
+benchmarks/mock_bgg.py: crawl the browse pages, pull every game from the
+API, and write every output file, with no access to boardgamegeek.com.
+
+    pipelined: bgg_crawler.crawl_to_index() feeding bgg_api.go(rows=...), as
+        main.py runs it
+    ingest: the crawl, then the asyncio pipeline in bgg_ingest.go
+
+The report gives the time and games per second of the whole pull, what the
+mock server saw (requests, 429s, 503s, bytes), and the slowest stages from
+the pull's timing report (all_games_load_report.json, pipelined only).
+
+Run from the project root:
+    python benchmarks/load_test.py --games 10000
+    python benchmarks/load_test.py --games 100000 --client-rate 50 --parser iterparse
+    python benchmarks/load_test.py --server-rate 5 --client-rate 8 --error-rate 0.05 --adaptive
+'''
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bgg_api
+import bgg_crawler
+import bgg_ingest
+import bgg_rate
+from mock_bgg import add_server_arguments, server_options, start_server
+
+
+def run_pull(engine, num_games, base_url, size, client_rate, parser, adaptive,
+    crawl_workers):
+    '''
+    Crawls and pulls num_games games from base_url in the current directory.
+    '''
+    index_filename = "game_ids_load.csv"
+    limiter = bgg_rate.TokenBucket(rate=client_rate,
+        capacity=max(1, client_rate))
+    if engine == "pipelined":
+        rows = bgg_crawler.crawl_to_index(num_games, index_filename,
+            max_workers=crawl_workers, base_url=base_url)
+        bgg_api.go(index_filename, limit=num_games, size=size,
+            file_suffix_out="_load", parser=parser, limiter=limiter,
+            adaptive=adaptive, rows=rows, base_url=base_url)
+    else:
+        bgg_crawler.go(num_games, index_filename, max_workers=crawl_workers,
+            base_url=base_url)
+        bgg_ingest.go(index_filename, limit=num_games, size=size,
+            file_suffix_out="_load", parser=parser, limiter=limiter,
+            adaptive=adaptive, base_url=base_url)
+
+
+def go(num_games=10000, engine="pipelined", size=100, client_rate=20.0,
+    parser="iterparse", adaptive=False, crawl_workers=4, keep=False,
+    **server_config):
+    '''
+    Starts the mock site, runs one pull against it and prints the results.
+
+    Inputs:
+        num_games (int): Number of games to crawl and pull
+        engine (str): "pipelined" or "ingest"
+        size (int): Starting number of IDs per API request
+        client_rate (float): API requests per second the client allows itself
+        parser (str): Parser backend in bgg_parse.PARSERS
+        adaptive (bool): If True, adapt the batch size to the server
+        crawl_workers (int): Browse pages to fetch at the same time
+        keep (bool): If True, keep the output files and print where they are
+        server_config: Keyword arguments of mock_bgg.start_server()
+    '''
+    warnings.filterwarnings("ignore", category=UserWarning)
+    bgg_rate.BACKOFF_BASE = 0.25
+    server = start_server(num_games, **server_config)
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        run_pull(engine, num_games, server.base_url, size, client_rate, parser,
+            adaptive, crawl_workers)
+        seconds = time.perf_counter() - start
+        with open("all_games_load.csv", newline="") as f:
+            num_rows = sum(1 for row in csv.reader(f)) - 1
+        report = None
+        if os.path.exists("all_games_load_report.json"):
+            with open("all_games_load_report.json") as f:
+                report = json.load(f)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        if keep:
+            print(f"\nOutput files kept in {workdir}")
+        else:
+            shutil.rmtree(workdir)
+
+    print(f"\n{engine} pull of {num_games} games from {server.base_url}, "
+        f"client rate {client_rate}/sec, batches of {size}"
+        f"{' (adaptive)' if adaptive else ''}, {parser}")
+    print(f"    {seconds:8.2f}s  {num_games / seconds:10.1f} games/sec  "
+        f"{num_rows} games written")
+    print(f"    server: {server.requests} requests, {server.throttled} throttled, "
+        f"{server.errors} failed, {server.games_served} games, "
+        f"{server.bytes_served / 1024 ** 2:.1f} MB")
+    if report is not None:
+        stages = sorted(report["stages"].items(),
+            key=lambda item: item[1]["wall"], reverse=True)
+        print("    slowest stages: " + ", ".join(f"{name} {stage['wall']:.2f}s"
+            for name, stage in stages[:5]))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--games", type=int, default=10000)
+    arg_parser.add_argument("--engine", choices=["pipelined", "ingest"],
+        default="pipelined")
+    arg_parser.add_argument("--size", type=int, default=100)
+    arg_parser.add_argument("--client-rate", type=float, default=20.0)
+    arg_parser.add_argument("--parser", default="iterparse")
+    arg_parser.add_argument("--adaptive", action="store_true")
+    arg_parser.add_argument("--crawl-workers", type=int, default=4)
+    arg_parser.add_argument("--keep", action="store_true")
+    add_server_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    go(args.games, args.engine, args.size, args.client_rate, args.parser,
+        args.adaptive, args.crawl_workers, args.keep, **server_options(args))
@@ -0,0 +1,364 @@
+'''
+Local stand-in for boardgamegeek.com, for load testing the crawler and the
+API client offline and at any number of games.
+
+It serves the two kinds of page the project reads:
+
+    /browse/boardgame/page/<page>?sort=numvoters&sortdir=desc
+        Browse pages of 100 games in descending number of voters, laid out
+        as bgg_crawler.parse_page() expects. Pages past --games are empty.
+    /xmlapi/boardgame/<id>,<id>,...?stats=1
+        API responses with every element bgg_parse reads: names, player
+        counts and times, polls, categories, mechanics, ranks and ratings.
+
+Games are synthetic but the same on every request: each one is generated
+from a random number generator seeded with its ID. Responses can be slowed
+down (--latency, --latency-per-game), throttled with 429 and Retry-After
+above --server-rate requests per second, failed with 503 at --error-rate,
+and padded with --description-bytes of description per game.
+
+Point the project at it with base_url:
+    python benchmarks/mock_bgg.py --port 8000 --games 100000
+    bgg_crawler.go(1000, "ids.csv", base_url="http://127.0.0.1:8000")
+    bgg_api.go("ids.csv", limit=1000, base_url="http://127.0.0.1:8000")
+
+or start it in-process with start_server(), as benchmarks/load_test.py does.
+'''
+import argparse
+import http.server
+import random
+import re
+import threading
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+GAMES_PER_PAGE = 100
+CATEGORIES = ["Card Game", "Wargame", "Fantasy", "Fighting", "Economic",
+    "Science Fiction", "Dice", "Party Game", "Abstract Strategy", "Adventure",
+    "Exploration", "Medieval", "Bluffing", "Deduction", "Miniatures",
+    "Ancient", "Negotiation", "Humor", "Horror", "Civilization", "Animals",
+    "Puzzle", "Territory Building", "City Building", "Trains", "Nautical",
+    "Space Exploration", "Mythology", "Educational", "Sports"]
+MECHANICS = ["Dice Rolling", "Hand Management", "Set Collection",
+    "Variable Player Powers", "Hexagon Grid", "Area Majority / Influence",
+    "Tile Placement", "Cooperative Game", "Worker Placement",
+    "Modular Board", "Action Points", "Deck, Bag, and Pool Building",
+    "Grid Movement", "Simultaneous Action Selection", "Trading",
+    "Route/Network Building", "Auction/Bidding", "Push Your Luck",
+    "Pattern Building", "Drafting", "Income", "Team-Based Game",
+    "Roll / Spin and Move", "Memory", "Network and Route Building",
+    "Take That", "Voting", "Open Drafting", "End Game Bonuses",
+    "Campaign / Battle Card Driven"]
+NOT_GAME_CATEGORIES = ["Expansion for Base-game", "Fan Expansion",
+    "Game System"]
+FAMILIES = [("strategygames", "Strategy Game"), ("familygames", "Family Game"),
+    ("thematic", "Thematic"), ("partygames", "Party Game"),
+    ("abstracts", "Abstract Game"), ("childrensgames", "Children's Game"),
+    ("cgs", "Customizable"), ("wargames", "War Game")]
+LANGUAGES = ["No necessary in-game text",
+    "Some necessary text - easily memorized or small crib sheet",
+    "Moderate in-game text - needs crib sheet or paste ups",
+    "Extensive use of text - massive conversion needed to be playable",
+    "Unplayable in another language"]
+PLAYER_AGES = ["2", "3", "4", "5", "6", "8", "10", "12", "14", "16", "18",
+    "21 and up"]
+# Some words are not ASCII, as many BGG names and descriptions are not, so a
+# parser that decodes the responses wrongly garbles them
+WORDS = ["players", "build", "trade", "cards", "island", "empire", "dice",
+    "race", "explore", "resources", "victory", "points", "secret", "ancient",
+    "kingdom", "score", "round", "tiles", "board", "turn", "café", "zürich",
+    "tokaidō", "señor"]
+
+
+def bgg_id_for_rank(rank):
+    '''
+    Outputs:
+        BGG ID (int) of the game at a 1-based rank by number of voters
+    '''
+    return 3 * rank + 10
+
+
+def rank_for_bgg_id(bgg_id):
+    '''
+    Outputs:
+        Rank (int) of a BGG ID, or None if no browse page lists it
+    '''
+    rank, remainder = divmod(bgg_id - 10, 3)
+    return rank if remainder == 0 and rank >= 1 else None
+
+
+def num_voters_for_rank(rank):
+    return 120000 // rank + 100
+
+
+def game_name(rng, bgg_id):
+    return f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {bgg_id}"
+
+
+def render_game(bgg_id, description_bytes=1500):
+    '''
+    Renders the <boardgame> element of one synthetic game.
+
+    Inputs:
+        bgg_id (int): BGG ID, which seeds every value of the game
+        description_bytes (int): Approximate length of the description
+
+    Outputs:
+        XML (str)
+    '''
+    rng = random.Random(bgg_id)
+    rank = rank_for_bgg_id(bgg_id)
+    num_voters = num_voters_for_rank(rank) if rank else rng.randint(0, 100)
+    minplayers = rng.randint(1, 4)
+    maxplayers = minplayers + rng.randint(0, 6)
+    minplaytime = rng.choice([15, 20, 30, 45, 60, 90, 120])
+    maxplaytime = minplaytime * rng.choice([1, 1, 2, 3])
+    sentence = " ".join(rng.choice(WORDS) for _ in range(12)) + ".&lt;br/&gt;"
+    description = (sentence * (description_bytes // len(sentence) + 1)
+        )[:description_bytes]
+    # Cutting it short must not leave half an entity, which is not valid XML
+    description = re.sub(r"&[a-z]*$", "", description)
+    categories = rng.sample(CATEGORIES, rng.randint(1, 4))
+    if rng.random() < 0.05:
+        categories.append(rng.choice(NOT_GAME_CATEGORIES))
+    mechanics = rng.sample(MECHANICS, rng.randint(1, 6))
+    average = round(rng.uniform(4, 9), 5)
+
+    lines = [f'<boardgame objectid="{bgg_id}">',
+        f"<yearpublished>{rng.randint(1950, 2021)}</yearpublished>",
+        f"<minplayers>{minplayers}</minplayers>",
+        f"<maxplayers>{maxplayers}</maxplayers>",
+        f"<playingtime>{maxplaytime}</playingtime>",
+        f"<minplaytime>{minplaytime}</minplaytime>",
+        f"<maxplaytime>{maxplaytime}</maxplaytime>",
+        f"<age>{rng.choice([6, 8, 10, 12, 14])}</age>",
+        f'<name sortindex="1">{escape(game_name(rng, bgg_id))}</name>',
+        f'<name primary="true" sortindex="1">{escape(game_name(rng, bgg_id))}</name>',
+        f"<description>{description}</description>",
+        f"<thumbnail>https://cf.geekdo-images.com/thumb/pic{bgg_id}.jpg</thumbnail>",
+        f"<image>https://cf.geekdo-images.com/original/pic{bgg_id}.jpg</image>"]
+    lines.extend(f'<boardgamemechanic objectid="{2000 + MECHANICS.index(name)}">'
+        f"{escape(name)}</boardgamemechanic>" for name in mechanics)
+    lines.extend(f'<boardgamecategory objectid="{1000 + i}">{escape(name)}'
+        "</boardgamecategory>" for i, name in enumerate(categories))
+
+    lines.append('<poll title="User Suggested Number of Players" '
+        f'totalvotes="{rng.randint(0, 2000)}" name="suggested_numplayers">')
+    for numplayers in list(range(minplayers, maxplayers + 1)) + [f"{maxplayers}+"]:
+        lines.append(f'<results numplayers="{numplayers}">')
+        for value in ("Best", "Recommended", "Not Recommended"):
+            lines.append(f'<result value="{value}" '
+                f'numvotes="{rng.randint(0, 500)}" />')
+        lines.append("</results>")
+    lines.append("</poll>")
+    lines.append('<poll title="Language Dependence" '
+        f'totalvotes="{rng.randint(0, 400)}" name="language_dependence"><results>')
+    lines.extend(f'<result level="{level}" value={quoteattr(value)} '
+        f'numvotes="{rng.randint(0, 300)}" />'
+        for level, value in enumerate(LANGUAGES, start=1))
+    lines.append("</results></poll>")
+    lines.append('<poll title="User Suggested Player Age" '
+        f'totalvotes="{rng.randint(0, 600)}" name="suggested_playerage"><results>')
+    lines.extend(f'<result value="{value}" numvotes="{rng.randint(0, 250)}" />'
+        for value in PLAYER_AGES)
+    lines.append("</results></poll>")
+
+    lines.append(f'<statistics page="1"><ratings>'
+        f"<usersrated>{num_voters}</usersrated><average>{average}</average>"
+        f"<bayesaverage>{average - 0.3:.5f}</bayesaverage><ranks>")
+    board_game_rank = rank if rank and rng.random() > 0.02 else "Not Ranked"
+    lines.append('<rank type="subtype" id="1" name="boardgame" '
+        f'friendlyname="Board Game Rank" value="{board_game_rank}" '
+        f'bayesaverage="{average - 0.3:.5f}" />')
+    for name, friendlyname in rng.sample(FAMILIES, rng.randint(0, 2)):
+        lines.append(f'<rank type="family" id="{5000 + len(name)}" '
+            f'name="{name}" friendlyname={quoteattr(friendlyname + " Rank")} '
+            f'value="{rng.randint(1, 3000)}" '
+            f'bayesaverage="{rng.uniform(5, 8):.5f}" />')
+    lines.append("</ranks>"
+        f"<stddev>{rng.uniform(1, 2):.5f}</stddev><median>0</median>"
+        f"<owned>{num_voters * 2}</owned>"
+        f"<averageweight>{rng.uniform(1, 5):.4f}</averageweight>"
+        "</ratings></statistics>")
+    lines.append("</boardgame>")
+    return "\n\t\t".join(lines)
+
+
+def render_api_response(bgg_ids, description_bytes=1500):
+    '''
+    Outputs:
+        xmlapi/boardgame response (bytes) with one game per ID, in order
+    '''
+    games = "\n\t".join(render_game(bgg_id, description_bytes)
+        for bgg_id in bgg_ids)
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<boardgames '
+        'termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">\n\t'
+        f"{games}\n</boardgames>\n").encode("utf-8")
+
+
+def render_browse_page(page, num_games):
+    '''
+    Outputs:
+        HTML (bytes) of a browse page of a catalogue of num_games games
+    '''
+    rows = ['<tr><th class="collection_rank">Board Game Rank</th>'
+        '<th>Title</th><th>Geek Rating</th><th>Avg Rating</th>'
+        '<th>Num Voters</th></tr>']
+    first = (page - 1) * GAMES_PER_PAGE + 1
+    for rank in range(first, min(first + GAMES_PER_PAGE, num_games + 1)):
+        bgg_id = bgg_id_for_rank(rank)
+        rng = random.Random(bgg_id)
+        name = game_name(rng, bgg_id)
+        slug = re.sub(r"\W+", "-", name.lower())
+        rows.append(f'<tr id="row_"><td class="collection_rank">{rank}</td>'
+            '<td class="collection_objectname"><div>'
+            f'<a href="/boardgame/{bgg_id}/{slug}" class="primary">'
+            f"{escape(name)}</a></div>"
+            f'<p class="smallefont dull">A game about '
+            f"{rng.choice(WORDS)} and {rng.choice(WORDS)}</p></td>"
+            f'<td class="collection_bggrating">{rng.uniform(5, 8):.3f}</td>'
+            f'<td class="collection_bggrating">{rng.uniform(5, 9):.2f}</td>'
+            f'<td class="collection_bggrating">{num_voters_for_rank(rank)}</td>'
+            "</tr>")
+    return ("<html><body><table class=\"collection_table\"><tbody>" +
+        "".join(rows) + "</tbody></table></body></html>").encode("utf-8")
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    Serves browse pages and API responses, with the latency, throttling and
+    errors configured on the server object.
+    '''
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        browse = re.match(r"/browse/boardgame/page/(\d+)", self.path)
+        api = re.match(r"/xmlapi/boardgame/([\d,]+)", self.path)
+        if not browse and not api:
+            self.send_body(404, b"", "text/plain")
+            return
+        with server.lock:
+            server.requests += 1
+            now = time.monotonic()
+            throttled = (api is not None and server.rate > 0
+                and now - server.last_request < 1 / server.rate)
+            if api is not None and not throttled:
+                server.last_request = now
+            failed = not throttled and server.random.random() < server.error_rate
+            if throttled:
+                server.throttled += 1
+            elif failed:
+                server.errors += 1
+        if throttled:
+            self.send_body(429, b"", "text/plain", {"Retry-After": "1"})
+        elif failed:
+            self.send_body(503, b"", "text/plain")
+        elif browse:
+            time.sleep(server.page_latency)
+            self.send_body(200, render_browse_page(int(browse.group(1)),
+                server.num_games), "text/html; charset=utf-8")
+        else:
+            bgg_ids = [int(bgg_id) for bgg_id in api.group(1).split(",")
+                if bgg_id]
+            body = render_api_response(bgg_ids, server.description_bytes)
+            time.sleep(server.latency + len(bgg_ids) * server.latency_per_game)
+            with server.lock:
+                server.games_served += len(bgg_ids)
+                server.bytes_served += len(body)
+            self.send_body(200, body, "text/xml; charset=utf-8")
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(num_games=100000, port=0, rate=0, error_rate=0.0,
+    latency=0.0, latency_per_game=0.0, page_latency=0.0,
+    description_bytes=1500, seed=0, background=True):
+    '''
+    Starts the mock site.
+
+    Inputs:
+        num_games (int): Number of games on the browse pages
+        port (int): Port to listen on. Default = 0, which picks a free one.
+        rate (float): API requests per second to allow before answering 429.
+            Default = 0, which never throttles.
+        error_rate (float): Share of requests to fail with 503
+        latency (float): Seconds every API response takes
+        latency_per_game (float): Extra seconds per game in an API response
+        page_latency (float): Seconds every browse page takes
+        description_bytes (int): Length of each game's description
+        seed (int): Seed of the injected errors
+        background (bool): If True, serve from a daemon thread and return;
+            otherwise serve until interrupted. Default = True.
+
+    Outputs:
+        http.server.ThreadingHTTPServer, with base_url set to its address and
+            requests, throttled, errors, games_served and bytes_served counts
+    '''
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.num_games = num_games
+    server.rate = rate
+    server.error_rate = error_rate
+    server.latency = latency
+    server.latency_per_game = latency_per_game
+    server.page_latency = page_latency
+    server.description_bytes = description_bytes
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.last_request = 0.0
+    server.requests = server.throttled = server.errors = 0
+    server.games_served = server.bytes_served = 0
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        print(f"Mock BoardGameGeek serving {num_games} games at {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    return server
+
+
+def add_server_arguments(arg_parser):
+    '''
+    Adds the options of start_server() to an argparse parser.
+    '''
+    arg_parser.add_argument("--server-rate", type=float, default=0)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--latency", type=float, default=0.0)
+    arg_parser.add_argument("--latency-per-game", type=float, default=0.0)
+    arg_parser.add_argument("--page-latency", type=float, default=0.0)
+    arg_parser.add_argument("--description-bytes", type=int, default=1500)
+
+
+def server_options(args):
+    '''
+    Outputs:
+        Keyword arguments of start_server() from add_server_arguments() options
+    '''
+    return {"rate": args.server_rate, "error_rate": args.error_rate,
+        "latency": args.latency, "latency_per_game": args.latency_per_game,
+        "page_latency": args.page_latency,
+        "description_bytes": args.description_bytes}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--games", type=int, default=100000)
+    add_server_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    start_server(args.games, args.port, background=False, **server_options(args))
@@ -6,20 +6,51 @@ Author: James Midkiff
 Course: CAPP 30122 Final Project
 Date: March, 2021
 '''
-import re
 import pandas as pd
 import requests 
 import bs4
 import json
 import csv
 import time
+import os
+import itertools
+import threading
+import bgg_parse
+import bgg_cache
+import bgg_rate
+import bgg_jsonl
+import bgg_metrics
+import bgg_quarantine
+import bgg_record
+import bgg_tags
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def go(file_in, limit=5000, size=100, start=1, file_suffix_out=""): 
+try: 
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError: # Write every output but the Feather file
+    pa = pyarrow = None
+
+API_URL = "http://www.boardgamegeek.com/xmlapi/boardgame/"
+API_PATH = "/xmlapi/boardgame/"
+# Rows in each record batch of the Feather file, the most held in memory 
+# while it is written
+FEATHER_BATCH_SIZE = 10000
+
+def go(file_in, limit=5000, size=100, start=1, file_suffix_out="", 
+    parser="html5lib", cache=None, resume=False, limiter=None, adaptive=False, 
+    output="json", parse_workers=None, compact=False, rows=None, base_url=None): 
     '''
     Overall function to pull data from BoardGameGeek API. 
     
-    This function includes a mandatory wait time of 5 seconds. At limit=5000, 
-    size=100, start=0, this function takes approximately 11 minutes to run. 
+    Calls to the API are rate limited to one every 5 seconds by default, and 
+    throttled (429) or failed (5xx) calls are retried with exponential backoff. 
+    Each batch is parsed while the next one is being fetched. At limit=5000, 
+    size=100, start=0, the rate limit alone accounts for about 4 minutes. 
+    Batches served from a response cache are not rate limited, so a fully 
+    cached run takes seconds. A game that cannot be read from its response 
+    is set aside in a quarantine file (see bgg_quarantine) instead of 
+    stopping the pull; pull it again later with reprocess(). 
 
     Inputs: 
         file_in (str): Name of file that contains game IDs and short descriptions
@@ -30,15 +61,68 @@ def go(file_in, limit=5000, size=100, start=1, file_suffix_out=""):
         start (int): Index number to begin at. Primarily used for debugging. 
         file_suffix_out (str): Suffix to add to all filenames out, such as 
             "_actual", "_test", etc. Default = "", which is used for full data pull. 
+        parser (str): Parser backend in bgg_parse.PARSERS, either "html5lib" 
+            or the much faster streaming "iterparse". Default = "html5lib". 
+        cache (bgg_cache.ResponseCache): On-disk cache of API responses. Use 
+            ResponseCache(offline=True) to replay a previous pull without 
+            calling the API. Default = None, which always calls the API. 
+        resume (bool): If True, restart from the last batch completed by an 
+            earlier run with the same file_in, limit, size and file_suffix_out, 
+            instead of starting over. Default = False. 
+        limiter (bgg_rate.TokenBucket): Rate limiter for calls to the API. 
+            Default = None, which allows one call every 5 seconds. 
+        adaptive (bool): If True, treat size as a starting point, growing it 
+            while the API responds well and shrinking it on throttling, errors 
+            or oversized responses. Default = False. 
+        output (str): Format of the file of all game information. "json" builds 
+            every game in memory and writes one indented JSON file at the end. 
+            "jsonl" streams each game to a JSON Lines file as soon as it is 
+            parsed, so memory use does not grow with limit; read it back with 
+            bgg_jsonl.read_games(). Default = "json". 
+        parse_workers (int): Number of processes to split the parsing of each 
+            batch across. Default = None, which parses in this process. 
+        compact (bool): If True and output is "json", hold games in memory as 
+            compact bgg_record.GameRecord rows instead of dicts until they are 
+            written. The files written are the same. Default = False. 
+        rows (iterable): Rows of (game ID, short description, number of 
+            voters) to pull while they arrive, such as bgg_crawler.crawl_to_index() 
+            yields while it writes file_in, instead of reading file_in first. 
+            The rows are read in a background thread, and batches are sent to 
+            the API as soon as the crawl has enough IDs for them, so the crawl 
+            and the pull overlap. Progress counts towards limit IDs until the 
+            crawl ends and the number it found is known. Default = None. 
+        base_url (str): Site to call the API on, such as a local mock server 
+            (see benchmarks/mock_bgg.py). Default = None, which uses API_URL. 
     Outputs: 
-        1) Writes all game information to JSON file. 
+        1) Writes all game information to JSON or JSON Lines file. 
         2) Calls function to write all game information (limiting to 10 most 
-            popular categories and mechanics) to CSV file. 
+            popular categories and mechanics) to CSV file, and again to a typed 
+            Feather file if pyarrow is installed. 
         3) Calls function to write game type counts to CSV file. 
         4) Calls function to write game categories counts to CSV file. 
         5) Calls function to write game mechanics counts to CSV file. 
+        6) Calls function to write every game's types, categories and 
+            mechanics as a sparse matrix, with its vocabulary. 
+        7) Writes a report of the time spent in each stage, per batch and in 
+            total, with bytes, retries and games per second (see bgg_metrics). 
+        8) Writes any games that could not be read, with their XML and error, 
+            to a quarantine file. 
     '''
-    ids = import_ids(file_in)
+    if rows is None: 
+        ids = import_ids(file_in)
+        short_descriptions = index_short_descriptions(ids)
+        ids = list(ids["ID"][:limit])
+        num_ids = len(ids)
+    else: 
+        ids = StreamedIds(rows, limit)
+        short_descriptions = ids.short_descriptions
+        num_ids = limit
+    if limiter is None: 
+        limiter = bgg_rate.TokenBucket(rate=1 / 5)
+    if adaptive: 
+        sizer = bgg_rate.BatchSizer(size)
+    else: 
+        sizer = bgg_rate.FixedBatchSizer(size)
     
     start = start
     end = min(start + size - 1, limit)
@@ -46,45 +130,603 @@ def go(file_in, limit=5000, size=100, start=1, file_suffix_out=""):
     types_dict = {}
     categories_dict = {}
     mechanics_dict = {}
+    checkpoint_path = f"all_games{file_suffix_out}_checkpoint.jsonl"
+    games_path = f"all_games{file_suffix_out}.{output}"
+    quarantine_path = bgg_quarantine.quarantine_path(file_suffix_out)
+    run_params = {"file_in": file_in, "limit": limit, "size": size, 
+        "output": output}
     print(f"\nObtaining BoardGameGeek information for top {limit} IDs by number of votes")
-    while True:
-        print(f'Pulling IDs {start}-{end}')
-        batch = ",".join(list(ids.loc[start - 1:end - 1,"ID"]))
-        # print(batch)
-        print("~~~~~~~~~~~~")
-        soup = call_api(batch)
-        short_descriptions = ids.loc[start - 1:end - 1]
-        get_game_info(soup, games_dict, 
-            types_dict, categories_dict, mechanics_dict, short_descriptions)
-        start += size
-        end = start + size
-        if end > len(ids) or end > limit:
-            end = min(len(ids), limit)
-        if start > limit:
-            break
-        time.sleep(5)
+    checkpoint = None
+    if resume and os.path.exists(checkpoint_path): 
+        checkpoint = load_checkpoint(checkpoint_path, run_params)
+    if checkpoint is not None: 
+        (start, end, games_dict, types_dict, categories_dict, mechanics_dict, 
+            offset) = checkpoint
+        if output == "jsonl": 
+            games_dict = bgg_jsonl.JsonLinesWriter(games_path, offset=offset)
+        print(f'Resuming from checkpoint with {len(games_dict)} games pulled')
+    else: 
+        start_checkpoint(checkpoint_path, run_params)
+        bgg_quarantine.start_quarantine(quarantine_path)
+        if output == "jsonl": 
+            games_dict = bgg_jsonl.JsonLinesWriter(games_path)
+    if compact and output == "json": 
+        games_dict = bgg_record.GameStore(games_dict)
+    first = start
+    report = bgg_metrics.PullReport(max(num_ids - first + 1, 0), 
+        params=dict(run_params, parser=parser, adaptive=adaptive, 
+        parse_workers=parse_workers, resumed=checkpoint is not None))
+    parse_pool = None
+    if parse_workers is not None and parse_workers > 1: 
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers)
+    with ThreadPoolExecutor(max_workers=1) as executor: 
+        # Fetch the next batch in the background while this one is parsed
+        next_ids = ids[start - 1:end]
+        if next_ids: 
+            next_stats = {}
+            next_fetch = executor.submit(fetch_api, ",".join(next_ids), cache, 
+                limiter, sizer, next_stats, base_url)
+        while next_ids:
+            report.start_batch()
+            batch_start, batch_end = start, start + len(next_ids) - 1
+            with report.stage("fetch_wait"): 
+                response = next_fetch.result()
+            fetch_stats = next_stats
+            report.add_fetch(fetch_stats)
+            start = batch_end + 1
+            end = min(start + sizer.size - 1, limit)
+            # With rows, waits here until the crawl has reached end
+            next_ids = ids[start - 1:end]
+            if next_ids: 
+                next_stats = {}
+                next_fetch = executor.submit(fetch_api, ",".join(next_ids), 
+                    cache, limiter, sizer, next_stats, base_url)
+            num_games_before = len(games_dict)
+            failures = []
+            get_game_info(response, games_dict, 
+                types_dict, categories_dict, mechanics_dict, short_descriptions, 
+                parser=parser, executor=parse_pool, num_shards=parse_workers, 
+                metrics=report, failures=failures)
+            with report.stage("checkpoint"): 
+                if failures: 
+                    # Saved before the checkpoint, so a resumed run never 
+                    # skips past a game without its entry
+                    bgg_quarantine.add_entries(quarantine_path, failures)
+                if output == "jsonl": 
+                    # The games are already on disk; checkpoint how far they go
+                    write_checkpoint(checkpoint_path, start, end, {}, types_dict, 
+                        categories_dict, mechanics_dict, offset=games_dict.flush())
+                else: 
+                    write_checkpoint(checkpoint_path, start, end, {bgg_id: dict(info) 
+                        for bgg_id, info in itertools.islice(games_dict.items(), 
+                        num_games_before, None)}, 
+                        types_dict, categories_dict, mechanics_dict)
+            if rows is not None and ids.num_ids() is not None: 
+                # The crawl can find fewer than limit games
+                report.total_ids = max(ids.num_ids() - first + 1, 0)
+            report.add_batch(batch_start, batch_end, 
+                len(games_dict) - num_games_before, fetch_stats, len(failures))
+    if parse_pool is not None: 
+        parse_pool.shutdown()
+    if rows is not None: 
+        ids.finish()
     
-    with open(f"all_games{file_suffix_out}.json", "w") as out_file:
-        json.dump(games_dict, out_file, indent=6)
+    write_outputs(games_dict, types_dict, categories_dict, mechanics_dict, 
+        file_suffix_out, output, report=report)
+    bgg_quarantine.finish_quarantine(quarantine_path, len(games_dict))
+    os.remove(checkpoint_path)
+
+
+class StreamedIds: 
+    '''
+    Stand-in for the list of IDs in go() that reads rows from a crawl in a 
+    background thread, collecting the short descriptions on the way, so the 
+    crawl runs at its own pace while the API is called. Slicing waits until 
+    the crawl has reached the end of the slice or finished. 
+
+    Inputs: 
+        rows (iterable): Rows of (game ID, short description, number of voters)
+        limit (int): Most IDs to read
+    '''
+    def __init__(self, rows, limit): 
+        self.rows = rows
+        self.limit = limit
+        self.ids = []
+        self.short_descriptions = {}
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def read(self): 
+        '''
+        Reads every row, keeping the IDs up to the limit. Rows after the 
+        limit are still read, so a crawl writing its index as a side output 
+        runs to the end. 
+        '''
+        try: 
+            for game_id, short_description, *_ in self.rows: 
+                if len(self.ids) >= self.limit: 
+                    continue
+                game_id = str(game_id)
+                with self.condition: 
+                    # As in index_short_descriptions(), the first description 
+                    # is kept
+                    self.short_descriptions.setdefault(game_id, 
+                        short_description or "[No Description]")
+                    self.ids.append(game_id)
+                    self.condition.notify_all()
+        except Exception as error: 
+            self.error = error
+        finally: 
+            with self.condition: 
+                self.done = True
+                self.condition.notify_all()
+
+    def __getitem__(self, positions): 
+        stop = min(positions.stop, self.limit)
+        with self.condition: 
+            self.condition.wait_for(lambda: self.done or len(self.ids) >= stop)
+            if self.error is not None: 
+                raise self.error
+            return self.ids[positions]
+
+    def num_ids(self): 
+        '''
+        Outputs: 
+            Number of IDs the crawl gave, up to the limit, or None while it is 
+                still running (int)
+        '''
+        return len(self.ids) if self.done else None
+
+    def finish(self): 
+        '''
+        Waits for the crawl to run to the end. 
+        '''
+        self.reader.join()
+        if self.error is not None: 
+            raise self.error
+
+
+def refresh(file_in, previous_file_in=None, limit=5000, size=100, 
+    file_suffix_out="", parser="html5lib", cache=None, limiter=None, 
+    adaptive=False, output="json", min_vote_change=0.01, min_rank_move=100, 
+    base_url=None): 
+    '''
+    Incrementally refreshes the data pulled by an earlier run of go() with the 
+    same file_suffix_out and output, from a new crawl of the top games. 
+    
+    Only games that are new to the top limit IDs, or whose number of voters 
+    or crawl position has changed enough (see select_changed_ids()), are 
+    pulled from the API again. Every other game keeps its earlier record, with 
+    the short description from the new crawl, and games that dropped out of 
+    the top limit IDs are removed. The merged games are written in the order 
+    of the new crawl, with the type/category/mechanic counters recounted from 
+    them, so the files are laid out as a full pull would lay them out. 
+
+    Inputs: 
+        file_in (str): Name of file from the new crawl, with game IDs, short 
+            descriptions and numbers of voters
+        previous_file_in (str): Name of file from the crawl of the earlier 
+            run, to detect rank moves. Default = None, which only compares 
+            numbers of voters. 
+        min_vote_change (float): Smallest relative change in number of voters 
+            that makes a game be pulled again. Default = 0.01, i.e. 1%. 
+        min_rank_move (int): Smallest move in crawl position that makes a game 
+            be pulled again. Default = 100. 
+        Other inputs are as for go(). 
+    
+    Outputs: 
+        Rewrites the same files as go(). 
+        Returns list of the BGG IDs pulled from the API (list of str). 
+    '''
+    ids = import_ids(file_in).iloc[:limit]
+    short_descriptions = index_short_descriptions(ids)
+    previous_games = load_games(f"all_games{file_suffix_out}.{output}")
+    previous_ids = None
+    if previous_file_in is not None: 
+        previous_ids = import_ids(previous_file_in)
+    changed_ids = select_changed_ids(ids, previous_games, previous_ids, 
+        min_vote_change, min_rank_move)
+    print(f"\nRefreshing BoardGameGeek information for top {len(ids)} IDs: " + 
+        f"{len(changed_ids)} new or changed")
+    
+    if adaptive: 
+        sizer = bgg_rate.BatchSizer(size)
+    else: 
+        sizer = bgg_rate.FixedBatchSizer(size)
+    report = bgg_metrics.PullReport(len(changed_ids), params={"file_in": file_in, 
+        "previous_file_in": previous_file_in, "limit": limit, "size": size, 
+        "output": output, "parser": parser, "adaptive": adaptive, 
+        "refresh": True})
+    # Games quarantined earlier are not in previous_games, so they are pulled 
+    # again here and the quarantine is replaced
+    failures = []
+    fetched_games = fetch_games(changed_ids, short_descriptions, sizer, report, 
+        failures, cache, limiter, parser, base_url)
+    games_dict = merge_games(short_descriptions, fetched_games, previous_games, 
+        file_suffix_out, output, report)
+    quarantine_path = bgg_quarantine.quarantine_path(file_suffix_out)
+    bgg_quarantine.write_quarantine(quarantine_path, failures)
+    bgg_quarantine.finish_quarantine(quarantine_path, len(games_dict))
+    return changed_ids
+
+
+def reprocess(file_in, limit=5000, size=100, file_suffix_out="", 
+    parser="html5lib", cache=None, limiter=None, output="json", base_url=None): 
+    '''
+    Pulls the games in the quarantine file of an earlier run of go() or 
+    refresh() from the API again, and merges those that can now be read into 
+    its files. Games that still fail stay in quarantine. 
+
+    Inputs: 
+        file_in (str): Name of file the earlier run pulled, with game IDs and 
+            short descriptions
+        Other inputs are as for go(). 
+    
+    Outputs: 
+        Rewrites the same files as go(), and the quarantine file. 
+        Returns list of the BGG IDs read successfully (list of str). 
+    '''
+    quarantine_path = bgg_quarantine.quarantine_path(file_suffix_out)
+    quarantined = bgg_quarantine.read_quarantine(quarantine_path)
+    ids = import_ids(file_in).iloc[:limit]
+    short_descriptions = index_short_descriptions(ids)
+    # Games that dropped out of the top limit IDs are not pulled again
+    retry_ids = [bgg_id for bgg_id in quarantined if bgg_id in short_descriptions]
+    print(f"\nReprocessing {len(retry_ids)} of {len(quarantined)} quarantined " + 
+        "BoardGameGeek IDs")
+    if not retry_ids: 
+        return []
+    
+    previous_games = load_games(f"all_games{file_suffix_out}.{output}")
+    report = bgg_metrics.PullReport(len(retry_ids), params={"file_in": file_in, 
+        "limit": limit, "size": size, "output": output, "parser": parser, 
+        "reprocess": True})
+    failures = []
+    fetched_games = fetch_games(retry_ids, short_descriptions, 
+        bgg_rate.FixedBatchSizer(size), report, failures, cache, limiter, 
+        parser, base_url)
+    games_dict = merge_games(short_descriptions, fetched_games, previous_games, 
+        file_suffix_out, output, report)
+    # Entries not retried are kept, with the games that failed again
+    bgg_quarantine.write_quarantine(quarantine_path, [entry for bgg_id, entry 
+        in quarantined.items() if bgg_id not in short_descriptions] + failures)
+    bgg_quarantine.finish_quarantine(quarantine_path, len(games_dict))
+    return list(fetched_games.keys())
+
+
+def fetch_games(ids, short_descriptions, sizer, report, failures, cache=None, 
+    limiter=None, parser="html5lib", base_url=None): 
+    '''
+    Pulls a list of games from the API in batches, fetching each batch while 
+    the one before it is parsed, without counting types, categories or 
+    mechanics. 
+
+    Inputs: 
+        ids (list of str): BGG IDs to pull
+        short_descriptions (dict): Short descriptions by BGG ID
+        sizer (bgg_rate.BatchSizer or FixedBatchSizer): Sets the batch size
+        report (bgg_metrics.PullReport): Report to add each batch to
+        failures (list): List to add a quarantine entry to for each game that 
+            cannot be read, as for get_game_info()
+        Other inputs are as for go(). 
+    
+    Outputs: 
+        Dictionary of game information by BGG ID, in the order returned
+    '''
+    if limiter is None: 
+        limiter = bgg_rate.TokenBucket(rate=1 / 5)
+    fetched_games = {}
+    start = 0
+    with ThreadPoolExecutor(max_workers=1) as executor: 
+        # Fetch the next batch in the background while this one is parsed
+        end = min(start + sizer.size, len(ids))
+        if start < end: 
+            next_stats = {}
+            next_fetch = executor.submit(fetch_api, ",".join(ids[start:end]), 
+                cache, limiter, sizer, next_stats, base_url)
+        while start < len(ids): 
+            report.start_batch()
+            batch_start, batch_end = start + 1, end
+            with report.stage("fetch_wait"): 
+                response = next_fetch.result()
+            fetch_stats = next_stats
+            report.add_fetch(fetch_stats)
+            start = end
+            end = min(start + sizer.size, len(ids))
+            if start < end: 
+                next_stats = {}
+                next_fetch = executor.submit(fetch_api, 
+                    ",".join(ids[start:end]), cache, limiter, sizer, 
+                    next_stats, base_url)
+            num_games_before = len(fetched_games)
+            num_failures_before = len(failures)
+            get_game_info(response, fetched_games, {}, {}, {}, 
+                short_descriptions, parser=parser, metrics=report, 
+                failures=failures)
+            report.add_batch(batch_start, batch_end, 
+                len(fetched_games) - num_games_before, fetch_stats, 
+                len(failures) - num_failures_before)
+    return fetched_games
+
+
+def merge_games(short_descriptions, fetched_games, previous_games, 
+    file_suffix_out="", output="json", report=None): 
+    '''
+    Merges newly pulled games into the games of an earlier run in crawl 
+    order, recounting the type/category/mechanic counters from the merged 
+    games, and writes every output file from them. 
+
+    Inputs: 
+        short_descriptions (dict): Short descriptions by BGG ID, in crawl 
+            order. Games not in it are dropped. 
+        fetched_games (dict): Newly pulled game information by BGG ID
+        previous_games (dict): Earlier game information by BGG ID, used for 
+            games not in fetched_games, with the new short description
+        file_suffix_out (str): Suffix of the files to write, as for go()
+        output (str): Format of the file of all game information, as for go()
+        report (bgg_metrics.PullReport): Report to write with the files. 
+            Default = None. 
+    
+    Outputs: 
+        Writes the same files as go(). 
+        Returns the games written (dict, or bgg_jsonl.JsonLinesWriter)
+    '''
+    games_dict = {}
+    if output == "jsonl": 
+        games_dict = bgg_jsonl.JsonLinesWriter(f"all_games{file_suffix_out}.jsonl")
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    for bgg_id in short_descriptions.keys(): 
+        if bgg_id in fetched_games: 
+            game_info = fetched_games[bgg_id]
+        elif bgg_id in previous_games: 
+            game_info = previous_games[bgg_id]
+            game_info["shortdescription"] = short_descriptions[bgg_id]
+        else: # Not returned by the API, as for go()
+            continue
+        count_game(game_info, types_dict, categories_dict, mechanics_dict)
+        games_dict[bgg_id] = game_info
+    
+    write_outputs(games_dict, types_dict, categories_dict, mechanics_dict, 
+        file_suffix_out, output, report=report)
+    return games_dict
+
+
+def select_changed_ids(ids, previous_games, previous_ids=None, 
+    min_vote_change=0.01, min_rank_move=100): 
+    '''
+    Picks out the games of a new crawl that need pulling from the API again: 
+    games not in the earlier data, games whose number of voters changed by at 
+    least min_vote_change since then, and games that moved at least 
+    min_rank_move places in the crawl. Games whose number of voters the crawl 
+    did not see are treated as changed. 
+
+    Inputs: 
+        ids (Pandas DataFrame): New crawl, as returned by import_ids()
+        previous_games (dict): Earlier game information by BGG ID
+        previous_ids (Pandas DataFrame): Earlier crawl, as returned by 
+            import_ids(). Default = None, which skips the rank check. 
+        min_vote_change (float): Smallest relative change in number of voters
+        min_rank_move (int): Smallest move in crawl position
+    
+    Outputs: 
+        List of BGG IDs (list of str), in crawl order
+    '''
+    previous_ranks = {}
+    if previous_ids is not None: 
+        for rank, bgg_id in enumerate(previous_ids["ID"]): 
+            previous_ranks.setdefault(bgg_id, rank)
+    changed_ids = []
+    seen = set()
+    for rank, (bgg_id, num_voters) in enumerate(zip(ids["ID"], ids["num_voters"])): 
+        if bgg_id in seen: 
+            continue
+        seen.add(bgg_id)
+        if bgg_id not in previous_games or pd.isna(num_voters): 
+            changed_ids.append(bgg_id)
+            continue
+        num_ratings = previous_games[bgg_id]["num_ratings"]
+        num_voters = float(str(num_voters).replace(",", ""))
+        vote_change = abs(num_voters - num_ratings) / max(num_ratings, 1)
+        rank_move = abs(rank - previous_ranks.get(bgg_id, rank))
+        if vote_change >= min_vote_change or rank_move >= min_rank_move: 
+            changed_ids.append(bgg_id)
+    return changed_ids
+
+
+def load_games(filepath): 
+    '''
+    Loads the game information written by an earlier run of go(). 
+
+    Inputs: 
+        filepath (str): Name of the JSON or JSON Lines file of all games
+    
+    Outputs: 
+        Dictionary of game information by BGG ID
+    '''
+    if filepath.endswith(".jsonl"): 
+        games = {}
+        for game in bgg_jsonl.read_games(filepath): 
+            games[game.pop("bgg_id")] = game
+        return games
+    with open(filepath, "r") as in_file: 
+        return json.load(in_file)
+
+
+def write_outputs(games_dict, types_dict, categories_dict, mechanics_dict, 
+    file_suffix_out, output="json", report=None): 
+    '''
+    Writes every output file of a data pull and prints where they went. 
+
+    Inputs: 
+        games_dict (dict, bgg_record.GameStore or bgg_jsonl.JsonLinesWriter): 
+            Dictionary with boardgame information, or the JSON Lines file it 
+            was streamed to
+        types_dict (dict): Dictionary with counts of game types
+        categories_dict (dict): Dictionary with counts of game categories
+        mechanics_dict (dict): Dictionary with counts of game mechanics
+        file_suffix_out (str): Suffix to add to all filenames out, such as 
+            "_actual", "_test", etc. Default = "", which is used for full data pull. 
+        output (str): Format of the file of all game information, "json" or 
+            "jsonl". Default = "json". 
+        report (bgg_metrics.PullReport): Report of the pull to time each file 
+            in, and to write as all_games<suffix>_report.json. Default = None, 
+            which writes no report. 
+    
+    Outputs: 
+        Writes the JSON or JSON Lines, CSV, Feather, tags and counts files, and 
+            the report. 
+    '''
+    metrics = report if report is not None else bgg_metrics.NullReport()
+    games_path = f"all_games{file_suffix_out}.{output}"
+    with metrics.stage("write_games"): 
+        if output == "jsonl": 
+            games_dict.close()
+        elif isinstance(games_dict, bgg_record.GameStore): 
+            with open(games_path, "w") as out_file:
+                games_dict.write_json(out_file, indent=6)
+        else: 
+            with open(games_path, "w") as out_file:
+                json.dump(games_dict, out_file, indent=6)
     # with open(f"all_games{file_suffix_out}.json", "r") as in_file:
     #     test = json.load(in_file)
 
-    construct_csv(games_dict, types_dict, categories_dict, mechanics_dict, 
-        file_suffix_out)
+    with metrics.stage("construct_csv"): 
+        construct_csv(games_dict, types_dict, categories_dict, mechanics_dict, 
+            file_suffix_out)
     # data = pd.read_csv(f"all_games{file_suffix_out}.csv")
+    with metrics.stage("construct_feather"): 
+        filepath_f = construct_feather(games_dict, types_dict, categories_dict, 
+            mechanics_dict, file_suffix_out)
+
+    with metrics.stage("write_tags"): 
+        filepath_s, filepath_v = bgg_tags.write_tags(games_dict, file_suffix_out)
 
-    filepath_t = create_extra_csv(types_dict, "types", file_suffix_out)
-    filepath_c = create_extra_csv(categories_dict, "categories", file_suffix_out)
-    filepath_m = create_extra_csv(mechanics_dict, "mechanics", file_suffix_out)
+    with metrics.stage("create_extra_csv"): 
+        filepath_t = create_extra_csv(types_dict, "types", file_suffix_out)
+        filepath_c = create_extra_csv(categories_dict, "categories", file_suffix_out)
+        filepath_m = create_extra_csv(mechanics_dict, "mechanics", file_suffix_out)
     # types_df = pd.read_csv(f"types_counts{file_suffix_out}.csv").sort_values("count", ascending=False)
     # categories_df = pd.read_csv(f"categories_counts{file_suffix_out}.csv").sort_values("count", ascending=False)
     # mechanics_df = pd.read_csv(f"mechanics_counts{file_suffix_out}.csv").sort_values("count", ascending=False)
     print(f'\nData Pull Complete!\n')
     print(f'    CSV of game information: all_games{file_suffix_out}.csv')
-    print(f'    JSON of game information: all_games{file_suffix_out}.json')
+    print(f'    {output.upper()} of game information: {games_path}')
+    if filepath_f is not None: 
+        print(f'    Typed Feather of game information: {filepath_f}')
+    else: 
+        print(f'    Typed Feather of game information: skipped, pyarrow is not installed')
+    print(f'    Sparse matrix of all game tags: {filepath_s}')
+    print(f'    CSV of game tag vocabulary: {filepath_v}')
     print(f'    CSV of game type counts: {filepath_t}')
     print(f'    CSV of game category counts: {filepath_c}')
     print(f'    CSV of game mechanic counts: {filepath_m}\n')
+    if report is not None: 
+        filepath_r = report.write(f"all_games{file_suffix_out}_report.json")
+        totals = report.as_dict()["totals"]
+        print(f'    Timing report: {filepath_r} ({totals["games"]} games in ' + 
+            f'{totals["wall"]:.1f}s, {totals["retries"]} retries)\n')
+
+
+def start_checkpoint(filepath, run_params): 
+    '''
+    Starts a new checkpoint file for a run of go(), replacing any old one. The 
+    first line records the parameters of the run, so a resume can check that 
+    it is continuing the same pull. 
+
+    Inputs: 
+        filepath (str): Name of checkpoint file
+        run_params (dict): Parameters of the run (file_in, limit and size)
+    
+    Outputs: 
+        Writes the checkpoint file header. 
+    '''
+    with open(filepath, "w") as f: 
+        f.write(json.dumps(run_params) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_checkpoint(filepath, start, end, batch_games, types_dict, 
+    categories_dict, mechanics_dict, offset=None): 
+    '''
+    Appends one completed batch to the checkpoint file and forces it to disk. 
+    Each line holds the games added by the batch, the cursor of the next batch, 
+    and the type/category/mechanic counters so far. 
+
+    Inputs: 
+        filepath (str): Name of checkpoint file
+        start (int): Index of the first ID of the next batch
+        end (int): Index of the last ID of the next batch
+        batch_games (dict): Game information added by the completed batch
+        types_dict (dict): Dictionary with counts of game types
+        categories_dict (dict): Dictionary with counts of game categories
+        mechanics_dict (dict): Dictionary with counts of game mechanics
+        offset (int): Size of the JSON Lines file of games once this batch is 
+            written, when games are streamed to disk instead of checkpointed 
+            here. Default = None. 
+    
+    Outputs: 
+        Appends to the checkpoint file. 
+    '''
+    line = json.dumps({"start": start, "end": end, "games": batch_games, 
+        "types": types_dict, "categories": categories_dict, 
+        "mechanics": mechanics_dict, "offset": offset})
+    with open(filepath, "a") as f: 
+        f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_checkpoint(filepath, run_params): 
+    '''
+    Rebuilds the state of an interrupted run of go() from its checkpoint file. 
+    A last line cut short by a crash is dropped from the file, so the run 
+    resumes from the last batch that was completely written. 
+
+    Inputs: 
+        filepath (str): Name of checkpoint file
+        run_params (dict): Parameters of the run being resumed
+    
+    Outputs: 
+        (start, end, games_dict, types_dict, categories_dict, mechanics_dict, 
+            offset), or None if no batch was completed. offset is None in 
+            checkpoints of "json" runs and of runs from before it was saved.
+    '''
+    with open(filepath, "r") as f: 
+        lines = f.read().split("\n")
+    checkpoint_params = json.loads(lines[0])
+    # Checkpoints written before the output modes are all of "json" runs
+    checkpoint_params.setdefault("output", "json")
+    if checkpoint_params != run_params: 
+        raise ValueError(f"Checkpoint {filepath} is for a different run: "
+            f"{checkpoint_params}")
+    
+    batches = []
+    for line in lines[1:]: 
+        try: 
+            batches.append(json.loads(line))
+        except ValueError: # Empty or partially written line
+            break
+    if not batches: 
+        return None
+    if len(lines) != len(batches) + 2 or lines[-1] != "": 
+        tmp_filepath = filepath + ".tmp"
+        with open(tmp_filepath, "w") as f: 
+            for line in lines[:len(batches) + 1]: 
+                f.write(line + "\n")
+        os.replace(tmp_filepath, filepath)
+
+    games_dict = {}
+    for batch in batches: 
+        games_dict.update(batch["games"])
+    last = batches[-1]
+    return (last["start"], last["end"], games_dict, last["types"], 
+        last["categories"], last["mechanics"], last.get("offset"))
 
 
 def import_ids(filename): 
@@ -92,17 +734,36 @@ def import_ids(filename):
     Imports file of BGG game IDs and short_descriptions
 
     Inputs: 
-        filename (str): Name of file that contains game IDs and short descriptions
+        filename (str): Name of file that contains game IDs and short descriptions, 
+            and optionally the number of voters seen by the crawler
     
     Outputs: 
-        Pandas DataFrame
+        Pandas DataFrame, with num_voters missing where the file has none
     '''
-    ids = pd.read_csv(filename, header=None, names=["ID", "short_description"])
+    ids = pd.read_csv(filename, header=None, 
+        names=["ID", "short_description", "num_voters"])
     ids["ID"] = ids["ID"].astype("str")
     ids["short_description"] = ids['short_description'].fillna("[No Description]")
     return ids
 
 
+def index_short_descriptions(ids): 
+    '''
+    Builds a hash index of short_descriptions by BGG game ID, so each game's 
+    short description is a constant-time lookup instead of a DataFrame query. 
+    If an ID appears more than once, its first short description is kept. 
+
+    Inputs: 
+        ids (Pandas DataFrame): DataFrame of game IDs and short_descriptions, 
+            as returned by import_ids()
+    
+    Outputs: 
+        Dictionary of short_description by ID
+    '''
+    ids = ids.drop_duplicates(subset="ID", keep="first")
+    return dict(zip(ids["ID"], ids["short_description"]))
+
+
 def call_api(ids_str): 
     '''
     Function that generates URL and calls BGG API
@@ -113,168 +774,230 @@ def call_api(ids_str):
     Outputs: 
         soup (bs4.BeautifulSoup): bs4 API response to parse. 
     '''
-    url_api = "http://www.boardgamegeek.com/xmlapi/boardgame/"
-    response = requests.get(url_api + ids_str + "?stats=1")
-    if response.status_code != requests.codes.ok: 
-        response.raise_for_status()
-    text = response.text
+    text = fetch_api(ids_str).decode("utf-8")
     soup = bs4.BeautifulSoup(text, features="html5lib")
     return soup
 
 
+def fetch_api(ids_str, cache=None, limiter=None, sizer=None, stats=None, 
+    base_url=None): 
+    '''
+    Function that generates URL and calls BGG API, without parsing the response. 
+    Throttled (429) and failed (5xx) calls are retried with exponential backoff. 
+
+    Inputs: 
+        ids_str (str): String sequence of boardgame IDs to send to API as parameter
+        cache (bgg_cache.ResponseCache): On-disk cache to answer from and store 
+            responses in. Default = None, which always calls the API. 
+        limiter (bgg_rate.TokenBucket): Rate limiter to wait on before each call 
+            to the API. Default = None, which does not wait. 
+        sizer (bgg_rate.BatchSizer): Batch sizer to report healthy and failed 
+            calls to. Default = None. 
+        stats (dict): Dictionary to fill in with figures for bgg_metrics: 
+            bytes, cached, requests, retries, and seconds spent on the network, 
+            on the rate limit and backing off. Default = None. 
+        base_url (str): Site to call the API on, such as "http://127.0.0.1:8000". 
+            Default = None, which uses API_URL. 
+    
+    Outputs: 
+        content (bytes): Raw API response, to be parsed by get_game_info()
+    '''
+    if stats is None: 
+        stats = {}
+    stats.update({"bytes": 0, "cached": False, "requests": 0, "retries": 0, 
+        "network": 0.0, "network_cpu": 0.0, "rate_limit": 0.0, "backoff": 0.0})
+    if base_url is None: 
+        url = API_URL + ids_str + "?stats=1"
+    else: 
+        url = base_url.rstrip("/") + API_PATH + ids_str + "?stats=1"
+    if cache is not None: 
+        content = cache.get(url)
+        if content is not None: 
+            stats["bytes"] = len(content)
+            stats["cached"] = True
+            return content
+        if cache.offline: 
+            raise bgg_cache.CacheMiss(f"No cached response for {url}")
+    server_error = False
+    delay = 0.0
+    for attempt in range(bgg_rate.MAX_RETRIES + 1): 
+        if limiter is not None: 
+            # After a retry, the limiter's pause is the backoff, and any wait 
+            # past it is the rate limit
+            waited = limiter.acquire()
+            stats["backoff"] += min(waited, delay)
+            stats["rate_limit"] += max(waited - delay, 0.0)
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        response = requests.get(url)
+        stats["network"] += time.perf_counter() - wall
+        stats["network_cpu"] += time.thread_time() - cpu
+        stats["requests"] += 1
+        if (response.status_code not in bgg_rate.RETRY_STATUS_CODES or 
+            attempt == bgg_rate.MAX_RETRIES): 
+            break
+        delay = bgg_rate.backoff_delay(attempt, 
+            response.headers.get("Retry-After"))
+        print(f'API responded {response.status_code}, retrying in {delay:.0f}s')
+        stats["retries"] += 1
+        if response.status_code == 429: 
+            if limiter is not None: 
+                limiter.slow_down()
+        else: 
+            server_error = True
+            if sizer is not None: 
+                sizer.shrink()
+        if limiter is not None: 
+            limiter.pause(delay)
+        else: 
+            time.sleep(delay)
+            stats["backoff"] += delay
+    if response.status_code != requests.codes.ok: 
+        response.raise_for_status()
+    if limiter is not None and attempt == 0: 
+        limiter.speed_up()
+    if sizer is not None and not server_error: 
+        sizer.record_success(len(response.content))
+    if cache is not None: 
+        cache.put(url, response.content)
+    stats["bytes"] = len(response.content)
+    return response.content
+
+
 def get_game_info(soup, games_dict, types_dict, categories_dict, mechanics_dict, 
-    short_descriptions): 
+    short_descriptions, parser="html5lib", executor=None, num_shards=None, 
+    metrics=None, failures=None): 
     '''
     Gathers information for each game from the API response. 
 
     Inputs: 
-        soup (bs4.BeautifulSoup): bs4 API response to parse. 
+        soup (bs4.BeautifulSoup, bytes or str): API response to parse. Raw 
+            responses from fetch_api() are accepted by every parser. 
         games_dict (dict): Dictionary to add boardgame information to
         types_dict (dict): Dictionary to add counts of game types to. 
         categories_dict (dict): Dictionary to add counts of game categories to
         mechanics_dict (dict): Dictionary to add counts of game mechanics to
-        short_descriptions (Pandas DataFrame): Dataframe of short-descriptions to 
-            include in game information
+        short_descriptions (dict or Pandas DataFrame): Short-descriptions to 
+            include in game information, ideally the dict from 
+            index_short_descriptions() built once per run
+        parser (str): Parser backend in bgg_parse.PARSERS to read the response 
+            with. Default = "html5lib". 
+        executor (concurrent.futures.ProcessPoolExecutor): Pool to parse raw 
+            responses on, split into num_shards runs of games. Default = None, 
+            which parses in this process. 
+        num_shards (int): Number of runs of games to split a response into. 
+            Default = None, which uses one per CPU. 
+        metrics (bgg_metrics.PullReport): Report to time the parse and extract 
+            stages in. Default = None. 
+        failures (list): List to add a bgg_quarantine.make_entry() entry to for 
+            each game that cannot be read, leaving it out of games_dict and the 
+            counters, instead of stopping. Default = None, which raises the 
+            error of the first game that cannot be read. 
     
     Outputs: 
         None: Updates games_dict, types_dict, categories_dict, and mechanics_dict 
-            in place. 
+            (and failures) in place. 
     '''
-    for game in soup.find_all("boardgame"): 
-        bgg_id = game["objectid"]
+    if metrics is None: 
+        metrics = bgg_metrics.NullReport()
+    if isinstance(short_descriptions, pd.DataFrame): 
+        short_descriptions = index_short_descriptions(short_descriptions)
+    if executor is not None and isinstance(soup, (bytes, str)): 
+        with metrics.stage("split"): 
+            shards = bgg_parse.split_games(soup, num_shards or os.cpu_count() or 1, 
+                skip=games_dict)
+        # With failures, a game missing its short description is quarantined 
+        # by the worker instead of stopping the batch here
+        futures = [executor.submit(parse_shard, shard, {bgg_id: 
+            short_descriptions[bgg_id] for bgg_id in shard_ids 
+            if failures is None or bgg_id in short_descriptions}, parser, 
+            failures is not None) for shard, shard_ids in shards]
+        # Reduce in response order, so games and counters are in the same 
+        # order as a serial parse leaves them
+        for future in futures: 
+            with metrics.stage("parse_wait"): 
+                (shard_games, shard_types, shard_categories, shard_mechanics, 
+                    shard_failures) = future.result()
+            for counts, shard_counts in ((types_dict, shard_types), 
+                (categories_dict, shard_categories), 
+                (mechanics_dict, shard_mechanics)): 
+                for key, count in shard_counts.items(): 
+                    counts[key] = counts.get(key, 0) + count
+            for bgg_id, game_info in shard_games: 
+                games_dict[bgg_id] = game_info
+            if failures is not None: 
+                failures.extend(shard_failures)
+        return
+    iter_games, read_game = bgg_parse.PARSERS[parser]
+    for bgg_id, game in metrics.timed(iter_games(soup, skip=games_dict), "parse"): 
         # print("--------") 
         # print(f'BGG_ID: {bgg_id}') 
-            # Something really weird is happening between
-            # ids 1589 and 155731 (indices 2608 and 2609) - five IDs for non-games
-            # are getting inserted in the soup: 141023, 141024, 140248-14250.
-            # It looks like they have an additional attribute {'inbound': 'true'}
-        if "inbound" not in game.attrs.keys() and games_dict.get(bgg_id) is None: 
-            try: 
-                name = game.find("name", attrs={"primary":"true"}).text
-                # print(f'Game Name: {name}') 
-                name_coerced = re.sub(
-                    pattern="\W", repl="", string=name.upper().strip())
-                yearpublished = game.yearpublished.text
-                shortdescription = (short_descriptions.query(f'ID == "{bgg_id}"')
-                    ["short_description"].values[0])
-                minplayers = game.minplayers.text
-                maxplayers = game.maxplayers.text
-                playingtime = game.playingtime.text
-                minplaytime = game.minplaytime.text
-                maxplaytime = game.maxplaytime.text
-                age = game.age.text
-                
-                suggested_playerage = None 
-                suggested_playerage_votes = -1 # Don't include in output
-                playerage_poll = game.find("poll", 
-                    attrs={"name":"suggested_playerage"})
-                if playerage_poll["totalvotes"] != "0": 
-                    for option in playerage_poll.results.find_all("result"):
-                        playerage = option["value"]
-                        numvotes = int(option["numvotes"])
-                        if numvotes > suggested_playerage_votes: 
-                            # With ties, take minimum age
-                            suggested_playerage = playerage
-                            suggested_playerage_votes = numvotes
-                    
-                suggested_numplayers = None
-                suggested_numplayers_votes = -1 # Don't include in output
-                numplayers_poll = game.find("poll", 
-                    attrs={"name":"suggested_numplayers"})
-                if numplayers_poll["totalvotes"] != "0": 
-                    for option in numplayers_poll.find_all("results"):
-                        numplayers = option["numplayers"]
-                        suggested_tag = option.find("result", attrs={"value": "Best"})
-                        votes = int(suggested_tag["numvotes"])
-                        if votes >= suggested_numplayers_votes: 
-                            # With ties, take maximum numplayers
-                            suggested_numplayers = numplayers
-                            suggested_numplayers_votes = votes
-                
-                suggested_language = None
-                suggested_language_votes = -1 # Don't include in output
-                language_poll = game.find("poll", 
-                    attrs={"name": "language_dependence"})
-                if language_poll["totalvotes"] != "0": 
-                    for option in language_poll.results.find_all("result"): 
-                        language = option["value"] 
-                        # option["level"] increases with each game called - that's dumb
-                        numvotes = int(option["numvotes"])
-                        if numvotes >= suggested_language_votes: 
-                            # With ties, take maximum language dependency
-                            suggested_language = language
-                            suggested_language_votes = numvotes
-                
-                num_ratings = int(game.statistics.ratings.usersrated.text)
-                geek_rating = float(game.statistics.ratings.average.text)
-                
-                bgg_type_info = {}
-                num_types = 0
-                for rank in game.statistics.ratings.ranks.find_all("rank"):
-                    bgg_type_name = re.findall(
-                        pattern="^.+(?=\sRank)", string=rank["friendlyname"])[0]
-                    if bgg_type_name != "Board Game":
-                        num_types += 1
-                    bgg_type_rating = float(rank["bayesaverage"])
-                    bgg_type_rank = rank["value"]
-                    bgg_type_info[bgg_type_name] = (bgg_type_rating, bgg_type_rank)
-                    types_dict[bgg_type_name] = types_dict.get(bgg_type_name, 0) + 1
-
-                categories = [] # JSON can't deal with sets, unfortunately
-                is_boardgame = True
-                not_game_categories = {"Expansion for Base-game", "Fan Expansion", 
-                    "Game System"} 
-                num_categories = 0
-                for cat in game.find_all("boardgamecategory"): 
-                    category = cat.text
-                    if category in not_game_categories: 
-                        is_boardgame = False
-                    categories.append(category)
-                    num_categories += 1
-                    categories_dict[category] = categories_dict.get(category, 0) + 1
-
-                mechanics = []
-                num_mechanics = 0
-                for mech in game.find_all("boardgamemechanic"):
-                    mechanic = mech.text
-                    mechanics.append(mechanic)
-                    num_mechanics += 1
-                    mechanics_dict[mechanic] = mechanics_dict.get(mechanic, 0) + 1
-                
-                averageweight = float(game.statistics.averageweight.text)
-                long_description = game.description.text
-                image_url = game.img.next_sibling.strip("\n\t")
-
-                games_dict[bgg_id] = {}
-                games_dict[bgg_id]["is_boardgame"] = is_boardgame
-                games_dict[bgg_id]["name"] = name
-                games_dict[bgg_id]["name_coerced"] = name_coerced
-                games_dict[bgg_id]["yearpublished"] = yearpublished
-                games_dict[bgg_id]["shortdescription"] = shortdescription
-                games_dict[bgg_id]["minplayers"] = minplayers
-                games_dict[bgg_id]["maxplayers"] = maxplayers
-                games_dict[bgg_id]["playingtime"] = playingtime
-                games_dict[bgg_id]["minplaytime"] = minplaytime
-                games_dict[bgg_id]["maxplaytime"] = maxplaytime
-                games_dict[bgg_id]["age"] = age
-                games_dict[bgg_id]["suggested_playerage"] = suggested_playerage
-                games_dict[bgg_id]["suggested_numplayers"] = suggested_numplayers
-                games_dict[bgg_id]["suggested_language"] = suggested_language
-                games_dict[bgg_id]["num_ratings"] = num_ratings
-                games_dict[bgg_id]["geek_rating"] = geek_rating
-                games_dict[bgg_id]["num_types"] = num_types
-                games_dict[bgg_id]["bgg_type_info"] = bgg_type_info # dict
-                games_dict[bgg_id]["num_categories"] = num_categories
-                games_dict[bgg_id]["categories"] = categories # list
-                games_dict[bgg_id]["num_mechanics"] = num_mechanics
-                games_dict[bgg_id]["mechanics"] = mechanics # list
-                games_dict[bgg_id]["averageweight"] = averageweight
-                games_dict[bgg_id]["long_description"] = long_description
-                games_dict[bgg_id]["image_url"] = image_url
-            except Exception as e: 
+        try: 
+            shortdescription = short_descriptions[bgg_id]
+            with metrics.stage("extract"): 
+                game_info = bgg_parse.build_game_info(read_game(game), 
+                    shortdescription)
+        except Exception as e: 
+            if failures is None: 
                 print(repr(e))
                 print(f'Script Failed at BGG_ID {bgg_id}')
                 raise e
+            # Set the game aside and carry on with the rest of the batch
+            failures.append(bgg_quarantine.make_entry(bgg_id, e, 
+                bgg_parse.GAME_XML[parser](game), short_descriptions.get(bgg_id)))
+            continue
+
+        count_game(game_info, types_dict, categories_dict, mechanics_dict)
+        games_dict[bgg_id] = game_info
+
+
+def parse_shard(shard, short_descriptions, parser="html5lib", quarantine=False): 
+    '''
+    Parses one shard of a response from bgg_parse.split_games() in a worker 
+    process, counting its types, categories and mechanics locally. 
+
+    Inputs: 
+        shard (bytes): Standalone response holding the shard's games
+        short_descriptions (dict): Short descriptions of the shard's games
+        parser (str): Parser backend in bgg_parse.PARSERS
+        quarantine (bool): If True, set aside games that cannot be read, as 
+            get_game_info() does with failures, instead of raising. 
+            Default = False. 
+    
+    Outputs: 
+        (list of (bgg_id, game information) tuples, types_dict, 
+            categories_dict, mechanics_dict, list of quarantine entries)
+    '''
+    games_dict = {}
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    failures = [] if quarantine else None
+    get_game_info(shard, games_dict, types_dict, categories_dict, 
+        mechanics_dict, short_descriptions, parser=parser, failures=failures)
+    return (list(games_dict.items()), types_dict, categories_dict, 
+        mechanics_dict, failures or [])
+
+
+def count_game(game_info, types_dict, categories_dict, mechanics_dict): 
+    '''
+    Adds one game's types, categories and mechanics to the counters. 
+
+    Inputs: 
+        game_info (dict): Game information from get_game_info()
+        types_dict (dict): Dictionary with counts of game types
+        categories_dict (dict): Dictionary with counts of game categories
+        mechanics_dict (dict): Dictionary with counts of game mechanics
+    
+    Outputs: 
+        None: Updates types_dict, categories_dict, and mechanics_dict in place. 
+    '''
+    for bgg_type_name in game_info["bgg_type_info"].keys(): 
+        types_dict[bgg_type_name] = types_dict.get(bgg_type_name, 0) + 1
+    for category in game_info["categories"]: 
+        categories_dict[category] = categories_dict.get(category, 0) + 1
+    for mechanic in game_info["mechanics"]: 
+        mechanics_dict[mechanic] = mechanics_dict.get(mechanic, 0) + 1
     
 
 def construct_csv(games_dict, types_dict, categories_dict, mechanics_dict, 
@@ -284,7 +1007,8 @@ def construct_csv(games_dict, types_dict, categories_dict, mechanics_dict,
     mechanics) to CSV file. Calls construct_fields() which creates the CSV header.
 
     Inputs: 
-        games_dict (dict): Dictionary with boardgame information
+        games_dict (dict or bgg_jsonl.JsonLinesWriter): Dictionary with 
+            boardgame information, or the JSON Lines file it was streamed to
         types_dict (dict): Dictionary with counts of game types
         categories_dict (dict): Dictionary with counts of game categories
         mechanics_dict (dict): Dictionary with counts of game mechanics
@@ -303,54 +1027,246 @@ def construct_csv(games_dict, types_dict, categories_dict, mechanics_dict,
         csvwriter.writerow(fields)
         
         for bgg_id, info in games_dict.items(): 
-            data = []
-            data.append(bgg_id)
-            data.extend([
-                info["is_boardgame"], 
-                info["name"], 
-                info["name_coerced"], 
-                info["yearpublished"], 
-                info["shortdescription"], 
-                info["minplayers"], 
-                info["maxplayers"], 
-                info["playingtime"], 
-                info["minplaytime"], 
-                info["maxplaytime"], 
-                info["age"], 
-                info["suggested_playerage"], 
-                info["suggested_numplayers"], 
-                info["suggested_language"], 
-                info["num_ratings"], 
-                info["geek_rating"], 
-                info["num_types"]])
-            
-            for type in types_dict.keys(): 
-                if type in info["bgg_type_info"].keys(): 
-                    subrating, subrank = info["bgg_type_info"][type]
-                    data.extend([True, subrating, subrank])
-                else: 
-                    data.extend([False, False, False])
-            
-            data.append(info["num_categories"])
-            for category in categories_cols: 
-                if category in info["categories"]:
-                    data.append(True)
-                else: 
-                    data.append(False)
-            
-            data.append(info["num_mechanics"])
-            for mechanic in mechanics_cols: 
-                if mechanic in info["mechanics"]:
-                    data.append(True)
-                else: 
-                    data.append(False)
-        
-            data.extend([
-                info["averageweight"], 
-                info["long_description"], 
-                info["image_url"]])
-            
-            csvwriter.writerow(data)
+            csvwriter.writerow(construct_row(bgg_id, info, types_dict, 
+                categories_cols, mechanics_cols))
+
+
+def construct_row(bgg_id, info, types_dict, categories_cols, mechanics_cols): 
+    '''
+    Constructs one game's row of the all-games table, in the order of the 
+    header fields from construct_fields(). 
+
+    Inputs: 
+        bgg_id (str): BGG game ID
+        info (dict): Game information from get_game_info()
+        types_dict (dict): Dictionary with counts of game types
+        categories_cols (list of str): Categories to be used as columns
+        mechanics_cols (list of str): Mechanics to be used as columns
+    
+    Outputs: 
+        data (list): Values of the row
+    '''
+    data = []
+    data.append(bgg_id)
+    data.extend([
+        info["is_boardgame"], 
+        info["name"], 
+        info["name_coerced"], 
+        info["yearpublished"], 
+        info["shortdescription"], 
+        info["minplayers"], 
+        info["maxplayers"], 
+        info["playingtime"], 
+        info["minplaytime"], 
+        info["maxplaytime"], 
+        info["age"], 
+        info["suggested_playerage"], 
+        info["suggested_numplayers"], 
+        info["suggested_language"], 
+        info["num_ratings"], 
+        info["geek_rating"], 
+        info["num_types"]])
+    
+    for type in types_dict.keys(): 
+        if type in info["bgg_type_info"].keys(): 
+            subrating, subrank = info["bgg_type_info"][type]
+            data.extend([True, subrating, subrank])
+        else: 
+            data.extend([False, False, False])
+    
+    # Flag the game's own tags, rather than searching them for every column
+    data.append(info["num_categories"])
+    flags = dict.fromkeys(categories_cols, False)
+    for category in info["categories"]: 
+        if category in flags: 
+            flags[category] = True
+    data.extend(flags.values())
+    
+    data.append(info["num_mechanics"])
+    flags = dict.fromkeys(mechanics_cols, False)
+    for mechanic in info["mechanics"]: 
+        if mechanic in flags: 
+            flags[mechanic] = True
+    data.extend(flags.values())
+
+    data.extend([
+        info["averageweight"], 
+        info["long_description"], 
+        info["image_url"]])
+    return data
+
+
+def construct_feather(games_dict, types_dict, categories_dict, mechanics_dict, 
+    file_suffix_out): 
+    '''
+    Writes the same table as construct_csv() to an uncompressed Feather (Arrow) 
+    file with an explicit schema from construct_schema(), so it can be 
+    memory-mapped and loaded without re-parsing or re-coercing any text. 
+    The games are read twice, once for the values of the categorical columns 
+    and once to write them in record batches of FEATHER_BATCH_SIZE rows, so 
+    memory use does not grow with the number of games. 
+
+    Inputs: 
+        games_dict (dict or bgg_jsonl.JsonLinesWriter): Dictionary with 
+            boardgame information, or the JSON Lines file it was streamed to
+        types_dict (dict): Dictionary with counts of game types
+        categories_dict (dict): Dictionary with counts of game categories
+        mechanics_dict (dict): Dictionary with counts of game mechanics
+        file_suffix_out (str): Suffix to add to all filenames out, such as 
+            "_actual", "_test", etc. Default = "", which is used for full data pull. 
+    
+    Outputs: 
+        Writes all game information to Feather file. 
+        Returns filepath (str) for debugging, or None if pyarrow is not 
+            installed and no file was written. 
+    '''
+    filepath = f'all_games{file_suffix_out}.feather'
+    if pa is None: 
+        # game_data loads the Feather file over the CSV, so one left by an 
+        # earlier pull must not outlive it
+        if os.path.exists(filepath): 
+            os.remove(filepath)
+        return None
+    fields, categories_cols, mechanics_cols = construct_fields(
+        types_dict, categories_dict, mechanics_dict)
+    schema = construct_schema(fields, types_dict)
+    categorical = [i for i, field in enumerate(schema) 
+        if pa.types.is_dictionary(field.type)]
+
+    def rows(): 
+        for bgg_id, info in games_dict.items(): 
+            yield construct_row(bgg_id, info, types_dict, categories_cols, 
+                mechanics_cols)
+
+    # Every batch of the file shares one dictionary per categorical column, 
+    # so their values are gathered first, in order of first appearance as 
+    # dictionary_encode() would number them
+    dictionaries = {i: {} for i in categorical}
+    for row in rows(): 
+        for i in categorical: 
+            if row[i] is not None: 
+                dictionaries[i].setdefault(row[i], len(dictionaries[i]))
+
+    # Feather is the Arrow IPC file format, so the table can be written one 
+    # record batch at a time and only one batch of rows is held in memory
+    with pa.OSFile(filepath, "wb") as sink: 
+        with pa.ipc.new_file(sink, schema) as writer: 
+            batches = rows()
+            while True: 
+                batch = list(itertools.islice(batches, FEATHER_BATCH_SIZE))
+                if not batch: 
+                    break
+                writer.write_batch(construct_batch(batch, schema, dictionaries))
+    return filepath
+
+
+def construct_batch(rows, schema, dictionaries): 
+    '''
+    Builds one record batch of the Feather file. 
+
+    Inputs: 
+        rows (list of lists): Rows from construct_row()
+        schema (pyarrow.Schema): Schema from construct_schema()
+        dictionaries (dict): Position of each value of a categorical column, 
+            by column number
+    
+    Outputs: 
+        pyarrow.RecordBatch
+    '''
+    arrays = []
+    for i, (field, column) in enumerate(zip(schema, zip(*rows))): 
+        if i in dictionaries: 
+            positions = dictionaries[i]
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array([positions.get(value) for value in column], 
+                type=pa.int32()), 
+                pa.array(list(positions), type=pa.string())))
+        elif pa.types.is_boolean(field.type) or pa.types.is_string(field.type): 
+            arrays.append(pa.array(column, type=field.type))
+        else: 
+            arrays.append(pa.array([coerce_number(value) for value in column], 
+                type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def construct_schema(fields, types_dict): 
+    '''
+    Constructs the Arrow schema of the all-games table: integers, floats and 
+    booleans for numbers and flags, dictionary-encoded (categorical) strings 
+    for the poll results, and nullable columns for per-type ratings and ranks, 
+    which are null where the game has no rank of that type. Column names are 
+    those pandas gives the CSV's header. 
+
+    Inputs: 
+        fields (list of str): Header fields from construct_fields()
+        types_dict (dict): Dictionary with counts of game types
+    
+    Outputs: 
+        pyarrow.Schema
+    '''
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    known = {
+        "bgg_id": pa.int64(), 
+        "is_boardgame": pa.bool_(), 
+        "name": pa.string(), 
+        "name_coerced": pa.string(), 
+        "yearpublished": pa.int32(), 
+        "shortdescription": pa.string(), 
+        "minplayers": pa.int32(), 
+        "maxplayers": pa.int32(), 
+        "playingtime": pa.int32(), 
+        "minplaytime": pa.int32(), 
+        "maxplaytime": pa.int32(), 
+        "age": pa.int32(), 
+        "suggested_playerage": categorical, 
+        "suggested_numplayers": categorical, 
+        "suggested_language": categorical, 
+        "num_ratings": pa.int64(), 
+        "geek_rating": pa.float64(), 
+        "num_types": pa.int32(), 
+        "num_categories": pa.int32(), 
+        "num_mechanics": pa.int32(), 
+        "averageweight": pa.float64(), 
+        "long_description": pa.string(), 
+        "image_url": pa.string()}
+    for gametype in types_dict.keys(): 
+        known[gametype] = pa.bool_()
+        known[gametype + "_avg_rating"] = pa.float64()
+        known[gametype + "_rank"] = pa.int32()
+    # Everything else is a category or mechanic flag
+    # A category or mechanic can share its name with a type, such as "Party 
+    # Game"; name a repeat as pandas.read_csv() names it in the CSV ("Party 
+    # Game.1"), so the table loads the same from either file
+    names = []
+    seen = {}
+    for field in fields: 
+        if field in seen: 
+            seen[field] += 1
+            names.append(f"{field}.{seen[field]}")
+        else: 
+            seen[field] = 0
+            names.append(field)
+    return pa.schema([pa.field(name, known.get(field, pa.bool_())) 
+        for name, field in zip(names, fields)])
+
+
+def coerce_number(value): 
+    '''
+    Coerces a numeric value from the all-games table to a number, or to None 
+    where it is missing: empty text, "Not Ranked", or the False that 
+    construct_row() uses for the rating and rank of a type the game lacks. 
+
+    Inputs: 
+        value (str, int, float or bool): Value to coerce
+    
+    Outputs: 
+        int, float or None
+    '''
+    if value is None or value is False or value in ("", "Not Ranked"): 
+        return None
+    if isinstance(value, str): 
+        return float(value) if "." in value else int(value)
+    return value
 
 
 def construct_fields(types_dict, categories_dict, mechanics_dict): 
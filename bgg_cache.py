@@ -0,0 +1,129 @@
+'''
+Persistent on-disk cache of BoardGameGeek (BGG) API responses.
+
+Responses are stored gzip-compressed under the SHA-256 of the request URL, so
+the ID batch and every query parameter are part of the key. Entries expire
+after a time-to-live, and the least recently used entries are evicted once
+the cache grows past its size limit. In offline mode every request must be
+answered from the cache, which lets get_game_info(), construct_csv() and the
+rest of bgg_api.go be re-run in seconds without touching the API.
+'''
+import gzip
+import hashlib
+import os
+import time
+
+DEFAULT_CACHE_DIR = "api_cache"
+DEFAULT_TTL = 7 * 24 * 60 * 60 # One week, in seconds
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheMiss(LookupError):
+    '''
+    Raised in offline mode when a request is not in the cache.
+    '''
+
+
+class ResponseCache:
+    '''
+    Content-addressed cache of API responses, keyed by request URL.
+
+    Inputs:
+        cache_dir (str): Directory to keep cached responses in
+        ttl (int or None): Seconds a response stays fresh. None never expires.
+        max_bytes (int or None): Size limit of the cache on disk, enforced by
+            evicting the least recently used responses. None is unbounded.
+        offline (bool): If True, never call the API; serve every request from
+            the cache regardless of age and raise CacheMiss otherwise.
+    '''
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL,
+        max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, url):
+        '''
+        Returns the file a response for url is stored in.
+        '''
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".xml.gz")
+
+    def get(self, url):
+        '''
+        Returns the cached response for url, or None if it is missing or has
+        expired. A hit marks the entry as recently used.
+
+        Inputs:
+            url (str): Request URL
+
+        Outputs:
+            Response content (bytes) or None
+        '''
+        filepath = self.path(url)
+        try:
+            age = time.time() - os.path.getmtime(filepath)
+            if not self.offline and self.ttl is not None and age > self.ttl:
+                os.remove(filepath)
+                raise FileNotFoundError(filepath)
+            with open(filepath, "rb") as f:
+                content = gzip.decompress(f.read())
+        except (OSError, EOFError): # Missing, expired or truncated
+            self.misses += 1
+            return None
+        os.utime(filepath, (time.time(), os.path.getmtime(filepath)))
+        self.hits += 1
+        return content
+
+    def put(self, url, content):
+        '''
+        Stores the response for url, then evicts old entries if the cache is
+        over its size limit. The file is written atomically, so an
+        interrupted run never leaves a truncated entry behind.
+
+        Inputs:
+            url (str): Request URL
+            content (bytes): Response content
+        '''
+        filepath = self.path(url)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_filepath = filepath + f".{os.getpid()}.tmp"
+        with open(tmp_filepath, "wb") as f:
+            f.write(gzip.compress(content))
+        os.replace(tmp_filepath, filepath)
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes):
+        '''
+        Removes the least recently used entries until the cache takes up at
+        most max_bytes on disk. Entries are ordered by last access time,
+        which get() refreshes on every hit.
+
+        Inputs:
+            max_bytes (int): Size limit of the cache on disk
+
+        Outputs:
+            Number of entries removed (int)
+        '''
+        entries = []
+        total_bytes = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(".xml.gz"):
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    entries.append((stat.st_atime, stat.st_size,
+                        os.path.join(dirpath, filename)))
+                    total_bytes += stat.st_size
+        entries.sort()
+        removed = 0
+        for _, size, filepath in entries:
+            if total_bytes <= max_bytes:
+                break
+            os.remove(filepath)
+            total_bytes -= size
+            removed += 1
+        return removed
@@ -7,51 +7,280 @@ Onel Abreu
 # pylint: disable-msg=invalid-name, redefined-outer-name, unused-argument, unused-variable
 
 import csv
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
 import bs4
-import pandas
 import requests
+from requests.adapters import HTTPAdapter
 
-def go(num_games_to_crawl, index_filename):
+BASE_URL = "https://boardgamegeek.com"
+GAMES_PER_PAGE = 100
+
+def go(num_games_to_crawl, index_filename, max_workers=1, base_url=BASE_URL,
+    resume=False):
     '''
-    Crawl the BoardGameGeek website rankings by num_voters and generates a CSV file 
-    with the ordered rankings by game_id.
+    Crawl the BoardGameGeek website rankings by num_voters and generates a CSV file
+    with the ordered rankings by game_id, with each game's short description and
+    number of voters.
+
+    Rows are appended to the CSV and flushed as each page comes in, so the
+    index can be read while the crawl is still running, and memory does not
+    grow with num_games_to_crawl. After each page, the checkpoint file
+    index_filename + ".checkpoint" records how far the crawl got; it is
+    removed once the crawl completes.
 
     Inputs:
         num_games_to_crawl: the number of games to process during the crawl;
-        index_filename: the name for the CSV of the index.
+        index_filename: the name for the CSV of the index;
+        max_workers: the number of browse pages to fetch at the same time.
+            Default = 1, which crawls the pages one after another;
+        base_url: the site to crawl, such as a local fixture server.
+            Default = BASE_URL;
+        resume: if True, continue an interrupted crawl of the same
+            num_games_to_crawl and base_url from its last completed page,
+            instead of starting over. Default = False.
 
     Outputs:
         CSV file of the index.
     '''
-    # figure out the total number of pages to traverse, 
-    # where each page has 100 games listed
-    if num_games_to_crawl <= 100:
-        num_pages_to_crawl = 1
+    for row in crawl_to_index(num_games_to_crawl, index_filename, max_workers,
+        base_url, resume):
+        pass
+
+
+def crawl_to_index(num_games_to_crawl, index_filename, max_workers=1,
+    base_url=BASE_URL, resume=False):
+    '''
+    Crawl like go(), writing the same CSV file and checkpoint, and yield each
+    game once its page is safely in the index, so the games can be used while
+    the crawl is still running. When resuming, the games already in the index
+    are yielded first.
+
+    Inputs:
+        as for go().
+
+    Outputs:
+        generator of (game_id, game_text, num_voters) tuples in rank order.
+    '''
+    checkpoint_filename = index_filename + ".checkpoint"
+    crawl_params = {"num_games_to_crawl": num_games_to_crawl,
+        "base_url": base_url}
+    page, num_rows, offset = 0, 0, 0
+    if resume and os.path.exists(checkpoint_filename):
+        page, num_rows, offset = load_checkpoint(checkpoint_filename,
+            crawl_params)
+        print(f"Resuming crawl after page {page} with {num_rows} games")
     else:
-        num_pages_to_crawl = 1 + num_games_to_crawl//100
+        with open(checkpoint_filename, "w") as f:
+            f.write(json.dumps(crawl_params) + "\n")
+
+    with open(index_filename, "a+", newline="", encoding="utf-8") as f:
+        # drop rows written after the last checkpoint
+        f.truncate(offset)
+        f.seek(0)
+        for row in csv.reader(f):
+            yield tuple(row)
+        writer = csv.writer(f, lineterminator="\n")
+        for page, page_rows in crawl_pages(num_games_to_crawl, max_workers,
+            base_url, start_page=page + 1):
+            page_rows = page_rows[:num_games_to_crawl - num_rows]
+            writer.writerows(page_rows)
+            num_rows += len(page_rows)
+            f.flush()
+            os.fsync(f.fileno())
+            write_checkpoint(checkpoint_filename, page, num_rows, f.tell())
+            for row in page_rows:
+                yield row
+    os.remove(checkpoint_filename)
+
+
+def crawl(num_games_to_crawl, max_workers=1, base_url=BASE_URL):
+    '''
+    Crawl the BoardGameGeek website rankings by num_voters, yielding each game
+    as soon as its page is scraped.
+
+    Inputs:
+        num_games_to_crawl: the number of games to yield;
+        max_workers: the number of browse pages to fetch at the same time;
+        base_url: the site to crawl.
 
+    Outputs:
+        generator of (game_id, game_text, num_voters) tuples in rank order.
+    '''
+    num_rows = 0
+    for page, page_rows in crawl_pages(num_games_to_crawl, max_workers,
+        base_url):
+        for row in page_rows[:num_games_to_crawl - num_rows]:
+            yield row
+        num_rows += len(page_rows)
+
+
+def crawl_pages(num_games_to_crawl, max_workers=1, base_url=BASE_URL,
+    start_page=1):
+    '''
+    Fetch and scrape the browse pages that cover num_games_to_crawl games, with
+    at most max_workers pages in flight, yielding them in rank order. Stops
+    early at a page with no games, past the end of the rankings.
+
+    Inputs:
+        num_games_to_crawl: the number of games the pages must cover;
+        max_workers: the number of browse pages to fetch at the same time;
+        base_url: the site to crawl;
+        start_page: the first browse page to fetch. Default = 1.
+
+    Outputs:
+        generator of (page, list of (game_id, game_text, num_voters) tuples).
+    '''
+    # each page has 100 games listed
+    num_pages_to_crawl = max(1, -(-num_games_to_crawl // GAMES_PER_PAGE))
+    pages = iter(range(start_page, num_pages_to_crawl + 1))
+
+    # fetch pages over a shared, pooled session; unlike executor.map, only
+    # max_workers pages are requested ahead of the one being handed back, so
+    # a slow consumer does not pile up fetched pages
+    session = create_session(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        try:
+            for page in pages:
+                in_flight.append((page, executor.submit(crawl_page, session,
+                    page, base_url)))
+                if len(in_flight) == max_workers:
+                    break
+            while in_flight:
+                page, future = in_flight.popleft()
+                page_rows = future.result()
+                if not page_rows:
+                    break
+                for next_page in pages:
+                    in_flight.append((next_page, executor.submit(crawl_page,
+                        session, next_page, base_url)))
+                    break
+                yield page, page_rows
+        finally:
+            for page, future in in_flight:
+                future.cancel()
+            session.close()
+
+
+def write_checkpoint(checkpoint_filename, page, num_rows, offset):
+    '''
+    Append a completed page to the checkpoint file and force it to disk.
+
+    Inputs:
+        checkpoint_filename: the name of the checkpoint file;
+        page: the last browse page written to the index;
+        num_rows: the number of games in the index so far;
+        offset: the size of the index file in bytes.
+    '''
+    with open(checkpoint_filename, "a") as f:
+        f.write(json.dumps({"page": page, "rows": num_rows, "offset": offset})
+            + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_checkpoint(checkpoint_filename, crawl_params):
+    '''
+    Read how far an interrupted crawl got. A last line cut short by a crash is
+    ignored, so the crawl resumes after the last page completely written.
+
+    Inputs:
+        checkpoint_filename: the name of the checkpoint file;
+        crawl_params: the parameters of the crawl being resumed.
+
+    Outputs:
+        (last page, number of games, size of the index file in bytes), all 0
+        if no page was completed.
+    '''
+    with open(checkpoint_filename) as f:
+        lines = f.read().split("\n")
+    checkpoint_params = json.loads(lines[0])
+    if checkpoint_params != crawl_params:
+        raise ValueError(f"Checkpoint {checkpoint_filename} is for a different "
+            f"crawl: {checkpoint_params}")
+    pages = []
+    for line in lines[1:]:
+        try:
+            pages.append(json.loads(line))
+        except ValueError: # empty or partially written line
+            break
+    if len(lines) != len(pages) + 2 or lines[-1] != "":
+        # rewrite without the partial line, so new pages append cleanly
+        with open(checkpoint_filename + ".tmp", "w") as f:
+            for line in lines[:len(pages) + 1]:
+                f.write(line + "\n")
+        os.replace(checkpoint_filename + ".tmp", checkpoint_filename)
+    if not pages:
+        return 0, 0, 0
+    return pages[-1]["page"], pages[-1]["rows"], pages[-1]["offset"]
+
+
+def create_session(max_workers=1):
+    '''
+    Create a requests session whose connection pool is large enough for
+    max_workers concurrent fetches, so TLS connections are reused across pages.
+
+    Inputs:
+        max_workers: the number of concurrent fetches the session must serve.
+
+    Outputs:
+        requests.Session
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def crawl_page(session, page, base_url=BASE_URL):
+    '''
+    Fetch one browse page (sorted by number of voters) and scrape it.
+
+    Inputs:
+        session: the requests session to fetch the page with;
+        page: the browse page number, starting at 1;
+        base_url: the site to crawl.
+
+    Outputs:
+        list of (game_id, game_text, num_voters) tuples in rank order.
+    '''
+    url = (base_url + "/browse/boardgame/page/" + str(page) +
+        "?sort=numvoters&sortdir=desc")
+    r = session.get(url)
+    return parse_page(r.text)
+
+
+def parse_page(page_text):
+    '''
+    Scrape game IDs, short descriptions and numbers of voters from the HTML of a
+    browse page.
+
+    Inputs:
+        page_text: the HTML of the browse page.
+
+    Outputs:
+        list of (game_id, game_text, num_voters) tuples in rank order, where
+        num_voters is "" if the page does not show it.
+    '''
+    soup = bs4.BeautifulSoup(page_text, "html5lib")
+    body_text = soup.tbody.select("tr", id_="row_")
     game_ids_texts = []
-    game_count = 0
-
-    # iterate through each page and scrape game ID/description until we
-    # reach num_games_to_crawl; then transform into dataframe/csv
-    for page in range(1, num_pages_to_crawl + 1):
-        url = "https://boardgamegeek.com/browse/boardgame/page/" + str(page) + "?sort=numvoters&sortdir=desc"
-        r = requests.get(url)
-        soup = bs4.BeautifulSoup(r.text, "html5lib")
-        body_text = soup.tbody.select("tr", id_="row_")
-        for row in body_text[1:]:
-            if game_count < num_games_to_crawl:
-                game_count += 1
-                game_id = row.find("a", class_="primary")["href"].split("/")[2]
-                text_exists = row.find("p", class_="smallefont dull")
-                if text_exists:
-                    game_text = text_exists.get_text().strip()
-                else:
-                    game_text = ""
-                game_ids_texts.append((game_id, game_text))
-            else: 
-                break
-
-    df = pandas.DataFrame(game_ids_texts, columns=["Game_ID", "Game_Text"])
-    df.to_csv(index_filename, index=False, header=False)
\ No newline at end of file
+    for row in body_text[1:]:
+        game_id = row.find("a", class_="primary")["href"].split("/")[2]
+        text_exists = row.find("p", class_="smallefont dull")
+        if text_exists:
+            game_text = text_exists.get_text().strip()
+        else:
+            game_text = ""
+        # the ratings columns are Geek Rating, Avg Rating and Num Voters
+        ratings = row.find_all("td", class_="collection_bggrating")
+        if len(ratings) == 3:
+            num_voters = ratings[2].get_text().strip()
+        else:
+            num_voters = ""
+        game_ids_texts.append((game_id, game_text, num_voters))
+    return game_ids_texts
@@ -0,0 +1,255 @@
+'''
+Pipelined bulk pulls from the BoardGameGeek (BGG) API.
+
+bgg_api.go fetches a batch, parses it and waits on the rate limit one step
+after another, so parsing takes up time the politeness limit would allow for
+requests. go() here runs the same pull as three stages joined by queues:
+
+    fetch (threads, rate limited) -> parse (process pool) -> write (one task)
+
+A producer keeps up to fetch_concurrency API requests in flight through the
+shared TokenBucket. Responses wait in a bounded queue, so fetching pauses
+when parsing falls behind instead of piling up responses in memory. Parse
+workers hand each batch to a process pool, and a single writer merges the
+parsed batches back in batch order, so the output files are the same as
+bgg_api.go writes for the same batches. Games that cannot be read are set
+aside in the same quarantine file as bgg_api.go uses (see bgg_quarantine).
+
+    python bgg_ingest.py game_ids.csv --limit 100000 --parser iterparse
+'''
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import bgg_api
+import bgg_jsonl
+import bgg_quarantine
+import bgg_rate
+
+
+def go(file_in, limit=5000, size=100, file_suffix_out="", parser="html5lib",
+    cache=None, limiter=None, adaptive=False, output="json", max_workers=None,
+    fetch_concurrency=4, queue_size=4, base_url=None):
+    '''
+    Pulls data from the BGG API like bgg_api.go, with fetching, parsing and
+    writing overlapped. A pull is bound by the rate limit once there are
+    enough parse processes to keep up with it.
+
+    Inputs:
+        file_in, limit, size, file_suffix_out, parser, cache, limiter,
+            adaptive, output: As for bgg_api.go.
+        max_workers (int): Number of parse processes. Default = None, which
+            uses one per CPU.
+        fetch_concurrency (int): Most API requests in flight at once. The
+            rate limiter still spaces out when they start. Default = 4.
+        queue_size (int): Most fetched batches waiting to be parsed. Default = 4.
+        base_url (str): Site to call the API on, as for bgg_api.fetch_api().
+            Default = None.
+
+    Outputs:
+        Writes the same files as bgg_api.go, and its quarantine file.
+    '''
+    ids = bgg_api.import_ids(file_in)
+    short_descriptions = bgg_api.index_short_descriptions(ids)
+    ids = list(ids["ID"][:limit])
+    if limiter is None:
+        limiter = bgg_rate.TokenBucket(rate=1 / 5)
+    if adaptive:
+        sizer = bgg_rate.BatchSizer(size)
+    else:
+        sizer = bgg_rate.FixedBatchSizer(size)
+    games_dict = {}
+    if output == "jsonl":
+        games_dict = bgg_jsonl.JsonLinesWriter(f"all_games{file_suffix_out}.jsonl")
+    types_dict = {}
+    categories_dict = {}
+    mechanics_dict = {}
+    num_parsers = max_workers or os.cpu_count() or 1
+    quarantine_path = bgg_quarantine.quarantine_path(file_suffix_out)
+    bgg_quarantine.start_quarantine(quarantine_path)
+
+    print(f"\nObtaining BoardGameGeek information for top {len(ids)} IDs by number of votes")
+    with ThreadPoolExecutor(max_workers=fetch_concurrency) as fetch_pool, \
+        ProcessPoolExecutor(max_workers=num_parsers) as parse_pool:
+        asyncio.run(run_pipeline(ids, short_descriptions, sizer, fetch_pool,
+            parse_pool, fetch_concurrency, num_parsers, queue_size, games_dict,
+            types_dict, categories_dict, mechanics_dict, cache=cache,
+            limiter=limiter, parser=parser, base_url=base_url,
+            quarantine_path=quarantine_path))
+
+    bgg_api.write_outputs(games_dict, types_dict, categories_dict,
+        mechanics_dict, file_suffix_out, output)
+    bgg_quarantine.finish_quarantine(quarantine_path, len(games_dict))
+
+
+async def run_pipeline(ids, short_descriptions, sizer, fetch_pool, parse_pool,
+    num_fetchers, num_parsers, queue_size, games_dict, types_dict,
+    categories_dict, mechanics_dict, cache=None, limiter=None,
+    parser="html5lib", base_url=None, quarantine_path=None):
+    '''
+    Runs the fetch, parse and write stages until every ID is pulled.
+
+    Inputs:
+        ids (list of str): BGG IDs to pull, in order
+        short_descriptions (dict): Short descriptions by BGG ID
+        sizer (bgg_rate.BatchSizer): Batch sizer deciding how many IDs go
+            into each request
+        fetch_pool (ThreadPoolExecutor): Threads to make API requests on
+        parse_pool (ProcessPoolExecutor): Processes to parse responses on
+        num_fetchers (int): Most API requests in flight at once
+        num_parsers (int): Number of batches to parse at once
+        queue_size (int): Most fetched batches waiting to be parsed
+        games_dict, types_dict, categories_dict, mechanics_dict: Dictionaries
+            to merge game information and counts into, as for
+            bgg_api.get_game_info()
+        cache, limiter, parser, base_url: As for go().
+        quarantine_path (str): Quarantine file to add games that cannot be
+            read to. Default = None, which stops the pull at the first one.
+
+    Outputs:
+        None: Updates games_dict, types_dict, categories_dict, and
+            mechanics_dict in place.
+    '''
+    loop = asyncio.get_running_loop()
+    fetched = asyncio.Queue(maxsize=queue_size)
+    parsed = asyncio.Queue()
+    in_flight = asyncio.Semaphore(num_fetchers)
+
+    async def fetch(index, batch_ids):
+        # The fetch keeps its place in flight until its response is queued,
+        # so at most num_fetchers + queue_size responses wait to be parsed
+        try:
+            response = await loop.run_in_executor(fetch_pool, bgg_api.fetch_api,
+                ",".join(batch_ids), cache, limiter, sizer, None, base_url)
+            batch_descriptions = {bgg_id: short_descriptions[bgg_id]
+                for bgg_id in batch_ids}
+            # Waits here while the parse stage is behind
+            await fetched.put((index, response, batch_descriptions))
+        finally:
+            in_flight.release()
+
+    async def produce():
+        fetches = []
+        num_batches = 0
+        start = 0
+        while start < len(ids):
+            await in_flight.acquire()
+            running = []
+            for task in fetches:
+                if task.done():
+                    task.result() # Stops the pull at a failed request
+                else:
+                    running.append(task)
+            fetches = running
+            end = min(start + sizer.size, len(ids))
+            print(f'Pulling IDs {start + 1}-{end}')
+            fetches.append(asyncio.ensure_future(fetch(num_batches,
+                ids[start:end])))
+            num_batches += 1
+            start = end
+        await asyncio.gather(*fetches)
+        for _ in range(num_parsers):
+            await fetched.put(None)
+        await parsed.put((None, num_batches))
+
+    async def parse():
+        while True:
+            item = await fetched.get()
+            if item is None:
+                return
+            index, response, batch_descriptions = item
+            batch_games = await loop.run_in_executor(parse_pool, parse_batch,
+                response, batch_descriptions, parser, quarantine_path is not None)
+            await parsed.put((index, batch_games))
+
+    async def write():
+        # Batches can finish parsing out of order; merge them in batch order
+        pending = {}
+        next_index = 0
+        num_batches = None
+        while num_batches is None or next_index < num_batches:
+            index, batch_games = await parsed.get()
+            if index is None:
+                num_batches = batch_games
+                continue
+            pending[index] = batch_games
+            while next_index in pending:
+                batch_games, failures = pending.pop(next_index)
+                merge_batch(batch_games, games_dict, types_dict,
+                    categories_dict, mechanics_dict)
+                if failures:
+                    bgg_quarantine.add_entries(quarantine_path, failures)
+                next_index += 1
+
+    tasks = [asyncio.ensure_future(produce()), asyncio.ensure_future(write())]
+    tasks.extend(asyncio.ensure_future(parse()) for _ in range(num_parsers))
+    done, pending = await asyncio.wait(tasks,
+        return_when=asyncio.FIRST_EXCEPTION)
+    # A failed stage would leave the others waiting on their queues forever
+    for task in pending:
+        task.cancel()
+    for task in done:
+        task.result()
+
+
+def parse_batch(response, short_descriptions, parser="html5lib",
+    quarantine=False):
+    '''
+    Parses one API response in a worker process.
+
+    Inputs:
+        response (bytes): Raw API response from bgg_api.fetch_api()
+        short_descriptions (dict): Short descriptions of the batch's games
+        parser (str): Parser backend in bgg_parse.PARSERS
+        quarantine (bool): If True, set aside games that cannot be read
+            instead of raising. Default = False.
+
+    Outputs:
+        (list of (bgg_id, game information) tuples in response order, list
+            of bgg_quarantine entries)
+    '''
+    batch_games = {}
+    failures = [] if quarantine else None
+    bgg_api.get_game_info(response, batch_games, {}, {}, {}, short_descriptions,
+        parser=parser, failures=failures)
+    return list(batch_games.items()), failures or []
+
+
+def merge_batch(batch_games, games_dict, types_dict, categories_dict,
+    mechanics_dict):
+    '''
+    Merges one parsed batch into the pull. Games already pulled in an earlier
+    batch are skipped, as bgg_api.get_game_info() skips them.
+
+    Inputs:
+        batch_games (list): (bgg_id, game information) tuples from parse_batch()
+        games_dict, types_dict, categories_dict, mechanics_dict: Dictionaries
+            to merge into
+
+    Outputs:
+        None: Updates the dictionaries in place.
+    '''
+    for bgg_id, game_info in batch_games:
+        if bgg_id in games_dict:
+            continue
+        bgg_api.count_game(game_info, types_dict, categories_dict,
+            mechanics_dict)
+        games_dict[bgg_id] = game_info
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("file_in")
+    arg_parser.add_argument("--limit", type=int, default=5000)
+    arg_parser.add_argument("--size", type=int, default=100)
+    arg_parser.add_argument("--suffix", default="")
+    arg_parser.add_argument("--parser", default="html5lib")
+    arg_parser.add_argument("--output", default="json")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--adaptive", action="store_true")
+    arg_parser.add_argument("--base-url", default=None)
+    args = arg_parser.parse_args()
+    go(args.file_in, limit=args.limit, size=args.size,
+        file_suffix_out=args.suffix, parser=args.parser, adaptive=args.adaptive,
+        output=args.output, max_workers=args.workers, base_url=args.base_url)
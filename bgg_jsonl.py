@@ -0,0 +1,96 @@
+'''
+Streaming JSON Lines storage of BoardGameGeek (BGG) game records.
+
+Each line of an all_games*.jsonl file is one compact JSON object: the game
+record built by bgg_api.get_game_info(), plus its "bgg_id". Games are written
+as soon as they are parsed and read back one at a time, so neither writing
+nor reading a pull holds the whole catalogue in memory.
+
+    for game in bgg_jsonl.read_games("all_games.jsonl"):
+        print(game["bgg_id"], game["name"])
+'''
+import json
+import os
+
+
+def read_games(filepath):
+    '''
+    Lazily reads game records from a JSON Lines file.
+
+    Inputs:
+        filepath (str): Name of the JSON Lines file
+
+    Outputs:
+        Generator of game information dictionaries, each including "bgg_id"
+    '''
+    with open(filepath, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class JsonLinesWriter:
+    '''
+    Write-through stand-in for games_dict in bgg_api.go. Setting a game
+    appends it to the file instead of keeping it in memory; only the IDs
+    seen so far are held, so `bgg_id in writer` still de-duplicates games.
+
+    Inputs:
+        filepath (str): Name of the JSON Lines file
+        offset (int): Resume an earlier file, keeping its first offset bytes
+            and dropping anything after them. Default = None, which starts
+            a new file.
+    '''
+    def __init__(self, filepath, offset=None):
+        self.filepath = filepath
+        self.ids = set()
+        self.num_games = 0
+        if offset is None:
+            self.file = open(filepath, "w")
+        else:
+            self.file = open(filepath, "r+")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+            for game in read_games(filepath):
+                self.ids.add(game["bgg_id"])
+                self.num_games += 1
+
+    def __setitem__(self, bgg_id, info):
+        record = {"bgg_id": bgg_id}
+        record.update(info)
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.ids.add(bgg_id)
+        self.num_games += 1
+
+    def __contains__(self, bgg_id):
+        return bgg_id in self.ids
+
+    def __len__(self):
+        return self.num_games
+
+    def items(self):
+        '''
+        Lazily reads back every game written so far.
+
+        Outputs:
+            Generator of (bgg_id, game information) tuples
+        '''
+        if not self.file.closed:
+            self.flush()
+        for game in read_games(self.filepath):
+            yield game.pop("bgg_id"), game
+
+    def flush(self):
+        '''
+        Forces every game written so far to disk.
+
+        Outputs:
+            Size of the file in bytes (int), to checkpoint as an offset
+        '''
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.flush()
+        self.file.close()
@@ -0,0 +1,252 @@
+'''
+Timing and throughput instrumentation for pulls from the BoardGameGeek (BGG)
+API.
+
+A PullReport collects, for each stage of a pull, the wall-clock time and the
+CPU time of the thread that ran it, plus per-batch figures: IDs, games, bytes
+received, retries and games per second. It prints a live progress line with
+an ETA while the pull runs, and is written next to the output files as
+all_games<suffix>_report.json:
+
+    {"stages": {"fetch_wait": {"wall": 12.5, "cpu": 0.01, "calls": 50}, ...},
+     "totals": {"ids": 5000, "games": 4990, "bytes": 61234567, ...},
+     "batches": [{"first_id": 1, "last_id": 100, "games": 100, ...}, ...]}
+
+Stages timed by bgg_api.go:
+    network: waiting on the API inside requests.get (fetch thread)
+    rate_limit: waiting on the TokenBucket for a request slot (fetch thread)
+    backoff: sleeping before a retry when there is no TokenBucket
+    fetch_wait: the main thread waiting for a prefetched batch
+    parse: building the parse tree and finding the next <boardgame>
+    extract: reading a game's values and building its record
+    split, parse_wait: with parse_workers, cutting a response into shards and
+        waiting on the process pool for each shard
+    checkpoint, write_games, construct_csv, construct_feather, write_tags,
+        create_extra_csv: writing the checkpoint and output files
+'''
+import contextlib
+import json
+import sys
+import threading
+import time
+
+
+class PullReport:
+    '''
+    Collects stage timings and batch figures of one pull, and shows progress.
+
+    Inputs:
+        total_ids (int): Number of IDs the pull will request
+        params (dict): Parameters of the pull, to record in the report
+        stream (file): Where to show the progress line. Default = sys.stdout.
+    '''
+    def __init__(self, total_ids, params=None, stream=None):
+        self.total_ids = total_ids
+        self.params = params or {}
+        self.stream = stream or sys.stdout
+        self.live = self.stream.isatty()
+        self.stages = {}
+        self.batches = []
+        self.totals = {"ids": 0, "games": 0, "quarantined": 0, "bytes": 0,
+            "requests": 0, "retries": 0, "cache_hits": 0}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.batch_start = None
+        self.batch_stages = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Times the body of a with statement as one call of a stage.
+
+        Inputs:
+            name (str): Name of the stage
+        '''
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall,
+                time.thread_time() - cpu)
+
+    def add_time(self, name, wall, cpu=0.0, calls=1):
+        '''
+        Adds time measured elsewhere to a stage.
+
+        Inputs:
+            name (str): Name of the stage
+            wall (float): Wall-clock seconds
+            cpu (float): CPU seconds. Default = 0.0.
+            calls (int): Number of calls the time covers. Default = 1.
+        '''
+        with self.lock:
+            totals = self.stages.setdefault(name,
+                {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            totals["wall"] += wall
+            totals["cpu"] += cpu
+            totals["calls"] += calls
+
+    def timed(self, iterator, name):
+        '''
+        Times each step of an iterator as one call of a stage, such as the
+        incremental parse behind a parser backend's iter_games().
+
+        Inputs:
+            iterator (iterator): Iterator to time
+            name (str): Name of the stage
+
+        Outputs:
+            Generator of the iterator's items
+        '''
+        iterator = iter(iterator)
+        while True:
+            with self.stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def add_fetch(self, fetch_stats):
+        '''
+        Adds the time a fetch spent on the network, on the rate limit and
+        backing off to their stages.
+
+        Inputs:
+            fetch_stats (dict): Figures filled in by bgg_api.fetch_api()
+        '''
+        requests = fetch_stats.get("requests", 0)
+        if requests:
+            self.add_time("network", fetch_stats["network"],
+                fetch_stats["network_cpu"], calls=requests)
+            self.add_time("rate_limit", fetch_stats["rate_limit"], calls=requests)
+        if fetch_stats.get("backoff"):
+            self.add_time("backoff", fetch_stats["backoff"],
+                calls=fetch_stats["retries"])
+
+    def start_batch(self):
+        '''
+        Marks the start of a batch, so add_batch() can record the time each
+        stage spent on it.
+        '''
+        self.batch_start = time.perf_counter()
+        with self.lock:
+            self.batch_stages = {name: dict(totals)
+                for name, totals in self.stages.items()}
+
+    def add_batch(self, first_id, last_id, num_games, fetch_stats,
+        num_quarantined=0):
+        '''
+        Records a completed batch and updates the progress line.
+
+        Inputs:
+            first_id (int): Index of the first ID in the batch, starting at 1
+            last_id (int): Index of the last ID in the batch
+            num_games (int): Number of games the batch added
+            fetch_stats (dict): Figures filled in by bgg_api.fetch_api()
+            num_quarantined (int): Number of games the batch set aside in
+                quarantine. Default = 0.
+        '''
+        wall = time.perf_counter() - self.batch_start
+        stages = {}
+        with self.lock:
+            for name, totals in self.stages.items():
+                before = self.batch_stages.get(name,
+                    {"wall": 0.0, "cpu": 0.0, "calls": 0})
+                if totals["calls"] != before["calls"]:
+                    stages[name] = {"wall": round(totals["wall"] - before["wall"], 6),
+                        "cpu": round(totals["cpu"] - before["cpu"], 6)}
+        self.batches.append({"first_id": first_id, "last_id": last_id,
+            "games": num_games, "quarantined": num_quarantined,
+            "bytes": fetch_stats.get("bytes", 0),
+            "retries": fetch_stats.get("retries", 0),
+            "cached": fetch_stats.get("cached", False), "wall": round(wall, 6),
+            "games_per_sec": round(num_games / wall, 2) if wall else None,
+            "stages": stages})
+        self.totals["ids"] += last_id - first_id + 1
+        self.totals["games"] += num_games
+        self.totals["quarantined"] += num_quarantined
+        self.totals["bytes"] += fetch_stats.get("bytes", 0)
+        self.totals["retries"] += fetch_stats.get("retries", 0)
+        self.totals["requests"] += fetch_stats.get("requests", 0)
+        self.totals["cache_hits"] += int(fetch_stats.get("cached", False))
+        self.show_progress(last_id)
+
+    def show_progress(self, last_id):
+        '''
+        Shows how far the pull has got, its throughput and the time left. On a
+        terminal the line is redrawn in place; otherwise one line is printed
+        per batch.
+
+        Inputs:
+            last_id (int): Index of the last ID pulled so far
+        '''
+        elapsed = time.perf_counter() - self.start
+        done = self.totals["ids"]
+        remaining = self.total_ids - done
+        eta = elapsed / done * remaining if done else 0
+        line = (f"Pulled {done} of {self.total_ids} IDs "
+            f"({done / max(self.total_ids, 1):.0%}, up to #{last_id})  "
+            f"{self.totals['games'] / max(elapsed, 1e-9):.1f} games/sec  "
+            f"{self.totals['retries']} retries  "
+            f"{self.totals['quarantined']} quarantined  "
+            f"ETA {time.strftime('%H:%M:%S', time.gmtime(eta))}")
+        if self.live:
+            end = "\n" if remaining <= 0 else ""
+            self.stream.write("\r" + line.ljust(79) + end)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def as_dict(self):
+        '''
+        Outputs:
+            The report as a JSON-serialisable dictionary
+        '''
+        elapsed = time.perf_counter() - self.start
+        totals = dict(self.totals)
+        totals["wall"] = round(elapsed, 6)
+        totals["games_per_sec"] = round(totals["games"] / elapsed, 2) \
+            if elapsed else None
+        read = totals["games"] + totals["quarantined"]
+        totals["quarantine_rate"] = round(totals["quarantined"] / read, 6) \
+            if read else 0.0
+        return {"started": time.strftime("%Y-%m-%dT%H:%M:%S",
+                time.localtime(self.started)),
+            "params": self.params, "totals": totals,
+            "stages": {name: {"wall": round(stage["wall"], 6),
+                "cpu": round(stage["cpu"], 6), "calls": stage["calls"]}
+                for name, stage in self.stages.items()},
+            "batches": self.batches}
+
+    def write(self, filepath):
+        '''
+        Writes the report as JSON.
+
+        Inputs:
+            filepath (str): Name of the report file
+
+        Outputs:
+            filepath (str)
+        '''
+        with open(filepath, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+        return filepath
+
+
+class NullReport(PullReport):
+    '''
+    PullReport that records nothing, for callers that do not want a report.
+    '''
+    def __init__(self):
+        super().__init__(0, stream=sys.stdout)
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def add_time(self, name, wall, cpu=0.0, calls=1):
+        pass
+
+    def timed(self, iterator, name):
+        return iterator
@@ -0,0 +1,358 @@
+'''
+Parser backends for BoardGameGeek (BGG) API responses.
+
+Each backend turns one xmlapi/boardgame response into a stream of
+(bgg_id, game) pairs and reads the raw values bgg_api needs out of each game.
+build_game_info() then turns those raw values into a game record, so every
+backend produces exactly the same fields.
+
+    html5lib: the original bs4 + html5lib tree. Slow, but very forgiving.
+    iterparse: an incremental xml.etree parse that hands over one <boardgame>
+        element at a time and frees it as soon as it has been consumed.
+'''
+import io
+import re
+import xml.etree.ElementTree as ET
+import bs4
+
+NOT_GAME_CATEGORIES = {"Expansion for Base-game", "Fan Expansion", "Game System"}
+
+
+def iter_games_html5lib(response, skip=()):
+    '''
+    Yields each game in an API response parsed with html5lib.
+
+    Inputs:
+        response (bs4.BeautifulSoup, bytes or str): API response to parse
+        skip (container): IDs to leave out, such as games already pulled.
+            Checked lazily, so a dict filled while iterating is respected.
+
+    Outputs:
+        Generator of (bgg_id, bs4.element.Tag) tuples
+    '''
+    if isinstance(response, bs4.BeautifulSoup):
+        soup = response
+    elif isinstance(response, bytes):
+        # The API answers in UTF-8; left to guess, html5lib reads raw bytes
+        # as windows-1252
+        soup = bs4.BeautifulSoup(response, features="html5lib",
+            from_encoding="utf-8")
+    else:
+        soup = bs4.BeautifulSoup(response, features="html5lib")
+    for game in soup.find_all("boardgame"):
+        bgg_id = game["objectid"]
+            # Something really weird is happening between
+            # ids 1589 and 155731 (indices 2608 and 2609) - five IDs for non-games
+            # are getting inserted in the soup: 141023, 141024, 140248-14250.
+            # It looks like they have an additional attribute {'inbound': 'true'}
+        if "inbound" not in game.attrs.keys() and bgg_id not in skip:
+            yield bgg_id, game
+
+
+def read_game_html5lib(game):
+    '''
+    Reads the raw values of one game out of its html5lib <boardgame> tag.
+
+    Inputs:
+        game (bs4.element.Tag): <boardgame> tag
+
+    Outputs:
+        Dictionary of raw values, as described in build_game_info()
+    '''
+    playerage_poll = game.find("poll", attrs={"name":"suggested_playerage"})
+    numplayers_poll = game.find("poll", attrs={"name":"suggested_numplayers"})
+    language_poll = game.find("poll", attrs={"name": "language_dependence"})
+    ratings = game.statistics.ratings
+    return {
+        "name": game.find("name", attrs={"primary":"true"}).text,
+        "yearpublished": game.yearpublished.text,
+        "minplayers": game.minplayers.text,
+        "maxplayers": game.maxplayers.text,
+        "playingtime": game.playingtime.text,
+        "minplaytime": game.minplaytime.text,
+        "maxplaytime": game.maxplaytime.text,
+        "age": game.age.text,
+        "playerage_poll": (playerage_poll["totalvotes"],
+            [(option["value"], option["numvotes"])
+                for option in playerage_poll.results.find_all("result")]),
+        "numplayers_poll": (numplayers_poll["totalvotes"],
+            [(option["numplayers"],
+                option.find("result", attrs={"value": "Best"})["numvotes"])
+                for option in numplayers_poll.find_all("results")]),
+        "language_poll": (language_poll["totalvotes"],
+            [(option["value"], option["numvotes"])
+                for option in language_poll.results.find_all("result")]),
+        "usersrated": ratings.usersrated.text,
+        "average": ratings.average.text,
+        "ranks": [(rank["friendlyname"], rank["bayesaverage"], rank["value"])
+            for rank in ratings.ranks.find_all("rank")],
+        "categories": [cat.text for cat in game.find_all("boardgamecategory")],
+        "mechanics": [mech.text for mech in game.find_all("boardgamemechanic")],
+        "averageweight": game.statistics.averageweight.text,
+        "description": game.description.text,
+        # html5lib reads <image> as a void <img>, leaving the URL as a sibling
+        "image": game.img.next_sibling,
+    }
+
+
+def iter_games_iterparse(response, skip=()):
+    '''
+    Yields each game in an API response, parsing it incrementally. Each
+    <boardgame> element is cleared once the consumer asks for the next game,
+    so only one game is held in memory at a time.
+
+    Inputs:
+        response (bytes or str): API response to parse
+        skip (container): IDs to leave out, such as games already pulled.
+            Checked lazily, so a dict filled while iterating is respected.
+
+    Outputs:
+        Generator of (bgg_id, xml.etree.ElementTree.Element) tuples
+    '''
+    if isinstance(response, str):
+        response = response.encode("utf-8")
+    context = ET.iterparse(io.BytesIO(response), events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event == "end" and elem.tag == "boardgame":
+            bgg_id = elem.attrib["objectid"]
+            if "inbound" not in elem.attrib and bgg_id not in skip:
+                yield bgg_id, elem
+            root.clear()
+
+
+def read_game_iterparse(game):
+    '''
+    Reads the raw values of one game out of its <boardgame> element.
+
+    Inputs:
+        game (xml.etree.ElementTree.Element): <boardgame> element
+
+    Outputs:
+        Dictionary of raw values, as described in build_game_info()
+    '''
+    playerage_poll = game.find(".//poll[@name='suggested_playerage']")
+    numplayers_poll = game.find(".//poll[@name='suggested_numplayers']")
+    language_poll = game.find(".//poll[@name='language_dependence']")
+    statistics = _find(game, "statistics")
+    ratings = _find(statistics, "ratings")
+    return {
+        "name": _text(game.find(".//name[@primary='true']")),
+        "yearpublished": _text(_find(game, "yearpublished")),
+        "minplayers": _text(_find(game, "minplayers")),
+        "maxplayers": _text(_find(game, "maxplayers")),
+        "playingtime": _text(_find(game, "playingtime")),
+        "minplaytime": _text(_find(game, "minplaytime")),
+        "maxplaytime": _text(_find(game, "maxplaytime")),
+        "age": _text(_find(game, "age")),
+        "playerage_poll": (playerage_poll.attrib["totalvotes"],
+            [(option.attrib["value"], option.attrib["numvotes"])
+                for option in _find(playerage_poll, "results").iter("result")]),
+        "numplayers_poll": (numplayers_poll.attrib["totalvotes"],
+            [(option.attrib["numplayers"],
+                option.find(".//result[@value='Best']").attrib["numvotes"])
+                for option in numplayers_poll.iter("results")]),
+        "language_poll": (language_poll.attrib["totalvotes"],
+            [(option.attrib["value"], option.attrib["numvotes"])
+                for option in _find(language_poll, "results").iter("result")]),
+        "usersrated": _text(_find(ratings, "usersrated")),
+        "average": _text(_find(ratings, "average")),
+        "ranks": [(rank.attrib["friendlyname"], rank.attrib["bayesaverage"],
+            rank.attrib["value"]) for rank in _find(ratings, "ranks").iter("rank")],
+        "categories": [_text(cat) for cat in game.iter("boardgamecategory")],
+        "mechanics": [_text(mech) for mech in game.iter("boardgamemechanic")],
+        "averageweight": _text(_find(statistics, "averageweight")),
+        "description": _text(_find(game, "description")),
+        # Like html5lib, keep the whitespace that follows the URL
+        "image": _text(_find(game, "image")) + (_find(game, "image").tail or ""),
+    }
+
+
+def _find(elem, tag):
+    '''
+    Finds the first descendant of elem with the given tag, raising the same
+    AttributeError that bs4's attribute-style lookup does if elem is missing.
+    '''
+    if elem is None:
+        raise AttributeError(f"'NoneType' object has no attribute '{tag}'")
+    return elem.find(".//" + tag)
+
+
+def _text(elem):
+    '''
+    Returns all of the text inside an element, like bs4's Tag.text.
+    '''
+    if elem is None:
+        raise AttributeError("'NoneType' object has no attribute 'text'")
+    return "".join(elem.itertext())
+
+
+PARSERS = {
+    "html5lib": (iter_games_html5lib, read_game_html5lib),
+    "iterparse": (iter_games_iterparse, read_game_iterparse),
+}
+
+# Raw XML of a game as each backend holds it, for bgg_quarantine
+GAME_XML = {
+    "html5lib": str,
+    "iterparse": lambda game: ET.tostring(game, encoding="unicode"),
+}
+
+_BOARDGAME_TAG = re.compile(rb"<boardgame[\s>]|</boardgame>")
+_OBJECTID = re.compile(rb'objectid="([^"]*)"')
+
+
+def split_games(response, num_shards, skip=()):
+    '''
+    Splits an API response into smaller standalone responses that together 
+    hold each game once, so the shards can be parsed independently by any 
+    backend. Each shard keeps the response's enclosing <boardgames> element 
+    around a contiguous run of its top-level <boardgame> elements. Games in 
+    skip, and repeats of a game earlier in the response, are left out, as 
+    the backends' iter_games() leave them out. 
+
+    Inputs:
+        response (bytes or str): API response to split
+        num_shards (int): Most shards to split into
+        skip (container): IDs to leave out, such as games already pulled
+
+    Outputs:
+        List of (shard (bytes), IDs in the shard (list of str)) tuples, in 
+            response order
+    '''
+    if isinstance(response, str):
+        response = response.encode("utf-8")
+    games = []
+    seen = set()
+    depth = 0
+    for match in _BOARDGAME_TAG.finditer(response):
+        if match.group().startswith(b"</"):
+            depth -= 1
+            if depth == 0:
+                games.append((start, match.end()))
+        else:
+            if depth == 0:
+                start = match.start()
+            depth += 1
+    if not games:
+        return []
+
+    head = response[:games[0][0]]
+    tail = response[games[-1][1]:]
+    kept = []
+    for start, end in games:
+        start_tag = response[start:response.index(b">", start)]
+        bgg_id = _OBJECTID.search(start_tag).group(1).decode("utf-8")
+        if b"inbound=" in start_tag:
+            continue
+        if bgg_id not in skip and bgg_id not in seen:
+            seen.add(bgg_id)
+            kept.append((bgg_id, response[start:end]))
+
+    shard_size = max(1, -(-len(kept) // num_shards))
+    shards = []
+    for i in range(0, len(kept), shard_size):
+        chunk = kept[i:i + shard_size]
+        shards.append((head + b"\n".join(game for _, game in chunk) + tail,
+            [bgg_id for bgg_id, _ in chunk]))
+    return shards
+
+
+def build_game_info(raw, shortdescription):
+    '''
+    Builds a game record from the raw values read by a parser backend.
+
+    Inputs:
+        raw (dict): Raw values of one game. Text fields are strings, polls are
+            (totalvotes, [(option, numvotes), ...]) tuples, ranks is a list of
+            (friendlyname, bayesaverage, value) tuples, and categories and
+            mechanics are lists of names.
+        shortdescription (str): Short description from the crawled index
+
+    Outputs:
+        Dictionary of game information
+    '''
+    name = raw["name"]
+    name_coerced = re.sub(pattern="\W", repl="", string=name.upper().strip())
+
+    suggested_playerage = None
+    suggested_playerage_votes = -1 # Don't include in output
+    totalvotes, options = raw["playerage_poll"]
+    if totalvotes != "0":
+        for playerage, numvotes in options:
+            numvotes = int(numvotes)
+            if numvotes > suggested_playerage_votes:
+                # With ties, take minimum age
+                suggested_playerage = playerage
+                suggested_playerage_votes = numvotes
+
+    suggested_numplayers = None
+    suggested_numplayers_votes = -1 # Don't include in output
+    totalvotes, options = raw["numplayers_poll"]
+    if totalvotes != "0":
+        for numplayers, votes in options:
+            votes = int(votes)
+            if votes >= suggested_numplayers_votes:
+                # With ties, take maximum numplayers
+                suggested_numplayers = numplayers
+                suggested_numplayers_votes = votes
+
+    suggested_language = None
+    suggested_language_votes = -1 # Don't include in output
+    totalvotes, options = raw["language_poll"]
+    if totalvotes != "0":
+        for language, numvotes in options:
+            # option["level"] increases with each game called - that's dumb
+            numvotes = int(numvotes)
+            if numvotes >= suggested_language_votes:
+                # With ties, take maximum language dependency
+                suggested_language = language
+                suggested_language_votes = numvotes
+
+    num_ratings = int(raw["usersrated"])
+    geek_rating = float(raw["average"])
+
+    bgg_type_info = {}
+    num_types = 0
+    for friendlyname, bayesaverage, value in raw["ranks"]:
+        bgg_type_name = re.findall(
+            pattern="^.+(?=\sRank)", string=friendlyname)[0]
+        if bgg_type_name != "Board Game":
+            num_types += 1
+        bgg_type_info[bgg_type_name] = (float(bayesaverage), value)
+
+    categories = list(raw["categories"]) # JSON can't deal with sets, unfortunately
+    is_boardgame = not any(
+        category in NOT_GAME_CATEGORIES for category in categories)
+    mechanics = list(raw["mechanics"])
+
+    averageweight = float(raw["averageweight"])
+    image_url = raw["image"].strip("\n\t")
+
+    return {
+        "is_boardgame": is_boardgame,
+        "name": name,
+        "name_coerced": name_coerced,
+        "yearpublished": raw["yearpublished"],
+        "shortdescription": shortdescription,
+        "minplayers": raw["minplayers"],
+        "maxplayers": raw["maxplayers"],
+        "playingtime": raw["playingtime"],
+        "minplaytime": raw["minplaytime"],
+        "maxplaytime": raw["maxplaytime"],
+        "age": raw["age"],
+        "suggested_playerage": suggested_playerage,
+        "suggested_numplayers": suggested_numplayers,
+        "suggested_language": suggested_language,
+        "num_ratings": num_ratings,
+        "geek_rating": geek_rating,
+        "num_types": num_types,
+        "bgg_type_info": bgg_type_info, # dict
+        "num_categories": len(categories),
+        "categories": categories, # list
+        "num_mechanics": len(mechanics),
+        "mechanics": mechanics, # list
+        "averageweight": averageweight,
+        "long_description": raw["description"],
+        "image_url": image_url,
+    }
@@ -0,0 +1,154 @@
+'''
+Quarantine of BoardGameGeek (BGG) games that could not be read from an API
+response.
+
+A game whose XML has an unexpected shape, such as a missing <averageweight>
+or an odd poll, is set aside instead of stopping the pull. Each one is a
+line of all_games<suffix>_quarantine.jsonl:
+
+    {"bgg_id": "123", "error": "AttributeError(...)", "traceback": "...",
+     "shortdescription": "...", "xml": "<boardgame objectid=\"123\">..."}
+
+Games in quarantine are left out of every output file and counter, as if the
+API had not returned them. Once the cause is fixed, pull just those games
+again with bgg_api.reprocess():
+
+    python bgg_quarantine.py game_ids.csv --suffix _actual --parser iterparse
+'''
+import argparse
+import json
+import os
+import traceback
+
+
+def quarantine_path(file_suffix_out=""):
+    '''
+    Outputs:
+        Name of the quarantine file of a pull with this suffix (str)
+    '''
+    return f"all_games{file_suffix_out}_quarantine.jsonl"
+
+
+def make_entry(bgg_id, error, fragment, shortdescription=None):
+    '''
+    Describes one game that failed, from inside the except block that caught
+    its error.
+
+    Inputs:
+        bgg_id (str): BGG ID of the game
+        error (Exception): Error raised while reading the game
+        fragment (str): Raw XML of the game's <boardgame> element
+        shortdescription (str): Short description from the crawled index
+
+    Outputs:
+        Dictionary, as written to the quarantine file
+    '''
+    return {"bgg_id": bgg_id, "error": repr(error),
+        "traceback": traceback.format_exc(),
+        "shortdescription": shortdescription, "xml": fragment}
+
+
+def start_quarantine(filepath):
+    '''
+    Empties the quarantine file for a new pull.
+    '''
+    open(filepath, "w").close()
+
+
+def add_entries(filepath, entries):
+    '''
+    Appends entries to the quarantine file and forces them to disk, so they
+    are saved before the batch is checkpointed.
+
+    Inputs:
+        filepath (str): Name of the quarantine file
+        entries (list of dicts): Entries from make_entry()
+    '''
+    with open(filepath, "a") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_quarantine(filepath):
+    '''
+    Reads the quarantine file. A game quarantined more than once, as when a
+    pull was resumed, keeps its last entry.
+
+    Inputs:
+        filepath (str): Name of the quarantine file
+
+    Outputs:
+        Dictionary of entries by BGG ID, in the order first quarantined;
+            empty if there is no file
+    '''
+    entries = {}
+    if not os.path.exists(filepath):
+        return entries
+    with open(filepath, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError: # Partially written last line
+                continue
+            entries[entry["bgg_id"]] = entry
+    return entries
+
+
+def write_quarantine(filepath, entries):
+    '''
+    Replaces the quarantine file with entries, removing it if there are none.
+
+    Inputs:
+        filepath (str): Name of the quarantine file
+        entries (list of dicts): Entries from make_entry()
+    '''
+    if not entries:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        return
+    tmp_filepath = filepath + ".tmp"
+    start_quarantine(tmp_filepath)
+    add_entries(tmp_filepath, entries)
+    os.replace(tmp_filepath, filepath)
+
+
+def finish_quarantine(filepath, num_games):
+    '''
+    Tidies the quarantine file at the end of a pull, keeping one entry per
+    game and removing the file if no game failed, and prints how many games
+    were set aside.
+
+    Inputs:
+        filepath (str): Name of the quarantine file
+        num_games (int): Number of games the pull read successfully
+
+    Outputs:
+        Number of games in quarantine (int)
+    '''
+    entries = read_quarantine(filepath)
+    write_quarantine(filepath, list(entries.values()))
+    if entries:
+        num_read = num_games + len(entries)
+        print(f"Quarantined {len(entries)} of {num_read} games "
+            f"({len(entries) / num_read:.2%}): {filepath}")
+    return len(entries)
+
+
+if __name__ == "__main__":
+    import bgg_api
+    arg_parser = argparse.ArgumentParser(
+        description="Pull the games in a quarantine file from the API again "
+        "and merge those that now succeed into the pull's output files.")
+    arg_parser.add_argument("file_in", help="index file the pull was run with")
+    arg_parser.add_argument("--limit", type=int, default=5000)
+    arg_parser.add_argument("--size", type=int, default=100)
+    arg_parser.add_argument("--suffix", default="")
+    arg_parser.add_argument("--parser", default="html5lib")
+    arg_parser.add_argument("--output", default="json")
+    arg_parser.add_argument("--base-url", default=None)
+    args = arg_parser.parse_args()
+    bgg_api.reprocess(args.file_in, limit=args.limit, size=args.size,
+        file_suffix_out=args.suffix, parser=args.parser, output=args.output,
+        base_url=args.base_url)
@@ -0,0 +1,167 @@
+'''
+Rate limiting and batch sizing for calls to the BoardGameGeek (BGG) API.
+
+TokenBucket spaces requests out to a polite average rate, slowing down when
+the API throttles us (429) and creeping back up while it does not. BatchSizer
+decides how many IDs go into each request: it grows the batch while responses
+come back healthy and shrinks it on server errors (5xx) or payloads that are
+getting too large. backoff_delay() gives the wait before retrying a throttled
+or failed request.
+'''
+import threading
+import time
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0 # Seconds
+BACKOFF_MAX = 120.0 # Seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    '''
+    Token-bucket rate limiter, safe to share between threads.
+
+    Inputs:
+        rate (float): Tokens added per second, i.e. the average request rate.
+            This is also the fastest rate the limiter recovers to.
+        capacity (int): Largest burst of requests allowed after a quiet spell
+        min_rate (float): Slowest rate slow_down() goes to
+    '''
+    def __init__(self, rate=0.2, capacity=1, min_rate=0.01):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Blocks until a token is available, then takes it.
+
+        Outputs:
+            Seconds spent waiting (float)
+        '''
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                    self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        '''
+        Holds back every request for the given number of seconds, such as the
+        Retry-After of a 429 response, by emptying the bucket.
+
+        Inputs:
+            seconds (float): Time to hold requests back for
+        '''
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def slow_down(self):
+        '''
+        Halves the request rate, after the API has throttled a request.
+        '''
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        '''
+        Raises the request rate by 10%, up to the starting rate, after a
+        request went through without being throttled.
+        '''
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+class BatchSizer:
+    '''
+    Adaptive number of IDs per API request. The size grows by step after
+    every `patience` healthy responses in a row, and is halved whenever a
+    request fails with a server error or a response is larger than max_bytes.
+    Throttling is left to TokenBucket, since smaller batches would only mean
+    more requests.
+
+    Inputs:
+        size (int): Starting batch size
+        minimum (int): Smallest batch size
+        maximum (int): Largest batch size. Sizes of 500 and over are known to
+            cause bad responses from the API.
+        step (int): Amount to grow by
+        patience (int): Healthy responses needed before growing
+        max_bytes (int): Largest healthy response payload
+    '''
+    def __init__(self, size=100, minimum=10, maximum=400, step=20, patience=3,
+        max_bytes=4 * 1024 * 1024):
+        self.size = size
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.patience = patience
+        self.max_bytes = max_bytes
+        self.healthy = 0
+
+    def record_success(self, num_bytes):
+        '''
+        Records a response that came back without a server error.
+
+        Inputs:
+            num_bytes (int): Size of the response payload
+        '''
+        if num_bytes > self.max_bytes:
+            self.shrink()
+            return
+        self.healthy += 1
+        if self.healthy >= self.patience:
+            self.size = min(self.maximum, self.size + self.step)
+            self.healthy = 0
+
+    def shrink(self):
+        '''
+        Records a request that failed with a server error, halving the batch
+        size.
+        '''
+        self.size = max(self.minimum, self.size // 2)
+        self.healthy = 0
+
+
+class FixedBatchSizer(BatchSizer):
+    '''
+    BatchSizer that never changes size, used when adaptive sizing is off.
+    '''
+    def record_success(self, num_bytes):
+        pass
+
+    def shrink(self):
+        pass
+
+
+def backoff_delay(attempt, retry_after=None):
+    '''
+    Seconds to wait before retrying a throttled or failed request:
+    exponential backoff, but never less than the server's Retry-After.
+
+    Inputs:
+        attempt (int): Number of the retry, starting at 0
+        retry_after (str): Retry-After header of the response, if any
+
+    Outputs:
+        Seconds to wait (float)
+    '''
+    delay = BACKOFF_BASE * 2 ** attempt
+    if retry_after is not None:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError: # HTTP-date form, which BGG does not send
+            pass
+    return min(BACKOFF_MAX, delay)
@@ -0,0 +1,294 @@
+'''
+Compact in-memory storage of BoardGameGeek (BGG) game records.
+
+A game record from bgg_api.get_game_info() is a dict of 25 keys, mostly
+short strings, plus a dict of tuples and two lists of names. At hundreds of
+thousands of games, those small objects take up most of a pull's memory.
+GameStore is a stand-in for games_dict in bgg_api.go that keeps each game as
+a GameRecord instead:
+
+    - fixed fields in __slots__, so there is no per-game dict of keys
+    - the numeric string fields (yearpublished, minplayers, ...) and
+      num_ratings packed into one array of integers
+    - types, categories and mechanics as one array of indices into a shared
+      vocabulary, with the type ratings and ranks in one array of floats
+    - num_types, num_categories, num_mechanics and name_coerced worked out
+      on access instead of stored
+    - short and long descriptions held by the store, apart from the records
+
+A GameRecord reads like the dict it replaces (record["name"], dict(record)),
+so construct_csv(), construct_feather() and bgg_tags need no changes, and
+GameStore.write_json() writes the same file as json.dump() of the dicts.
+Values that would not come back exactly as they went in, such as a
+yearpublished of "", are kept as they are in a small per-record dict.
+'''
+from array import array
+from collections.abc import Mapping
+import json
+import re
+import sys
+
+FIELDS = ["is_boardgame", "name", "name_coerced", "yearpublished",
+    "shortdescription", "minplayers", "maxplayers", "playingtime",
+    "minplaytime", "maxplaytime", "age", "suggested_playerage",
+    "suggested_numplayers", "suggested_language", "num_ratings", "geek_rating",
+    "num_types", "bgg_type_info", "num_categories", "categories",
+    "num_mechanics", "mechanics", "averageweight", "long_description",
+    "image_url"]
+# Fields packed into GameRecord.numbers, in order
+NUMBER_FIELDS = ["yearpublished", "minplayers", "maxplayers", "playingtime",
+    "minplaytime", "maxplaytime", "age", "num_ratings"]
+NOT_RANKED = "Not Ranked"
+
+
+class Vocabulary:
+    '''
+    Numbers the type, category and mechanic names of every GameRecord, so a
+    record holds small integers instead of strings.
+    '''
+    def __init__(self):
+        self.names = []
+        self.index = {}
+
+    def add(self, name):
+        '''
+        Outputs:
+            Index of name (int), numbering it if it is new
+        '''
+        index = self.index.get(name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(sys.intern(name))
+            self.index[name] = index
+        return index
+
+
+TAGS = Vocabulary()
+
+
+def pack_number(value):
+    '''
+    Outputs:
+        value as an int if it is a string that str() gives back exactly from
+        the int, otherwise None
+    '''
+    if not isinstance(value, str):
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    return number if str(number) == value else None
+
+
+def intern_text(value):
+    '''
+    Interns the string values of fields with few distinct values, such as the
+    suggested_* poll results, so every record shares one copy.
+    '''
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class GameRecord(Mapping):
+    '''
+    Compact, read-only record of one game, readable like the dict from
+    bgg_parse.build_game_info().
+
+    Inputs:
+        info (dict): Game information from bgg_api.get_game_info()
+        descriptions (list): List of (shortdescription, long_description)
+            tuples to keep this game's descriptions in
+    '''
+    __slots__ = ("is_boardgame", "name", "suggested_playerage",
+        "suggested_numplayers", "suggested_language", "geek_rating",
+        "averageweight", "image_url", "numbers", "tags", "type_stats",
+        "num_all_types", "num_categories", "descriptions", "row", "extras")
+
+    def __init__(self, info, descriptions):
+        extras = {}
+        numbers = array("q")
+        for field in NUMBER_FIELDS:
+            if field == "num_ratings":
+                number = info[field] if type(info[field]) is int else None
+            else:
+                number = pack_number(info[field])
+            if number is None or not -2 ** 63 <= number < 2 ** 63:
+                extras[field] = info[field]
+                number = 0
+            numbers.append(number)
+
+        tags = array("I")
+        type_stats = array("d")
+        for name, (rating, rank) in info["bgg_type_info"].items():
+            tags.append(TAGS.add(name))
+            # Ranks are stored as floats, with 0 for "Not Ranked"
+            number = 0 if rank == NOT_RANKED else pack_number(rank)
+            if (number is None or number < 0 or number > 2 ** 53
+                or number == 0 and rank != NOT_RANKED
+                or type(rating) is not float):
+                extras["bgg_type_info"] = info["bgg_type_info"]
+                number = 0
+                rating = 0.0
+            type_stats.append(rating)
+            type_stats.append(number)
+        tags.extend(TAGS.add(name) for name in info["categories"])
+        tags.extend(TAGS.add(name) for name in info["mechanics"])
+
+        self.is_boardgame = info["is_boardgame"]
+        self.name = info["name"]
+        self.suggested_playerage = intern_text(info["suggested_playerage"])
+        self.suggested_numplayers = intern_text(info["suggested_numplayers"])
+        self.suggested_language = intern_text(info["suggested_language"])
+        self.geek_rating = info["geek_rating"]
+        self.averageweight = info["averageweight"]
+        self.image_url = info["image_url"]
+        self.numbers = numbers
+        self.tags = tags
+        self.type_stats = type_stats
+        self.num_all_types = len(info["bgg_type_info"])
+        self.num_categories = len(info["categories"])
+        self.descriptions = descriptions
+        self.row = len(descriptions)
+        descriptions.append((info["shortdescription"],
+            info["long_description"]))
+        # Derived fields only need keeping if they disagree with the record
+        for field, value in (("name_coerced", coerce_name(self.name)),
+            ("num_types", self.count_types()),
+            ("num_categories", self.num_categories),
+            ("num_mechanics", len(info["mechanics"]))):
+            if info[field] != value:
+                extras[field] = info[field]
+        self.extras = extras or None
+
+    def count_types(self):
+        return sum(1 for name in self.tag_names(0, self.num_all_types)
+            if name != "Board Game")
+
+    def tag_names(self, start, end):
+        return [TAGS.names[index] for index in self.tags[start:end]]
+
+    def get_bgg_type_info(self):
+        type_info = {}
+        for i, name in enumerate(self.tag_names(0, self.num_all_types)):
+            rank = int(self.type_stats[2 * i + 1])
+            type_info[name] = (self.type_stats[2 * i],
+                str(rank) if rank else NOT_RANKED)
+        return type_info
+
+    def get_categories(self):
+        start = self.num_all_types
+        return self.tag_names(start, start + self.num_categories)
+
+    def get_mechanics(self):
+        return self.tag_names(self.num_all_types + self.num_categories,
+            len(self.tags))
+
+    def __getitem__(self, field):
+        if self.extras is not None and field in self.extras:
+            return self.extras[field]
+        return _GETTERS[field](self)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f"GameRecord({dict(self)!r})"
+
+
+def coerce_name(name):
+    '''
+    Outputs:
+        name_coerced as bgg_parse.build_game_info() builds it
+    '''
+    return re.sub(pattern=r"\W", repl="", string=name.upper().strip())
+
+
+_GETTERS = {
+    "is_boardgame": lambda record: record.is_boardgame,
+    "name": lambda record: record.name,
+    "name_coerced": lambda record: coerce_name(record.name),
+    "shortdescription": lambda record: record.descriptions[record.row][0],
+    "suggested_playerage": lambda record: record.suggested_playerage,
+    "suggested_numplayers": lambda record: record.suggested_numplayers,
+    "suggested_language": lambda record: record.suggested_language,
+    "num_ratings": lambda record: record.numbers[-1],
+    "geek_rating": lambda record: record.geek_rating,
+    "num_types": GameRecord.count_types,
+    "bgg_type_info": GameRecord.get_bgg_type_info,
+    "num_categories": lambda record: record.num_categories,
+    "categories": GameRecord.get_categories,
+    "num_mechanics": lambda record: len(record.tags) - record.num_all_types
+        - record.num_categories,
+    "mechanics": GameRecord.get_mechanics,
+    "averageweight": lambda record: record.averageweight,
+    "long_description": lambda record: record.descriptions[record.row][1],
+    "image_url": lambda record: record.image_url,
+}
+# Every number field but num_ratings was a string of digits
+for _position, _field in enumerate(NUMBER_FIELDS[:-1]):
+    _GETTERS[_field] = \
+        lambda record, position=_position: str(record.numbers[position])
+
+
+class GameStore:
+    '''
+    Stand-in for games_dict in bgg_api.go that keeps each game as a
+    GameRecord, with the descriptions of every game in one list.
+
+    Inputs:
+        games (dict): Game information to start with, such as the games
+            restored from a checkpoint. Default = None.
+    '''
+    def __init__(self, games=None):
+        self.records = {}
+        self.descriptions = []
+        for bgg_id, info in (games or {}).items():
+            self[bgg_id] = info
+
+    def __setitem__(self, bgg_id, info):
+        self.records[bgg_id] = GameRecord(info, self.descriptions)
+
+    def __getitem__(self, bgg_id):
+        return self.records[bgg_id]
+
+    def __contains__(self, bgg_id):
+        return bgg_id in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def keys(self):
+        return self.records.keys()
+
+    def items(self):
+        return self.records.items()
+
+    def values(self):
+        return self.records.values()
+
+    def write_json(self, out_file, indent=6):
+        '''
+        Writes every game as JSON, exactly as json.dump() writes the dict of
+        game dicts, converting one game at a time.
+
+        Inputs:
+            out_file (file): File to write to
+            indent (int): Indent, as for json.dump(). Default = 6.
+        '''
+        if not self.records:
+            out_file.write("{}")
+            return
+        pad = " " * indent
+        separator = "{\n"
+        for bgg_id, record in self.records.items():
+            game = json.dumps(dict(record), indent=indent)
+            out_file.write(separator + pad + json.dumps(bgg_id) + ": " +
+                game.replace("\n", "\n" + pad))
+            separator = ",\n"
+        out_file.write("\n}")
@@ -0,0 +1,152 @@
+'''
+Sparse multi-hot encoding of the types, categories and mechanics of every
+BoardGameGeek (BGG) game.
+
+The all-games CSV keeps a flag column for only the 10 most common categories
+and mechanics. write_tags() keeps all of them as a compressed sparse row
+(CSR) matrix with one row per game: the tags of game i are the vocabulary
+indices in indices[indptr[i]:indptr[i + 1]]. The matrix is saved next to the
+other outputs as all_games<suffix>_tags.npz, and the vocabulary as
+all_games<suffix>_tags_vocabulary.csv with one row per tag:
+
+    index,kind,name,count
+    0,type,Board Game,4213
+    1,category,Medieval,310
+    ...
+
+Encoding is a single pass over the games, so its cost is linear in the total
+number of tags. wide_view() turns the matrix back into flag columns, labelled
+(kind, name), for any choice of tags.
+'''
+import csv
+import numpy as np
+import pandas as pd
+
+
+def game_tags(game_info):
+    '''
+    Lists the tags of one game.
+
+    Inputs:
+        game_info (dict): Game information from bgg_api.get_game_info()
+
+    Outputs:
+        List of (kind, name) tuples
+    '''
+    tags = [("type", name) for name in game_info["bgg_type_info"].keys()]
+    tags.extend(("category", name) for name in game_info["categories"])
+    tags.extend(("mechanic", name) for name in game_info["mechanics"])
+    return tags
+
+
+def encode_tags(games_dict):
+    '''
+    Encodes the tags of every game as a CSR matrix over a vocabulary of tags,
+    numbered in the order they are first seen.
+
+    Inputs:
+        games_dict (dict or bgg_jsonl.JsonLinesWriter): Dictionary with
+            boardgame information, or the JSON Lines file it was streamed to
+
+    Outputs:
+        bgg_ids (list of str): BGG ID of each row
+        indptr (numpy array of int64): Start of each row in indices, plus the
+            end of the last row
+        indices (numpy array of int32): Vocabulary index of each tag
+        vocabulary (list of (kind, name) tuples): Tag of each index
+        counts (list of int): Number of games with each tag
+    '''
+    vocabulary_index = {}
+    counts = []
+    bgg_ids = []
+    indptr = [0]
+    indices = []
+    for bgg_id, info in games_dict.items():
+        for tag in game_tags(info):
+            index = vocabulary_index.setdefault(tag, len(vocabulary_index))
+            if index == len(counts):
+                counts.append(0)
+            counts[index] += 1
+            indices.append(index)
+        bgg_ids.append(bgg_id)
+        indptr.append(len(indices))
+    return (bgg_ids, np.array(indptr, dtype=np.int64),
+        np.array(indices, dtype=np.int32), list(vocabulary_index), counts)
+
+
+def write_tags(games_dict, file_suffix_out):
+    '''
+    Writes the CSR matrix of tags and its vocabulary file.
+
+    Inputs:
+        games_dict (dict or bgg_jsonl.JsonLinesWriter): Dictionary with
+            boardgame information, or the JSON Lines file it was streamed to
+        file_suffix_out (str): Suffix to add to all filenames out, such as
+            "_actual", "_test", etc.
+
+    Outputs:
+        (matrix filepath (str), vocabulary filepath (str))
+    '''
+    bgg_ids, indptr, indices, vocabulary, counts = encode_tags(games_dict)
+    matrix_path = f"all_games{file_suffix_out}_tags.npz"
+    np.savez(matrix_path, bgg_ids=np.array(bgg_ids, dtype=str),
+        indptr=indptr, indices=indices)
+    vocabulary_path = f"all_games{file_suffix_out}_tags_vocabulary.csv"
+    with open(vocabulary_path, "w") as f:
+        csvwriter = csv.writer(f)
+        csvwriter.writerow(["index", "kind", "name", "count"])
+        for index, ((kind, name), count) in enumerate(zip(vocabulary, counts)):
+            csvwriter.writerow([index, kind, name, count])
+    return matrix_path, vocabulary_path
+
+
+def read_tags(file_suffix=""):
+    '''
+    Reads the CSR matrix of tags and its vocabulary written by write_tags().
+
+    Inputs:
+        file_suffix (str): Suffix of the files, as given to write_tags()
+
+    Outputs:
+        bgg_ids (numpy array of str), indptr, indices, and vocabulary (Pandas
+            DataFrame with columns index, kind, name and count)
+    '''
+    with np.load(f"all_games{file_suffix}_tags.npz") as matrix:
+        bgg_ids = matrix["bgg_ids"]
+        indptr = matrix["indptr"]
+        indices = matrix["indices"]
+    vocabulary = pd.read_csv(f"all_games{file_suffix}_tags_vocabulary.csv",
+        keep_default_na=False)
+    return bgg_ids, indptr, indices, vocabulary
+
+
+def wide_view(bgg_ids, indptr, indices, vocabulary, tags=None):
+    '''
+    Expands the CSR matrix into one boolean flag column per tag.
+
+    Inputs:
+        bgg_ids, indptr, indices, vocabulary: As returned by read_tags()
+        tags (list of (kind, name) tuples): Tags to make columns of, in column
+            order. Default = None, which makes a column of every tag.
+
+    Outputs:
+        Pandas DataFrame of flags indexed by bgg_id, with a (kind, name)
+            column per tag, as names can repeat across kinds (a type and a
+            category can both be "Children's Game")
+    '''
+    names = list(zip(vocabulary["kind"], vocabulary["name"]))
+    if tags is None:
+        tags = names
+    column_of = np.full(len(names), -1, dtype=np.int64)
+    position = {tag: index for index, tag in enumerate(names)}
+    for column, tag in enumerate(tags):
+        if tag in position:
+            column_of[position[tag]] = column
+
+    flags = np.zeros((len(bgg_ids), len(tags)), dtype=bool)
+    rows = np.repeat(np.arange(len(bgg_ids)), np.diff(indptr))
+    columns = column_of[indices]
+    kept = columns >= 0
+    flags[rows[kept], columns[kept]] = True
+    return pd.DataFrame(flags, index=pd.Index(bgg_ids, name="bgg_id"),
+        columns=pd.MultiIndex.from_tuples(tags, names=["kind", "name"]))
@@ -0,0 +1,106 @@
+'''
+Cache of game search results.
+
+The search form has a small, finite set of choices, so the same searches
+come in again and again. Each game_data.Snapshot keeps a ResultCache of the
+results of the searches run on it, keyed by query_key() of the search, so a
+repeated search is a dictionary lookup instead of a filter and a ranking.
+The cache belongs to the snapshot: a reload of the table starts a new, empty
+cache, and requests still holding the old snapshot keep using the old one.
+'''
+from collections import OrderedDict
+import threading
+
+# Keys of search.build_search_dict() whose lists are choices of which a game
+# needs any one, so their order does not change the results
+ANY_OF_KEYS = ["categories", "mechanics"]
+
+
+def query_key(search_dict, k=5):
+    '''
+    Builds the key of a search that every search with the same results
+    shares.
+
+    Inputs:
+        search_dict (dict): Search, as returned by search.build_search_dict()
+        k (int): Number of games asked for
+
+    Outputs:
+        Tuple of (key, value) pairs, sorted by key, with k last
+    '''
+    items = []
+    for key, value in sorted(search_dict.items()):
+        if key in ANY_OF_KEYS:
+            value = tuple(sorted(set(value)))
+        elif isinstance(value, list):
+            value = tuple(value)
+        items.append((key, value))
+    items.append(("k", k))
+    return tuple(items)
+
+
+def copy_result(result):
+    '''
+    Copies a result of search.find_best_match(), so the caller can change it
+    without changing the cached one.
+
+    Outputs:
+        (list of column names, list of result rows)
+    '''
+    header, rows = result
+    return (list(header), [[list(value) if isinstance(value, list) else value
+        for value in row] for row in rows])
+
+
+class ResultCache:
+    '''
+    Bounded cache of search results that drops the least recently used
+    result when it is full, and counts its hits and misses.
+
+    Inputs:
+        max_entries (int): Most results to keep. Default = 1024.
+    '''
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        Outputs:
+            The result cached under key, or None if there is none
+        '''
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        '''
+        Caches a result under key, dropping the least recently used result
+        if the cache is full.
+        '''
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        '''
+        Outputs:
+            Dictionary of hits, misses, evictions, entries and hit_rate
+        '''
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self.entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0}
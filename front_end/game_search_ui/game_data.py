@@ -0,0 +1,204 @@
+'''
+Loads the all-games table written by bgg_api.go.
+
+bgg_api.go writes the table twice: as all_games.csv, and as all_games.feather,
+a typed Arrow file. Where the Feather file and pyarrow are both available it
+is memory-mapped and only the requested columns are read, with no text to
+parse or coerce; otherwise the CSV is read as before.
+
+A search server should not load the table on every request. get_table()
+keeps one GameTable per file for the whole process, which hands out the
+current Snapshot of the table: the DataFrame, its bitset index and arrays of
+its numeric columns, loaded once, and a cache of the searches run on it.
+When the files change on disk, the next request starts a reload in a
+background thread and is answered from the old snapshot; once the new one
+is loaded it replaces the old in one step. Requests already holding the old
+snapshot finish with it.
+'''
+import os
+import threading
+import time
+
+import pandas as pd
+
+import game_cache
+import game_index
+import game_query
+
+try:
+    import pyarrow.feather
+except ImportError: # Fall back to the CSV
+    pyarrow = None
+
+
+def load_games(filename="all_games.csv", columns=None):
+    '''
+    Loads the all-games table into a DataFrame.
+
+    Inputs:
+        filename (str): Name of the CSV file. The Feather file next to it,
+            with the same name, is preferred when it exists.
+        columns (list of str): Columns to load. Default = None, which loads
+            every column.
+
+    Outputs:
+        pandas DataFrame
+    '''
+    feather_filename = os.path.splitext(filename)[0] + ".feather"
+    if pyarrow is not None and os.path.exists(feather_filename):
+        table = pyarrow.feather.read_table(feather_filename, columns=columns,
+            memory_map=True)
+        return table.to_pandas()
+    return pd.read_csv(filename, usecols=columns)
+
+
+_TABLES = {}
+_TABLES_LOCK = threading.Lock()
+
+
+def file_version(filename="all_games.csv"):
+    '''
+    Identifies the version of the all-games table on disk.
+
+    Inputs:
+        filename (str): Name of the CSV file of the table
+
+    Outputs:
+        Tuple of (modification time in ns, size) of the CSV, Feather and tag
+            matrix files, with None for each one that does not exist
+    '''
+    base = os.path.splitext(filename)[0]
+    version = []
+    for path in (filename, base + ".feather", base + "_tags.npz"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            version.append(None)
+        else:
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+class Snapshot:
+    '''
+    One loaded version of the all-games table, shared by every request that
+    reads it. Its DataFrame must not be changed in place; view() gives a
+    DataFrame that columns can be added to without affecting other requests.
+
+    Inputs:
+        filename (str): Name of the CSV file of the table
+        version (tuple): file_version() of the files before they were read
+    '''
+    def __init__(self, filename, version):
+        self.filename = filename
+        self.version = version
+        self.games = load_games(filename)
+        self.index = game_index.build_index(self.games,
+            os.path.splitext(filename)[0] + "_tags.npz")
+        self.columns = game_query.ColumnArrays(self.games)
+        self.results = game_cache.ResultCache()
+
+    def view(self):
+        '''
+        Outputs:
+            Shallow copy of the table (pandas DataFrame), sharing its data
+        '''
+        return self.games.copy(deep=False)
+
+
+class GameTable:
+    '''
+    Keeps the current Snapshot of the all-games table, reloading it in the
+    background when the files change.
+
+    Inputs:
+        filename (str): Name of the CSV file of the table
+        check_interval (float): Least number of seconds between checks of the
+            files for changes. Default = 1.0.
+    '''
+    def __init__(self, filename="all_games.csv", check_interval=1.0):
+        self.filename = filename
+        self.check_interval = check_interval
+        self.current = None
+        self.last_check = 0.0
+        self.reloading = None
+        self.failed_version = None
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        '''
+        Returns the current snapshot, loading it first if there is none yet,
+        and starts a background reload if the files have changed since.
+
+        Outputs:
+            Snapshot
+        '''
+        current = self.current
+        if current is None:
+            with self.lock:
+                if self.current is None:
+                    self.current = self.load()
+                return self.current
+        now = time.monotonic()
+        if now - self.last_check >= self.check_interval:
+            self.last_check = now
+            version = file_version(self.filename)
+            if version not in (current.version, self.failed_version):
+                self.start_reload()
+        return current
+
+    def start_reload(self):
+        '''
+        Starts loading the files in a background thread, unless a reload is
+        already running.
+        '''
+        with self.lock:
+            if self.reloading is not None and self.reloading.is_alive():
+                return
+            self.reloading = threading.Thread(target=self.reload, daemon=True)
+            self.reloading.start()
+
+    def reload(self):
+        '''
+        Loads the files and makes them the current snapshot. A load that the
+        files changed under, as while bgg_api is still writing them, leaves the
+        current snapshot in place until the next check; one that fails leaves
+        it in place until the files change again.
+
+        Outputs:
+            True if the current snapshot was replaced (bool)
+        '''
+        version = file_version(self.filename)
+        try:
+            snapshot = Snapshot(self.filename, version)
+        except Exception:
+            self.failed_version = version
+            return False
+        if file_version(self.filename) != snapshot.version:
+            return False
+        self.current = snapshot
+        return True
+
+    def load(self):
+        '''
+        Outputs:
+            Snapshot of the files as they are now
+        '''
+        return Snapshot(self.filename, file_version(self.filename))
+
+
+def get_table(filename="all_games.csv"):
+    '''
+    Returns the GameTable of a file, creating it only once per process.
+
+    Inputs:
+        filename (str): Name of the CSV file of the table
+
+    Outputs:
+        GameTable
+    '''
+    key = os.path.abspath(filename)
+    with _TABLES_LOCK:
+        if key not in _TABLES:
+            _TABLES[key] = GameTable(key)
+        return _TABLES[key]
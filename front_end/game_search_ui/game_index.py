@@ -0,0 +1,163 @@
+'''
+Bitset index of the all-games table, for filtering games by type, category,
+mechanic and is_boardgame.
+
+Each tag gets one bitmap, with bit i set when row i of the table has the tag,
+packed 64 rows to a word. A search picks any of several tags within a group
+and all of the groups, which is word-wise OR and AND over the bitmaps instead
+of a DataFrame.query() per group.
+
+Bitmaps of every type, category and mechanic are built from the sparse tag
+matrix bgg_api writes next to the table (all_games_tags.npz). Without it,
+they are built from the flag columns of the table, which hold every type but
+only the 10 most common categories and mechanics.
+'''
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class BitsetIndex:
+    '''
+    Packed bitmaps over the rows of a table, keyed by tag.
+
+    Inputs:
+        num_rows (int): Number of rows in the table
+    '''
+    def __init__(self, num_rows):
+        self.num_rows = num_rows
+        self.num_words = (num_rows + 63) // 64
+        self.bitmaps = {}
+
+    def add(self, key, mask):
+        '''
+        Adds the bitmap of one tag.
+
+        Inputs:
+            key (tuple): Tag, such as ("category", "Fantasy")
+            mask (numpy array of bool): Whether each row has the tag
+        '''
+        packed = np.zeros(self.num_words * 8, dtype=np.uint8)
+        bits = np.packbits(mask, bitorder="little")
+        packed[:len(bits)] = bits
+        self.bitmaps[key] = packed.view("<u8")
+
+    def names(self, kind):
+        '''
+        Outputs:
+            List of the names of the tags of one kind, such as "category", in
+            the order they were added
+        '''
+        return [name for key_kind, name in self.bitmaps if key_kind == kind]
+
+    def any_of(self, keys):
+        '''
+        ORs the bitmaps of the given tags. Tags not in the index match no row.
+
+        Inputs:
+            keys (list of tuples): Tags
+
+        Outputs:
+            Bitmap (numpy array of uint64)
+        '''
+        result = np.zeros(self.num_words, dtype="<u8")
+        for key in keys:
+            if key in self.bitmaps:
+                np.bitwise_or(result, self.bitmaps[key], out=result)
+        return result
+
+    def match(self, groups):
+        '''
+        Finds the rows with at least one tag from every non-empty group.
+
+        Inputs:
+            groups (list of lists of tuples): Groups of tags
+
+        Outputs:
+            numpy array of bool, one per row
+        '''
+        result = np.full(self.num_words, np.iinfo(np.uint64).max, dtype="<u8")
+        for keys in groups:
+            if keys:
+                np.bitwise_and(result, self.any_of(keys), out=result)
+        bits = np.unpackbits(result.view(np.uint8), bitorder="little")
+        return bits[:self.num_rows].astype(bool)
+
+
+def build_index(games_df, tags_filename=None):
+    '''
+    Builds the bitset index of a table loaded by game_data.load_games().
+
+    Inputs:
+        games_df (Pandas DataFrame): All-games table
+        tags_filename (str): Name of the sparse tag matrix written with the
+            table. Default = None, which builds from the flag columns.
+
+    Outputs:
+        BitsetIndex
+    '''
+    index = BitsetIndex(len(games_df))
+    index.add(("flag", "is_boardgame"),
+        games_df["is_boardgame"].to_numpy(dtype=bool))
+    if tags_filename is not None and os.path.exists(tags_filename):
+        add_tag_matrix(index, games_df, tags_filename)
+    else:
+        add_flag_columns(index, games_df)
+    return index
+
+
+def add_tag_matrix(index, games_df, tags_filename):
+    '''
+    Adds a bitmap for every tag in the sparse tag matrix and its vocabulary.
+
+    Inputs:
+        index (BitsetIndex): Index to add to
+        games_df (Pandas DataFrame): All-games table
+        tags_filename (str): Name of the .npz file of the matrix
+    '''
+    with np.load(tags_filename) as matrix:
+        bgg_ids = matrix["bgg_ids"]
+        indptr = matrix["indptr"]
+        indices = matrix["indices"]
+    vocabulary = pd.read_csv(tags_filename[:-len(".npz")] + "_vocabulary.csv",
+        keep_default_na=False)
+
+    # Row of the table for each row of the matrix, or -1 if it is not there
+    positions = pd.Index(games_df["bgg_id"].astype(str)).get_indexer(bgg_ids)
+    rows = np.repeat(positions, np.diff(indptr))
+    kept = rows >= 0
+    rows = rows[kept]
+    indices = indices[kept]
+    order = np.argsort(indices, kind="stable")
+    bounds = np.searchsorted(indices[order],
+        np.arange(len(vocabulary) + 1))
+    for tag, kind, name in zip(vocabulary["index"], vocabulary["kind"],
+        vocabulary["name"]):
+        mask = np.zeros(index.num_rows, dtype=bool)
+        mask[rows[order[bounds[tag]:bounds[tag + 1]]]] = True
+        index.add((kind, name), mask)
+
+
+def add_flag_columns(index, games_df):
+    '''
+    Adds a bitmap for every type, category and mechanic flag column of the
+    all-games table, as laid out by bgg_api.construct_fields().
+
+    Inputs:
+        index (BitsetIndex): Index to add to
+        games_df (Pandas DataFrame): All-games table
+    '''
+    columns = list(games_df.columns)
+    for column in columns:
+        if column.endswith("_avg_rating"):
+            gametype = column[:-len("_avg_rating")]
+            index.add(("type", gametype), games_df[gametype].to_numpy(dtype=bool))
+    categories = columns[columns.index("num_categories") + 1:
+        columns.index("num_mechanics")]
+    mechanics = columns[columns.index("num_mechanics") + 1:
+        columns.index("averageweight")]
+    for kind, names in (("category", categories), ("mechanic", mechanics)):
+        for name in names:
+            index.add((kind, name), games_df[name].to_numpy(dtype=bool))
+
@@ -4,10 +4,28 @@ CAPP30122 W'21: Group Project
 Domnigo Carbone
 '''
 
-import pandas as pd
-import csv
-
-def find_best_match(search_dict):
+import numpy as np
+import game_cache
+import game_data
+import game_index
+import game_query
+
+GAME_TYPES = ["Abstract Game", "Customizable", "Thematic", "Family Game", 
+    "Children's Game", "Party Game", "Strategy Game", "War Game"]
+# How each of GAME_TYPES is shown in the results, and the list of types shown 
+# for every combination of them, numbered by bits in GAME_TYPES order
+TYPE_LABELS = ["Abstract", "Customizable", "Thematic", "Family", "Children's", 
+    "Party", "Strategy", "War"]
+TYPE_LABEL_LISTS = [[label for bit, label in enumerate(TYPE_LABELS) 
+    if code >> bit & 1] for code in range(2 ** len(TYPE_LABELS))]
+
+# Labels from the original search form that differ from BGG's names
+CATEGORY_LABELS = {"Cards": "Card Game", "Sci-Fi": "Science Fiction", 
+    "War": "Wargame"}
+MECHANIC_LABELS = {"Area Influence": "Area Majority / Influence", 
+    "Cooperative": "Cooperative Game"}
+
+def find_best_match(search_dict, k=5):
     """
     Receives a dictionary of inputs provided by a user in a Django interface, 
     which lists charachteristics of desirable titles, and filters a pre-processed
@@ -17,17 +35,52 @@ def find_best_match(search_dict):
 
     Input:
         search_dict: A dictionary representing the search terms input by the user.
+        k: The number of games to return. Default = 5.
     Output:
         A tuple of lists representing the top five games recomended to the user,
         given by search_dict, as well as a short description for each game.
     """
-    games_df = pd.read_csv("all_games.csv")
+    snapshot = game_data.get_table("all_games.csv").snapshot()
 
     search_dict_rev = build_search_dict(search_dict)
 
-    filtered_df = filter_game_df(search_dict_rev, games_df)
+    return search_games(search_dict_rev, snapshot, k)
+
+def search_games(search_dict, snapshot, k=5):
+    """
+    Finds the titles that better fit a search, answering a search run on the
+    same snapshot before from the snapshot's cache of results.
 
-    return top_games(search_dict_rev, filtered_df)
+    Input:
+        search_dict: A dictionary of search terms, as built by build_search_dict.
+        snapshot: A game_data.Snapshot of the board game database.
+        k: The number of games to return. Default = 5.
+    Output:
+        A tuple of lists representing the top games recomended to the user,
+        as returned by top_games.
+    """
+    key = game_cache.query_key(search_dict, k)
+    result = snapshot.results.get(key)
+    if result is None:
+        filtered_df = filter_game_df(search_dict, snapshot.view(), 
+            snapshot.index, snapshot.columns)
+        result = top_games(search_dict, filtered_df, k)
+        if result is None:
+            return None
+        snapshot.results.put(key, result)
+    return game_cache.copy_result(result)
+
+def tag_names(kind):
+    """
+    Lists the tags of one kind that searches can filter on, which are those
+    the index of the loaded board game database has a bitmap for.
+
+    Input:
+        kind: The kind of tag, "type", "category" or "mechanic".
+    Output:
+        A list of the names of the tags.
+    """
+    return game_data.get_table("all_games.csv").snapshot().index.names(kind)
 
 def build_search_dict(search_dict):
     '''
@@ -47,14 +100,8 @@ def build_search_dict(search_dict):
     "Customizable":False, "Thematic":False, "Family Game":False, \
     "Children's Game":False, "Party Game":False, "Strategy Game":False, \
     "War Game":False, "age":False, "min_players":False, "max_players":False, \
-    "min_playtime":False, "max_playtime":False, "Card Game":False, \
-    "Fantasy":False, "Fighting":False, "Economic":False, \
-    "Science Fiction":False, "Wargame":False, "Adventure":False, "Dice":False, \
-    "Medieval":False, "Miniatures":False, "Hand Management":False, "Dice Rolling":False, \
-    "Variable Player Powers":False, "Set Collection":False, 
-    "Card Drafting":False, "Area Majority / Influence":False, 
-    "Modular Board":False, "Tile Placement":False, "Cooperative Game":False, \
-    "Grid Movement":False, "preference":False}
+    "min_playtime":False, "max_playtime":False, "categories":[], \
+    "mechanics":[], "preference":False}
 
     for key, value in search_dict.items():
 
@@ -103,48 +150,10 @@ def build_search_dict(search_dict):
             final_dict["max_playtime"] = value
         elif key == "game_cats":
             for cat in value:
-                if cat == "Cards":
-                    final_dict["Card Game"] = True
-                elif cat == "Fantasy":
-                    final_dict["Fantasy"] = True
-                elif cat == "Fighting":
-                    final_dict["Fighting"] = True
-                elif cat == "Economic":
-                    final_dict["Economic"] = True
-                elif cat == "Sci-Fi":
-                    final_dict["Science Fiction"] = True
-                elif cat == "War":
-                    final_dict["Wargame"] = True 
-                elif cat == "Adventure":
-                    final_dict["Adventure"] = True 
-                elif cat == "Dice":
-                    final_dict["Dice"] = True 
-                elif cat == "Medieval":
-                    final_dict["Medieval"] = True 
-                elif cat == "Miniatures":
-                    final_dict["Miniatures"] = True
+                final_dict["categories"].append(CATEGORY_LABELS.get(cat, cat))
         elif key == "game_mecs":
             for mec in value:
-                if mec == "Dice Rolling":
-                    final_dict["Dice Rolling"] = True
-                elif mec == "Hand Management":
-                    final_dict["Hand Management"] = True
-                elif mec == "Variable Player Powers":
-                    final_dict["Variable Player Powers"] = True
-                elif mec == "Set Collection":
-                    final_dict["Set Collection"] = True
-                elif mec == "Card Drafting":
-                    final_dict["Card Drafting"] = True
-                elif mec == "Area Influence":
-                    final_dict["Area Majority / Influence"] = True 
-                elif mec == "Modular Board":
-                    final_dict["Modular Board"] = True 
-                elif mec == "Tile Placement":
-                    final_dict["Tile Placement"] = True 
-                elif mec == "Cooperative":
-                    final_dict["Cooperative Game"] = True 
-                elif mec == "Grid Movement":
-                    final_dict["Grid Movement"] = True
+                final_dict["mechanics"].append(MECHANIC_LABELS.get(mec, mec))
         elif key == "preference":
             if value == ["Popularity"]:
                     final_dict["preference"] = "popularity"
@@ -152,7 +161,7 @@ def build_search_dict(search_dict):
                     final_dict["preference"] = "ratings"
     return final_dict
 
-def filter_game_df(search_dict, games_df):
+def filter_game_df(search_dict, games_df, index=None, columns=None):
     """
     Filters the board game database, eliminating all titles that don't meet any
     of the search criteria for a given parameter.
@@ -160,115 +169,31 @@ def filter_game_df(search_dict, games_df):
     Input: 
         search_dict: A dictionary representing the search terms input by the user
         games_df: A pandas dataframe with board game data.
+        index: A game_index.BitsetIndex of games_df, or None to build one.
+        columns: A game_query.ColumnArrays of games_df, or None to build one.
     
     Output: A pandas dataframe, fitered for all the requests input by the user.
     """
-    games_df.query("is_boardgame == True", inplace = True)
-
-    if search_dict["difficulty"]:
-        difficulty = search_dict["difficulty"]
-        if difficulty == "low":
-            games_df.query("averageweight < 2.5", inplace = True)
-        elif difficulty == 'moderate':
-            games_df.query("2.5 <= averageweight <= 3.5", inplace = True)
-        elif difficulty == "high":
-            games_df.query("averageweight >= 3.5", inplace = True)
-        elif difficulty == "low_moderate":
-            games_df.query("averageweight < 3.5", inplace = True)
-        elif difficulty == "moderate_high":
-            games_df.query("averageweight >= 2.5", inplace = True)
-        elif difficulty == "low_high":
-            games_df.query("averageweight < 2.5 | averageweight >= 3.5", \
-            inplace = True)
-
-    query_list = []
-    query_list = build_query(query_list, search_dict, "Abstract Game")
-    query_list = build_query(query_list, search_dict, "Customizable")
-    query_list = build_query(query_list, search_dict, "Thematic")
-    query_list = build_query(query_list, search_dict, "Family Game")
-    query_list = build_query(query_list, search_dict, "Children's Game")
-    query_list = build_query(query_list, search_dict, "Party Game")
-    query_list = build_query(query_list, search_dict, "Strategy Game")
-    query_list = build_query(query_list, search_dict, "War Game")
-
-    if query_list != []:
-        query_str = " | ".join(query_list)
-        games_df.query(query_str, inplace = True)
+    # Keep board games with any of the chosen types, any of the chosen 
+    # categories and any of the chosen mechanics, by ORing and ANDing bitmaps
+    if index is None: 
+        index = game_index.build_index(games_df)
+    mask = index.match([
+        [("flag", "is_boardgame")], 
+        [("type", name) for name in GAME_TYPES if search_dict[name]], 
+        [("category", name) for name in search_dict["categories"]], 
+        [("mechanic", name) for name in search_dict["mechanics"]]])
+
+    # Filter by game complexity, age, number of players and playing time, 
+    # narrowing the rows of the match one predicate at a time
+    if columns is None: 
+        columns = game_query.ColumnArrays(games_df)
+    plan = game_query.compile_plan(search_dict, columns)
+    rows = game_query.run_plan(plan, columns, mask)
     
-    if search_dict["age"]:
-        age = search_dict[age]
-        games_df.query("age <= @age", inplace = True)
-
-    if search_dict["min_players"]:
-        min_players = search_dict["min_players"]
-        games_df.query("minplayers >= @min_players", inplace = True)
+    return games_df.iloc[rows].copy()
 
-    if search_dict["max_players"]:
-        max_players = search_dict["max_players"]
-        games_df.query("maxplayers <= @max_players", inplace = True)
-    
-    if search_dict["min_playtime"]:
-        min_playtime = search_dict["min_playtime"]
-        games_df.query("minplaytime >= @min_playtime", inplace = True)
-
-    if search_dict["max_playtime"]:
-        max_playtime = search_dict["max_playtime"]
-        games_df.query("maxplaytime <= @max_playtime", inplace = True)
-
-    query_list = []
-
-    query_list = []
-    query_list = build_query(query_list, search_dict, "Card Game")
-    query_list = build_query(query_list, search_dict, "Fantasy")
-    query_list = build_query(query_list, search_dict, "Fighting")
-    query_list = build_query(query_list, search_dict, "Economic")
-    query_list = build_query(query_list, search_dict, "Science Fiction")
-    query_list = build_query(query_list, search_dict, "Wargame")
-    query_list = build_query(query_list, search_dict, "Adventure")
-    query_list = build_query(query_list, search_dict, "Dice")
-    query_list = build_query(query_list, search_dict, "Medieval")
-    query_list = build_query(query_list, search_dict, "Miniatures")
-
-    if query_list != []:
-        query_str = " | ".join(query_list)
-        games_df.query(query_str, inplace = True)
-
-    query_list = []
-    query_list = build_query(query_list, search_dict, "Hand Management")
-    query_list = build_query(query_list, search_dict, "Dice Rolling")
-    query_list = build_query(query_list, search_dict, "Variable Player Powers")
-    query_list = build_query(query_list, search_dict, "Set Collection")
-    query_list = build_query(query_list, search_dict, "Card Drafting")
-    query_list = build_query(query_list, search_dict, "Area Majority / Influence")
-    query_list = build_query(query_list, search_dict, "Modular Board")
-    query_list = build_query(query_list, search_dict, "Tile Placement")
-    query_list = build_query(query_list, search_dict, "Cooperative Game")
-    query_list = build_query(query_list, search_dict, "Grid Movement")
-
-    if query_list != []:
-        query_str = ' | '.join(query_list)
-        games_df.query(query_str, inplace = True)
-    
-    return games_df
-
-def build_query(query_list, search_dict, col_name):
-    """
-    Builds or extends a query string to be used in a pandas .query method.
-
-    Input: 
-        query_list = A list containing previous query strings.
-        search_dict: A dictionary representing the search terms input by the user.
-        col_name = A column name corresponding to search_dict.
-    
-    Output: An extended query_list.
-    """
-
-    if search_dict[col_name]:
-        query_list.append("`" + col_name + "`" + "==True")
-        
-    return query_list 
-
-def top_games(search_dict, filtered_df):
+def top_games(search_dict, filtered_df, k=5):
     """
     Finds the five titles that better fit a user's preference, given a search 
     dictionary and a pre-filtered dataframe, by taking into account the user's
@@ -277,16 +202,18 @@ def top_games(search_dict, filtered_df):
     Input: 
         search_dict: A dictionary representing the search terms input by the user.
         filtered_df: A pandas dataframe with board game data.
+        k: The number of games to return. Default = 5.
     Output:
         A tuple of lists representing the top five games recomended to the user,
         given by search_dict, as well as a short description for each game.
     """
 
     if search_dict["preference"] == "popularity":
-        return (build_top_tuple(search_dict, filtered_df, "num_ratings"))
+        return (build_top_tuple(search_dict, filtered_df, "num_ratings", k))
 
     elif search_dict["preference"] == "ratings":
-        return(build_top_tuple(search_dict, filtered_df, "Board Game_avg_rating"))
+        return(build_top_tuple(search_dict, filtered_df, "Board Game_avg_rating", 
+            k))
 
     elif search_dict["preference"] == False:
 
@@ -297,9 +224,9 @@ def top_games(search_dict, filtered_df):
             (filtered_df["num_ratings"] / max_popularity) + \
             (filtered_df["Board Game_avg_rating"] / max_rating ) / 2)
 
-        return(build_top_tuple(search_dict, filtered_df, "mixed_rating"))
+        return(build_top_tuple(search_dict, filtered_df, "mixed_rating", k))
 
-def build_top_tuple(search_dict, filtered_df, col_name):
+def build_top_tuple(search_dict, filtered_df, col_name, k=5):
     """
     Finds the five titles that better fit a user's preference, given a search 
     dictionary, a pre-filtered dataframe, andn the user's preference for ratings,
@@ -310,6 +237,7 @@ def build_top_tuple(search_dict, filtered_df, col_name):
         filtered_df: A pandas dataframe with board game data.
         col_name: The name of the column the data is to be sorted by, representing
                   the user's preference for popularity, scores, or neither.   
+        k: The number of games to return. Default = 5.
     
     Output:
         A tuple of lists representing the top five games recomended to the user,
@@ -319,35 +247,18 @@ def build_top_tuple(search_dict, filtered_df, col_name):
     list1 = ["Game Name", "Game Type(s)", "Min Players", "Max Players", \
     "Playing Time", "Min Age"]
 
-    filtered_df.sort_values(by = [col_name], ascending = False, inplace = True)
+    # Positions of the k highest values, in the order of a stable sort from 
+    # highest to lowest, without sorting every row
+    top = game_query.top_k(filtered_df[col_name].to_numpy(dtype=float), k)
 
-    list2 = []
-    
-    for row in filtered_df.head(5).iterrows():
-        entry_list = []
-        entry_list.append(row[1]["name"])
-        type_list = []
-        if row[1]["Abstract Game"]:
-            type_list.append("Abstract")
-        if row[1]["Customizable"]:
-            type_list.append("Customizable")
-        if row[1]["Thematic"]:
-            type_list.append("Thematic")
-        if row[1]["Family Game"]:
-            type_list.append("Family")
-        if row[1]["Children's Game"]:
-            type_list.append("Children's")
-        if row[1]["Party Game"]:
-            type_list.append("Party")
-        if row[1]["Strategy Game"]:
-            type_list.append("Strategy")
-        if row[1]["War Game"]:
-            type_list.append("War")
-        entry_list.append(type_list)
-        entry_list.append(row[1]["minplayers"])
-        entry_list.append(row[1]["maxplayers"])
-        entry_list.append(row[1]["playingtime"])
-        entry_list.append(row[1]["age"])
-        list2.append(entry_list)
+    # Number each game's combination of types, to look up its list of types
+    codes = np.zeros(len(top), dtype=int)
+    for bit, name in enumerate(GAME_TYPES):
+        codes |= filtered_df[name].to_numpy(dtype=bool)[top].astype(int) << bit
+
+    columns = [filtered_df[column].to_numpy()[top].tolist() for column in 
+        ("name", "minplayers", "maxplayers", "playingtime", "age")]
+    list2 = [[row[0], list(TYPE_LABEL_LISTS[code])] + list(row[1:]) 
+        for row, code in zip(zip(*columns), codes.tolist())]
     
     return (list1, list2)
\ No newline at end of file
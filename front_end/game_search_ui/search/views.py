@@ -15,10 +15,12 @@ from operator import and_
 from django.shortcuts import render
 from django import forms
 
-from game_search import find_best_match
+from game_search import find_best_match, tag_names
 
 NOPREF_STR = 'No preference'
 RES_DIR = os.path.join(os.path.dirname(__file__), '..', 'res')
+# Where bgg_api writes the counts files of a pull
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..')
 
 COLUMN_NAMES = dict(
     min_playtime='Min Playtime',
@@ -59,6 +61,23 @@ def _load_res_column(filename, col=0):
     """Load column from resource directory."""
     return _load_column(os.path.join(RES_DIR, filename), col=col)
 
+def _load_tag_column(kind, filename, res_filename):
+    """
+    Load every name of a kind of tag that the search index has, most common
+    first by its counts file from bgg_api, or the short list in the resource
+    directory if the board game database cannot be loaded.
+    """
+    try:
+        names = tag_names(kind)
+    except OSError:
+        return _load_res_column(res_filename)
+    counts = {}
+    path = os.path.join(DATA_DIR, filename)
+    if os.path.exists(path):
+        with open(path) as f:
+            counts = {row[0]: int(row[1]) for row in list(csv.reader(f))[1:]}
+    return sorted(names, key=lambda name: -counts.get(name, 0))
+
 def _build_dropdown(options):
     """Convert a list to (value, caption) tuples."""
     return [(x, x) if x is not None else ('', NOPREF_STR) for x in options]
@@ -66,8 +85,10 @@ def _build_dropdown(options):
 
 DIFFICULTY = _build_dropdown(_load_res_column('difficulty.csv'))
 GAMETYPE = _build_dropdown(_load_res_column('game_type.csv'))
-GAMECATEGORY = _build_dropdown(_load_res_column('game_category.csv'))
-GAMEMECHANISM = _build_dropdown(_load_res_column('game_mechanics.csv'))
+GAMECATEGORY = _build_dropdown(
+    _load_tag_column('category', 'categories_counts.csv', 'game_category.csv'))
+GAMEMECHANISM = _build_dropdown(
+    _load_tag_column('mechanic', 'mechanics_counts.csv', 'game_mechanics.csv'))
 PREFERENCES = _build_dropdown(_load_res_column('preference.csv'))
 
 
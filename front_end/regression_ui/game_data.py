@@ -0,0 +1,37 @@
+'''
+Loads the all-games table written by bgg_api.go.
+
+bgg_api.go writes the table twice: as all_games.csv, and as all_games.feather,
+a typed Arrow file. Where the Feather file and pyarrow are both available it
+is memory-mapped and only the requested columns are read, with no text to
+parse or coerce; otherwise the CSV is read as before.
+'''
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather
+except ImportError: # Fall back to the CSV
+    pyarrow = None
+
+
+def load_games(filename="all_games.csv", columns=None):
+    '''
+    Loads the all-games table into a DataFrame.
+
+    Inputs:
+        filename (str): Name of the CSV file. The Feather file next to it,
+            with the same name, is preferred when it exists.
+        columns (list of str): Columns to load. Default = None, which loads
+            every column.
+
+    Outputs:
+        pandas DataFrame
+    '''
+    feather_filename = os.path.splitext(filename)[0] + ".feather"
+    if pyarrow is not None and os.path.exists(feather_filename):
+        table = pyarrow.feather.read_table(feather_filename, columns=columns,
+            memory_map=True)
+        return table.to_pandas()
+    return pd.read_csv(filename, usecols=columns)
@@ -0,0 +1,210 @@
+'''
+Query engine for the numeric filters of a game search: difficulty, age,
+number of players and playing time.
+
+Each filter used to be a DataFrame.query() on the table, which parses its
+expression and copies the remaining rows every time. Here a search is
+compiled into a plan of range predicates over NumPy arrays of the columns,
+taken from the table once (see game_data.Snapshot). The plan runs the most
+selective predicate first, and each predicate only looks at the rows every
+earlier one kept. The table itself is indexed once, at the end.
+
+Each column also has a sorted index: the positions of its rows in order of
+value. The rows in a range of values are then one slice of the index, found
+by binary search, so the most selective predicate gives its rows without
+reading the whole column. When they are fewer than the rows of the bitset
+match of types, categories and mechanics, the plan starts from them and
+keeps those the match also has; otherwise it starts from the match.
+
+A predicate is a column and a list of ranges, any of which a value may fall
+in. A range is (low, high, closed): low <= value, and value < high, or
+value <= high if closed, with None for no bound. Missing values fall in no
+range, as they match no comparison in DataFrame.query().
+'''
+import numpy as np
+
+# Columns a search can filter on
+COLUMNS = ["averageweight", "age", "minplayers", "maxplayers", "minplaytime",
+    "maxplaytime"]
+
+# Game complexity, where all games fall into one of three ranges in BGG's
+# 1-5 scale, arbitrarily defined at 0-2.5 for beginners, 2.5-3.5 for
+# intermediates, and 3.5 and higher for advanced
+DIFFICULTY_RANGES = {
+    "low": [(None, 2.5, False)],
+    "moderate": [(2.5, 3.5, True)],
+    "high": [(3.5, None, False)],
+    "low_moderate": [(None, 3.5, False)],
+    "moderate_high": [(2.5, None, False)],
+    "low_high": [(None, 2.5, False), (3.5, None, False)],
+}
+
+# Keys of search.build_search_dict() that bound one column: the game's age
+# must be at most the key's, minplayers at least the key's, and so on
+BOUNDS = [("age", "age", "max"), ("min_players", "minplayers", "min"),
+    ("max_players", "maxplayers", "max"), ("min_playtime", "minplaytime", "min"),
+    ("max_playtime", "maxplaytime", "max")]
+
+
+class ColumnArrays:
+    '''
+    The columns of the all-games table a search can filter on, as arrays of
+    floats, each with a sorted index of the rows that have a value.
+
+    Inputs:
+        games_df (Pandas DataFrame): All-games table
+    '''
+    def __init__(self, games_df):
+        self.num_rows = len(games_df)
+        self.values = {}
+        self.order = {}
+        self.sorted_values = {}
+        # Row positions fit in 32 bits for any table this size
+        dtype = np.int32 if self.num_rows < 2 ** 31 else np.int64
+        for column in COLUMNS:
+            values = games_df[column].to_numpy(dtype=float)
+            present = np.flatnonzero(~np.isnan(values)).astype(dtype)
+            order = present[np.argsort(values[present], kind="stable")]
+            self.values[column] = values
+            self.order[column] = order
+            self.sorted_values[column] = values[order]
+
+    def slices(self, column, ranges):
+        '''
+        Finds the slices of a column's sorted index that hold its values in
+        each of the ranges, by binary search.
+
+        Outputs:
+            List of (start, end) slices
+        '''
+        sorted_values = self.sorted_values[column]
+        slices = []
+        for low, high, closed in ranges:
+            start = 0 if low is None else np.searchsorted(sorted_values, low,
+                "left")
+            end = len(sorted_values) if high is None else np.searchsorted(
+                sorted_values, high, "right" if closed else "left")
+            slices.append((start, max(start, end)))
+        return slices
+
+    def count(self, column, ranges):
+        '''
+        Outputs:
+            Number of rows a predicate keeps (int)
+        '''
+        return sum(end - start for start, end in self.slices(column, ranges))
+
+    def lookup(self, column, ranges):
+        '''
+        Outputs:
+            numpy array of the positions of the rows a predicate keeps, in
+            table order
+        '''
+        order = self.order[column]
+        return np.sort(np.concatenate([order[start:end]
+            for start, end in self.slices(column, ranges)]))
+
+
+def compile_plan(search_dict, columns):
+    '''
+    Turns the numeric filters of a search into predicates.
+
+    Inputs:
+        search_dict (dict): Search, as returned by search.build_search_dict()
+        columns (ColumnArrays): Columns of the table to be searched
+
+    Outputs:
+        List of (column, ranges) predicates, most selective first
+    '''
+    plan = []
+    if search_dict["difficulty"] in DIFFICULTY_RANGES:
+        plan.append(("averageweight", DIFFICULTY_RANGES[search_dict["difficulty"]]))
+    for key, column, bound in BOUNDS:
+        value = search_dict[key]
+        if value:
+            if bound == "min":
+                plan.append((column, [(value, None, False)]))
+            else:
+                plan.append((column, [(None, value, True)]))
+    plan.sort(key=lambda predicate: columns.count(*predicate))
+    return plan
+
+
+def run_plan(plan, columns, mask=None, use_index=True):
+    '''
+    Finds the rows that satisfy every predicate of a plan.
+
+    Inputs:
+        plan (list of tuples): Predicates from compile_plan()
+        columns (ColumnArrays): Columns of the table
+        mask (numpy array of bool): Rows to start from, such as those of a
+            game_index.BitsetIndex match. Default = None, which starts from
+            every row.
+        use_index (bool): If False, never start from the sorted index of the
+            first predicate, scanning its column instead. Default = True.
+
+    Outputs:
+        numpy array of the row positions kept, in table order
+    '''
+    num_start = columns.num_rows if mask is None else np.count_nonzero(mask)
+    if use_index and plan and columns.count(*plan[0]) < num_start:
+        # Intersect the rows of the most selective range with the match
+        rows = columns.lookup(*plan[0])
+        if mask is not None:
+            rows = rows[mask[rows]]
+        plan = plan[1:]
+    elif mask is None:
+        rows = np.arange(columns.num_rows)
+    else:
+        rows = np.flatnonzero(mask)
+    for column, ranges in plan:
+        if not len(rows):
+            break
+        rows = rows[in_ranges(columns.values[column][rows], ranges)]
+    return rows
+
+
+def in_ranges(values, ranges):
+    '''
+    Outputs:
+        numpy array of bool, whether each value falls in any of the ranges
+    '''
+    keep = np.zeros(len(values), dtype=bool)
+    for low, high, closed in ranges:
+        part = np.ones(len(values), dtype=bool)
+        if low is not None:
+            part &= values >= low
+        if high is not None:
+            part &= values <= high if closed else values < high
+        keep |= part
+    return keep
+
+
+def top_k(values, k):
+    '''
+    Finds the k highest values in the order a stable sort from highest to
+    lowest would leave them, with ties in table order and missing values
+    last, without sorting every value.
+
+    Inputs:
+        values (numpy array of float): Values to rank
+        k (int): Number of positions to return
+
+    Outputs:
+        numpy array of up to k positions into values
+    '''
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    missing = np.isnan(values)
+    present = np.flatnonzero(~missing)
+    if k < len(present):
+        # Everything above the kth highest value, then as many of the values
+        # tied with it as fit, the first in table order
+        kept = values[present]
+        threshold = np.partition(kept, len(kept) - k)[len(kept) - k]
+        above = present[kept > threshold]
+        tied = present[kept == threshold][:k - len(above)]
+        present = np.concatenate([above, tied])
+    order = np.lexsort((present, -values[present]))
+    return np.concatenate([present[order],
+        np.flatnonzero(missing)[:max(k - len(present), 0)]])
@@ -102,7 +102,19 @@ def test_code():
         https://stackoverflow.com/questions/31737745/python-call-function-again-if-incorrect-input
 
         Outputs: 
-            Five CSV files to the current directory as described in the file bgg_api.py
+            Files written to the current directory, as described in the files 
+            bgg_crawler.py and bgg_api.py, with the suffix given: 
+            1) The crawled index game_ids_small_texts<suffix>.csv, with its 
+                .checkpoint file while the crawl runs. 
+            2) all_games<suffix>.json, all_games<suffix>.csv and, if pyarrow 
+                is installed, all_games<suffix>.feather. 
+            3) The sparse matrix of game tags all_games<suffix>_tags.npz and 
+                its vocabulary all_games<suffix>_tags_vocabulary.csv. 
+            4) types_counts<suffix>.csv, categories_counts<suffix>.csv and 
+                mechanics_counts<suffix>.csv. 
+            5) The timing report all_games<suffix>_report.json. 
+            6) all_games<suffix>_quarantine.jsonl, if any game could not be 
+                read, and all_games<suffix>_checkpoint.jsonl while the pull runs. 
     '''
     clear()
     while True: 
@@ -125,11 +137,14 @@ def test_code():
         else: 
             break
     
-    bgg_crawler.go(num_games_to_crawl=game_limit, 
-        index_filename=f"game_ids_small_texts{suffix}.csv")
+    # IDs go from the crawl straight to the API as each page comes in, while 
+    # the crawl still writes the index file
+    rows = bgg_crawler.crawl_to_index(num_games_to_crawl=game_limit, 
+        index_filename=f"game_ids_small_texts{suffix}.csv", max_workers=4)
     
     bgg_api.go(file_in=f'game_ids_small_texts{suffix}.csv', 
-        limit=game_limit, size=100, start=1, file_suffix_out=f'{suffix}')
+        limit=game_limit, size=100, start=1, file_suffix_out=f'{suffix}', 
+        rows=rows)
 
     return_main_menu()
 
@@ -12,6 +12,7 @@ ways to improve the game rating and increase its popularity
 
 import pandas as pd
 import numpy as np
+import game_data
 
 rating_lst = ['avg_playtime', 'suggested_numplayers', 'averageweight', 
                 'num_mechanics', 'lang_dep2', 'lang_dep3', 'lang_dep4', 
@@ -167,7 +168,7 @@ def construct_X_y(rating_bool):
         dep_var: (str) name of depedent variable
     '''
 
-    raw_df = pd.read_csv("all_games.csv")
+    raw_df = game_data.load_games("all_games.csv")
     raw_df = raw_df.loc[:,['bgg_id', 'is_boardgame', 'name', 'name_coerced',
                         'minplaytime', 'maxplaytime', 'suggested_numplayers',
                         'suggested_language', 'num_ratings',